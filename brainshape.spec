@@ -46,6 +46,7 @@ a = Analysis(
         "uvicorn.lifespan.off",
         "uvicorn.logging",
         "uvicorn.loops.auto",
+        "uvicorn.loops.uvloop",
         "uvicorn.protocols.http.auto",
         "uvicorn.protocols.websockets.auto",
         # FastAPI / Starlette
@@ -8,7 +8,7 @@ from langgraph.checkpoint.memory import MemorySaver
 from brainshape import tools
 from brainshape.graph_db import GraphDB
 from brainshape.kg_pipeline import KGPipeline, create_kg_pipeline
-from brainshape.settings import get_llm_kwargs, get_llm_model_string
+from brainshape.settings import get_agent_config
 
 logger = logging.getLogger(__name__)
 
@@ -95,19 +95,16 @@ def create_brainshape_agent(
         logger.warning("Starting without database — agent and graph features unavailable")
         return None, None, None
 
-    if pipeline is None:
-        from brainshape.settings import get_notes_path
+    model_string, model_kwargs, notes_path = get_agent_config()
 
-        notes_path = Path(get_notes_path()).expanduser()
-        pipeline = create_kg_pipeline(db, notes_path)
+    if pipeline is None:
+        pipeline = create_kg_pipeline(db, Path(notes_path).expanduser())
 
     tools.db = db
     tools.pipeline = pipeline
 
     checkpointer = MemorySaver()
 
-    model_string = get_llm_model_string()
-    model_kwargs = get_llm_kwargs()
     model = init_chat_model(model_string, **model_kwargs)
 
     all_tools = list(tools.ALL_TOOLS)
@@ -139,8 +136,7 @@ def recreate_agent(
 
     checkpointer = MemorySaver()
 
-    model_string = get_llm_model_string()
-    model_kwargs = get_llm_kwargs()
+    model_string, model_kwargs, _ = get_agent_config()
     model = init_chat_model(model_string, **model_kwargs)
 
     all_tools = list(tools.ALL_TOOLS)
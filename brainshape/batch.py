@@ -4,6 +4,7 @@ Usage:
     uv run python -m brainshape.batch                  # semantic only (default)
     uv run python -m brainshape.batch --structural     # structural only
     uv run python -m brainshape.batch --full           # structural + semantic
+    uv run python -m brainshape.batch --concurrency 4  # embed 4 batches at once
 
 Only processes dirty files (content hash comparison).
 
@@ -13,6 +14,7 @@ Example cron (overnight semantic processing):
 
 import argparse
 import sys
+import time
 from pathlib import Path
 
 from brainshape.graph_db import GraphDB
@@ -20,11 +22,36 @@ from brainshape.kg_pipeline import create_kg_pipeline
 from brainshape.sync import sync_all, sync_semantic, sync_structural
 
 
+class _ProgressPrinter:
+    """Semantic sync progress for long runs, printed at most every ``every_n``
+    notes or ``every_s`` seconds so big vaults don't write a line per note."""
+
+    def __init__(self, every_n: int = 100, every_s: float = 2.0):
+        self.every_n = every_n
+        self.every_s = every_s
+        self._last_done = 0
+        self._last_time = time.monotonic()
+
+    def __call__(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if done - self._last_done < self.every_n and now - self._last_time < self.every_s:
+            return
+        self._last_done, self._last_time = done, now
+        print(f"Semantic: {done}/{total} notes", flush=True)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Brainshape notes sync (batch mode)")
     parser.add_argument("--structural", action="store_true", help="Run structural sync only")
     parser.add_argument("--full", action="store_true", help="Run structural + semantic sync")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Embedding batches in flight (default: the semantic_sync_concurrency setting)",
+    )
     args = parser.parse_args()
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
 
     from brainshape.settings import get_notes_path
 
@@ -45,14 +72,26 @@ def main():
             )
         elif args.full:
             pipeline = create_kg_pipeline(db, notes_path)
-            stats = sync_all(db, pipeline, notes_path)
+            stats = sync_all(
+                db,
+                pipeline,
+                notes_path,
+                concurrency=args.concurrency,
+                on_progress=_ProgressPrinter(),
+            )
             s, sem = stats["structural"], stats["semantic"]
             print(f"Structural: {s['notes']} notes, {s['tags']} tag links, {s['links']} note links")
             print(f"Semantic: {sem['processed']} processed, {sem['skipped']} skipped")
         else:
             # Default: semantic only (the expensive/important one for overnight batch)
             pipeline = create_kg_pipeline(db, notes_path)
-            stats = sync_semantic(db, pipeline, notes_path)
+            stats = sync_semantic(
+                db,
+                pipeline,
+                notes_path,
+                concurrency=args.concurrency,
+                on_progress=_ProgressPrinter(),
+            )
             print(f"Semantic: {stats['processed']} processed, {stats['skipped']} skipped")
     finally:
         db.close()
@@ -7,19 +7,32 @@ SSE streaming contract remain unchanged.
 """
 
 import asyncio
-import json
+import functools
 import logging
 import os
 import shutil
-import tempfile
+import sqlite3
+import time
+from collections import deque
 from collections.abc import AsyncGenerator
 from pathlib import Path
 from typing import Any
 
+import orjson
+
+from brainshape.settings import SETTINGS_FILE
+
 logger = logging.getLogger(__name__)
 
-# Track active sessions so we know when to pass --resume
-_active_sessions: set[str] = set()
+# Sessions this server has started, so we know when to pass --resume. The CLI
+# keeps each conversation on disk itself, so the IDs are stored on disk too and
+# a conversation survives a server restart. Sessions unused for
+# _SESSION_TTL are forgotten and would have to be started again.
+SESSIONS_DB = SETTINGS_FILE.parent / "claude_sessions.db"
+_SESSION_TTL = 7 * 24 * 3600  # 7 days
+
+# (path, connection) for the session store, opened on first use
+_sessions_conn: tuple[Path, sqlite3.Connection] | None = None
 
 # Keep in sync with brainshape/tools.py ALL_TOOLS
 _BRAINSHAPE_TOOL_NAMES = [
@@ -35,9 +48,24 @@ _BRAINSHAPE_TOOL_NAMES = [
 ]
 _ALLOWED_TOOLS = ",".join(f"mcp__brainshape__{name}" for name in _BRAINSHAPE_TOOL_NAMES)
 
+# Longest stream-json line read from claude's stdout. The asyncio default
+# (64 KiB) is smaller than an assistant event carrying a long reply or a large
+# tool result, and an over-long line aborts the stream. Memory is only used
+# as long lines actually arrive.
+_STDOUT_LINE_LIMIT = 16 * 1024 * 1024
 
+# Lines of claude's stderr reported when it exits with an error
+_STDERR_TAIL_LINES = 100
+_STDERR_READ_SIZE = 64 * 1024
+
+
+@functools.cache
 def _get_claude_binary() -> str:
-    """Find the ``claude`` CLI binary on ``$PATH`` or common install locations."""
+    """Find the ``claude`` CLI binary on ``$PATH`` or common install locations.
+
+    Cached for the life of the process; a failed lookup isn't cached, so
+    installing the CLI later is picked up on the next request.
+    """
     path = shutil.which("claude")
     if path:
         return path
@@ -66,6 +94,94 @@ def _build_mcp_config() -> dict[str, Any]:
     }
 
 
+@functools.cache
+def _mcp_config_json() -> str:
+    """The MCP config, serialized once per process."""
+    return orjson.dumps(_build_mcp_config()).decode()
+
+
+def _sessions_db() -> sqlite3.Connection:
+    """Return the session store, opening it if needed (again if SESSIONS_DB moved)."""
+    global _sessions_conn
+    if _sessions_conn is not None and _sessions_conn[0] == SESSIONS_DB:
+        return _sessions_conn[1]
+    if _sessions_conn is not None:
+        _sessions_conn[1].close()
+    SESSIONS_DB.parent.mkdir(parents=True, exist_ok=True)
+    # Autocommit; /agent/message reads it on the event loop while settings
+    # reloads clear it from a worker thread
+    conn = sqlite3.connect(SESSIONS_DB, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, ts INTEGER NOT NULL)")
+    _sessions_conn = (SESSIONS_DB, conn)
+    return conn
+
+
+def has_session(session_id: str) -> bool:
+    """True if ``session_id`` is a claude session that can still be resumed."""
+    row = (
+        _sessions_db()
+        .execute(
+            "SELECT 1 FROM sessions WHERE id = ? AND ts >= ?",
+            (session_id, int(time.time()) - _SESSION_TTL),
+        )
+        .fetchone()
+    )
+    return row is not None
+
+
+def _claim_session(session_id: str) -> bool:
+    """Record ``session_id`` as active; True if it already was (so resume it).
+
+    Only called from the event loop, with no await between check and update,
+    so two requests can't both claim a new session.
+    """
+    resume = has_session(session_id)
+    now = int(time.time())
+    db = _sessions_db()
+    db.execute("INSERT OR REPLACE INTO sessions (id, ts) VALUES (?, ?)", (session_id, now))
+    if not resume:
+        db.execute("DELETE FROM sessions WHERE ts < ?", (now - _SESSION_TTL,))
+    return resume
+
+
+def _release_session(session_id: str) -> None:
+    """Forget a session whose CLI process never started."""
+    _sessions_db().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+async def _drain_stderr(stream: asyncio.StreamReader, tail: deque[bytes]) -> None:
+    """Read stderr as it arrives, keeping its most recent lines in *tail*.
+
+    Left unread, a chatty CLI fills the pipe buffer and blocks on its next
+    write, which stalls stdout and the response stream with it. Reads are
+    split into lines, so a bounded *tail* holds whole lines however the
+    output was chunked.
+    """
+    partial = b""
+    while chunk := await stream.read(_STDERR_READ_SIZE):
+        *lines, partial = (partial + chunk).split(b"\n")
+        tail.extend(lines)
+        # An unterminated line is capped like a read so it can't grow unbounded
+        partial = partial[-_STDERR_READ_SIZE:]
+    if partial:
+        tail.append(partial)
+
+
+@functools.lru_cache(maxsize=64)
+def _tool_call_data(name: str) -> str:
+    """SSE payload for a tool call; the CLI stream doesn't expose the arguments.
+
+    Cached: a conversation only ever calls a handful of distinct tools.
+    """
+    return f'{{"name":{orjson.dumps(name).decode()},"args":{{}}}}'
+
+
+def _stderr_tail(tail: deque[bytes]) -> str:
+    text = b"\n".join(tail).decode("utf-8", errors="replace")
+    return "\n".join(text.splitlines()).strip()
+
+
 async def stream_claude_code_response(
     message: str,
     system_prompt: str,
@@ -80,130 +196,135 @@ async def stream_claude_code_response(
     """
     claude_bin = _get_claude_binary()
 
-    # Write temporary MCP config file
-    mcp_config = _build_mcp_config()
-    fd, config_path = tempfile.mkstemp(suffix=".json", prefix="brainshape-mcp-")
-    try:
-        with os.fdopen(fd, "w") as f:
-            json.dump(mcp_config, f)
-
-        # Build command
-        cmd = [
-            claude_bin,
-            "-p",
-            message,
-            "--output-format",
-            "stream-json",
-            "--verbose",
-            "--system-prompt",
-            system_prompt,
-            "--model",
-            model,
-            "--mcp-config",
-            config_path,
-            "--allowedTools",
-            _ALLOWED_TOOLS,
-        ]
-
-        if session_id in _active_sessions:
-            # Resume the existing claude session by its ID
-            cmd.extend(["--resume", session_id])
-        else:
-            # Name the new session so we can resume it later
-            cmd.extend(["--session-id", session_id])
-
-        # Prevent nested Claude Code session crash
-        env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+    # Build command
+    cmd = [
+        claude_bin,
+        "-p",
+        message,
+        "--output-format",
+        "stream-json",
+        "--verbose",
+        "--system-prompt",
+        system_prompt,
+        "--model",
+        model,
+        # The CLI takes the config as a JSON string too, so there's no file
+        # to write and clean up per request
+        "--mcp-config",
+        _mcp_config_json(),
+        "--allowedTools",
+        _ALLOWED_TOOLS,
+    ]
+
+    # Claimed before the spawn awaits, so a second request for the same
+    # session can't also try to create it
+    resume = _claim_session(session_id)
+    if resume:
+        # Resume the existing claude session by its ID
+        cmd.extend(["--resume", session_id])
+    else:
+        # Name the new session so we can resume it later
+        cmd.extend(["--session-id", session_id])
 
+    # Prevent nested Claude Code session crash
+    env = os.environ.copy()
+    env.pop("CLAUDECODE", None)
+
+    try:
         process = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             env=env,
+            limit=_STDOUT_LINE_LIMIT,
         )
+    except BaseException:
+        if not resume:
+            # The session was never created; the next attempt must create it
+            _release_session(session_id)
+        raise
+
+    stderr_tail: deque[bytes] = deque(maxlen=_STDERR_TAIL_LINES)
+    stderr_task = (
+        asyncio.create_task(_drain_stderr(process.stderr, stderr_tail))
+        if process.stderr is not None
+        else None
+    )
+
+    try:
+        if process.stdout is None:  # pragma: no cover — guaranteed by PIPE
+            yield {"event": "error", "data": "Failed to open subprocess stdout"}
+            return
 
-        _active_sessions.add(session_id)
+        async for raw_line in process.stdout:
+            # orjson parses the raw bytes directly and ignores the trailing
+            # newline; blank lines fail to parse and are skipped with the rest
+            try:
+                data = orjson.loads(raw_line)
+            except orjson.JSONDecodeError:
+                continue
 
-        try:
-            if process.stdout is None:  # pragma: no cover — guaranteed by PIPE
-                yield {"event": "error", "data": "Failed to open subprocess stdout"}
-                return
+            etype = data.get("type")
 
-            async for raw_line in process.stdout:
-                line = raw_line.decode("utf-8").strip()
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
+            # ── Streaming content deltas (Anthropic API format) ──
+            # Text deltas are most of the stream, so they're tested first
+            if etype == "content_block_delta":
+                delta = data.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    text = delta.get("text", "")
+                    if text:
+                        yield {"event": "text", "data": orjson.dumps(text).decode()}
 
-                etype = data.get("type")
+            elif etype == "content_block_start":
+                block = data.get("content_block", {})
+                if block.get("type") == "tool_use":
+                    name = block.get("name", "")
+                    if name:
+                        yield {"event": "tool_call", "data": _tool_call_data(name)}
 
-                # ── Streaming content deltas (Anthropic API format) ──
-                if etype == "content_block_start":
-                    block = data.get("content_block", {})
-                    if block.get("type") == "tool_use":
+            # ── Complete assistant messages (Claude Code wrapper format) ──
+            elif etype == "assistant":
+                msg = data.get("message", {})
+                for block in msg.get("content", []):
+                    btype = block.get("type")
+                    if btype == "text":
+                        text = block.get("text", "")
+                        if text:
+                            yield {"event": "text", "data": orjson.dumps(text).decode()}
+                    elif btype == "tool_use":
                         name = block.get("name", "")
                         if name:
-                            yield {
-                                "event": "tool_call",
-                                "data": json.dumps({"name": name, "args": {}}),
-                            }
-
-                elif etype == "content_block_delta":
-                    delta = data.get("delta", {})
-                    if delta.get("type") == "text_delta":
-                        text = delta.get("text", "")
-                        if text:
-                            yield {"event": "text", "data": json.dumps(text)}
-
-                # ── Complete assistant messages (Claude Code wrapper format) ──
-                elif etype == "assistant":
-                    msg = data.get("message", {})
-                    for block in msg.get("content", []):
-                        btype = block.get("type")
-                        if btype == "text":
-                            text = block.get("text", "")
-                            if text:
-                                yield {"event": "text", "data": json.dumps(text)}
-                        elif btype == "tool_use":
-                            name = block.get("name", "")
-                            if name:
-                                yield {
-                                    "event": "tool_call",
-                                    "data": json.dumps({"name": name, "args": {}}),
-                                }
-
-                elif etype == "result":
-                    if data.get("is_error"):
-                        yield {
-                            "event": "error",
-                            "data": data.get("error", "Unknown error from claude"),
-                        }
-
-            await process.wait()
-
-            if process.returncode != 0 and process.stderr:
-                stderr_data = await process.stderr.read()
-                error_msg = stderr_data.decode("utf-8").strip()
-                if error_msg:
-                    yield {"event": "error", "data": error_msg}
-        finally:
-            # Kill the subprocess if still running (e.g. client disconnected)
-            if process.returncode is None:
-                try:
-                    process.terminate()
-                    await asyncio.wait_for(process.wait(), timeout=5)
-                except (ProcessLookupError, TimeoutError):
-                    process.kill()
+                            yield {"event": "tool_call", "data": _tool_call_data(name)}
+
+            elif etype == "result":
+                if data.get("is_error"):
+                    yield {
+                        "event": "error",
+                        "data": data.get("error", "Unknown error from claude"),
+                    }
+
+        await process.wait()
+        if stderr_task is not None:
+            await stderr_task
 
+        if process.returncode != 0:
+            error_msg = _stderr_tail(stderr_tail)
+            if error_msg:
+                yield {"event": "error", "data": error_msg}
     finally:
-        Path(config_path).unlink(missing_ok=True)
+        # Kill the subprocess if still running (e.g. client disconnected)
+        if process.returncode is None:
+            try:
+                process.terminate()
+                await asyncio.wait_for(process.wait(), timeout=5)
+            except (ProcessLookupError, TimeoutError):
+                process.kill()
+        if stderr_task is not None and not stderr_task.done():
+            stderr_task.cancel()
 
     yield {"event": "done", "data": ""}
 
 
 def clear_sessions() -> None:
     """Clear all tracked sessions (called on settings change)."""
-    _active_sessions.clear()
+    _sessions_db().execute("DELETE FROM sessions")
@@ -31,6 +31,8 @@ class GraphDB:
         db_path = Path(settings.surrealdb_path).expanduser()
         db_path.mkdir(parents=True, exist_ok=True)
         try:
+            # Embedded engine: queries run in-process on this one connection,
+            # with no sockets or per-query sessions, so there is nothing to pool.
             self._conn = Surreal(f"surrealkv://{db_path}")
             self._conn.connect()  # type: ignore[union-attr]  # surrealkv:// connections have connect()
             self._migrate_namespace()
@@ -67,6 +69,24 @@ class GraphDB:
         result = self._conn.query(sql, parameters or {})
         return _convert_record_ids(result)
 
+    def execute(self, sql: str, parameters: dict[str, Any] | None = None) -> list[Any]:
+        """Run a SurrealQL script and return every statement's result.
+
+        query() only returns the first statement's result, and a failed
+        statement comes back as an error string rather than an exception.
+        Scripts that write use this instead: it raises ``RuntimeError`` if
+        any statement failed, including ones skipped by a cancelled
+        transaction.
+        """
+        response = self._conn.query_raw(sql, parameters or {})
+        if response.get("error") is not None:
+            raise RuntimeError(f"SurrealDB query failed: {response['error']}")
+        results = response.get("result") or []
+        errors = [str(r.get("result")) for r in results if r.get("status") == "ERR"]
+        if errors:
+            raise RuntimeError(f"SurrealDB query failed: {'; '.join(dict.fromkeys(errors))}")
+        return _convert_record_ids([r.get("result") for r in results])
+
     def bootstrap_schema(self):
         """Create tables, indexes, and analyzers if they don't exist."""
         statements = [
@@ -86,6 +106,14 @@ class GraphDB:
             # Property indexes
             "DEFINE INDEX IF NOT EXISTS note_title ON TABLE note FIELDS title",
             "DEFINE INDEX IF NOT EXISTS note_hash ON TABLE note FIELDS content_hash",
+            # Edge endpoint indexes: deletes, neighborhood BFS and memory
+            # connections filter relation tables by `in`/`out`
+            "DEFINE INDEX IF NOT EXISTS tagged_with_in ON TABLE tagged_with FIELDS in",
+            "DEFINE INDEX IF NOT EXISTS tagged_with_out ON TABLE tagged_with FIELDS out",
+            "DEFINE INDEX IF NOT EXISTS links_to_in ON TABLE links_to FIELDS in",
+            "DEFINE INDEX IF NOT EXISTS links_to_out ON TABLE links_to FIELDS out",
+            "DEFINE INDEX IF NOT EXISTS from_document_in ON TABLE from_document FIELDS in",
+            "DEFINE INDEX IF NOT EXISTS from_document_out ON TABLE from_document FIELDS out",
             # Fulltext search
             "DEFINE ANALYZER IF NOT EXISTS note_analyzer TOKENIZERS class FILTERS lowercase, ascii",
             "DEFINE INDEX IF NOT EXISTS note_content_ft ON TABLE note "
@@ -1,24 +1,83 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from brainshape.graph_db import GraphDB
+if TYPE_CHECKING:
+    from brainshape.graph_db import GraphDB
 
 logger = logging.getLogger(__name__)
 
+# Texts per forward pass of the embedding model
+EMBED_BATCH_SIZE = 64
+
+# HNSW graph parameters for the chunk vector index. Only applied when the index
+# is (re)created; an existing index keeps the parameters it was built with.
+HNSW_M = 16
+HNSW_EFC = 150
+# Candidate list size when searching the index; larger trades latency for recall
+HNSW_EF_SEARCH = 100
+
+
+# The loaded embedding model, shared by every KGPipeline in the process:
+# settings reloads and the MCP server build new pipelines for the same model.
+# Holds one model; loading another drops it (pipelines using it keep their own
+# reference).
+_shared_model: tuple[str, object] | None = None
+_shared_model_lock = threading.Lock()
+
+
+def _load_model(name: str):
+    """Return the SentenceTransformer for ``name``, loading it on first use.
+
+    Locked so concurrent semantic sync workers load it only once.
+    """
+    global _shared_model
+    with _shared_model_lock:
+        if _shared_model is None or _shared_model[0] != name:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info("Loading embedding model: %s", name)
+            model = SentenceTransformer(name)
+            # SentenceTransformer already picks CUDA/MPS when present. On CUDA,
+            # FP16 roughly doubles encode throughput; cosine rankings are
+            # unaffected and vectors are still stored as F32.
+            if model.device.type == "cuda":
+                model.half()
+            _shared_model = (name, model)
+        return _shared_model[1]
+
+
+def _vector_index_sql(dimensions: int) -> str:
+    return (
+        f"DEFINE INDEX IF NOT EXISTS chunk_embeddings ON TABLE chunk "
+        f"FIELDS embedding HNSW DIMENSION {dimensions} TYPE F32 DIST COSINE "
+        f"EFC {HNSW_EFC} M {HNSW_M}"
+    )
+
+
+def knn_operator(k: int) -> str:
+    """SurrealQL KNN operator for the ``k`` nearest chunks via the HNSW index.
+
+    SurrealQL doesn't accept parameters inside the operator, so ``k`` and the
+    search width are inlined; the width never drops below ``k``.
+    """
+    return f"<|{k},{max(k, HNSW_EF_SEARCH)}|>"
+
 
 def _split_text(text: str, chunk_size: int = 4000, chunk_overlap: int = 200) -> list[str]:
     """Split text into fixed-size chunks with overlap."""
-    if not text:
-        return []
     step = max(1, chunk_size - chunk_overlap)
-    chunks = []
-    start = 0
-    while start < len(text):
-        chunks.append(text[start : start + chunk_size])
-        start += step
-    return chunks
+    return [text[start : start + chunk_size] for start in range(0, len(text), step)]
+
+
+def _read_note(path: Path) -> tuple[Path, str, str]:
+    """Read a note as (path, text, SHA-256 of its bytes), hashed like sync does."""
+    data = path.read_bytes()
+    return path, data.decode("utf-8"), hashlib.sha256(data).hexdigest()
 
 
 class KGPipeline:
@@ -40,14 +99,17 @@ class KGPipeline:
         self.db = db
         self.notes_path = notes_path
         self._model_name = embedding_model
+        self._dimensions = embedding_dimensions
         self._model = None  # Lazy-loaded on first use
 
         # Ensure the vector index exists. If dimensions changed, recreate it.
+        # The index stays F32: SurrealDB's HNSW has no F16 or 8-bit vector type
+        # (the narrowest is I16), and chunk embeddings are sent and stored as
+        # ordinary number arrays rather than packed bytes, so casting them to
+        # float16/int8 first wouldn't shrink the writes. Changing the type would
+        # also force a full re-embed.
         try:
-            db.query(
-                f"DEFINE INDEX IF NOT EXISTS chunk_embeddings ON TABLE chunk "
-                f"FIELDS embedding HNSW DIMENSION {embedding_dimensions} TYPE F32 DIST COSINE"
-            )
+            db.query(_vector_index_sql(embedding_dimensions))
         except Exception:
             logger.warning(
                 "Vector index incompatible (dimensions changed?) "
@@ -56,75 +118,191 @@ class KGPipeline:
             db.query("REMOVE INDEX IF EXISTS chunk_embeddings ON TABLE chunk")
             db.query("DELETE chunk")
             db.query("UPDATE note SET content_hash = NONE")
-            db.query(
-                f"DEFINE INDEX IF NOT EXISTS chunk_embeddings ON TABLE chunk "
-                f"FIELDS embedding HNSW DIMENSION {embedding_dimensions} TYPE F32 DIST COSINE"
-            )
+            db.query(_vector_index_sql(embedding_dimensions))
 
     def _get_model(self):
-        """Lazy-load the embedding model on first use."""
+        """Lazy-load the embedding model on first use (shared across pipelines)."""
         if self._model is None:
-            from sentence_transformers import SentenceTransformer
-
-            logger.info("Loading embedding model: %s", self._model_name)
-            self._model = SentenceTransformer(self._model_name)
+            self._model = _load_model(self._model_name)
         return self._model
 
     def embed_query(self, text: str) -> list[float]:
         """Embed a text string using the pipeline's embedding model."""
-        return self._get_model().encode(text).tolist()
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed many texts in one model call.
+
+        Batching amortizes per-call model overhead, so callers should gather
+        texts (across notes, where possible) rather than embed them one by one.
+        Embeddings are normalized; the vector index uses cosine distance, so
+        this doesn't change rankings against vectors stored before.
+        """
+        if not texts:
+            return []
+        return (
+            self._get_model()
+            .encode(
+                texts,
+                batch_size=EMBED_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            .tolist()
+        )
+
+    def split_content(self, content: str) -> list[str]:
+        """Split note text into the chunks that get embedded."""
+        return _split_text(content)
+
+    def embed_content(self, content: str) -> tuple[list[str], list[list[float]]]:
+        """Split note text into chunks and embed them. Returns (chunks, embeddings)."""
+        chunks = self.split_content(content)
+        return chunks, self.embed_batch(chunks)
 
     def _write_chunks(
         self,
         relative_path: str,
         texts: list[str],
         embeddings: list[list[float]],
+        content_hash: str | None = None,
     ) -> None:
-        """Write chunk records to SurrealDB."""
-        # UPSERT the note (unifies with structural sync)
-        self.db.query(
-            "UPSERT note SET path = $path, modified_at = time::now() WHERE path = $path",
-            {"path": relative_path},
-        )
+        """Write chunk records to SurrealDB.
+
+        Runs as one transactional script, so a note costs a single round-trip
+        however many chunks it has, and readers never see it half-written.
+        When ``content_hash`` is given it is stored in the same transaction.
+        """
+        self._write_notes([(relative_path, texts, embeddings, content_hash)])
+
+    def _write_notes(
+        self, notes: list[tuple[str, list[str], list[list[float]], str | None]]
+    ) -> None:
+        """Write chunk records for several notes in one transaction.
 
-        # Delete old chunks for this document
-        self.db.query(
-            "DELETE chunk WHERE ->from_document->(note WHERE path = $path)",
-            {"path": relative_path},
+        Each entry is (relative_path, chunks, embeddings, content_hash), as
+        for _write_chunks(). Raises if any statement fails, in which case
+        nothing is written.
+        """
+        # Reject wrong-sized vectors before writing: SurrealDB aborts the
+        # process on the next vector insert after rolling back a transaction
+        # that had already added one to the HNSW index.
+        for relative_path, _, embeddings, _ in notes:
+            for embedding in embeddings:
+                if len(embedding) != self._dimensions:
+                    raise ValueError(
+                        f"Embedding for '{relative_path}' has {len(embedding)} "
+                        f"dimensions, expected {self._dimensions}"
+                    )
+        self.db.execute(
+            "BEGIN TRANSACTION;"
+            "FOR $n IN $notes {"
+            # UPSERT the note (unifies with structural sync)
+            " UPSERT note SET path = $n.path, modified_at = time::now() WHERE path = $n.path;"
+            " IF $n.hash != NONE { UPDATE note SET content_hash = $n.hash WHERE path = $n.path };"
+            " LET $doc = (SELECT VALUE id FROM note WHERE path = $n.path)[0];"
+            # Replace old chunks for this document
+            " DELETE chunk WHERE ->from_document->(note WHERE path = $n.path);"
+            " FOR $c IN $n.chunks {"
+            "  LET $chunk = (CREATE chunk SET"
+            "  text = $c.text, embedding = $c.embedding, idx = $c.idx)[0].id;"
+            "  RELATE $chunk->from_document->$doc;"
+            " };"
+            "};"
+            "COMMIT TRANSACTION;",
+            {
+                "notes": [
+                    {
+                        "path": relative_path,
+                        "hash": content_hash,
+                        "chunks": [
+                            {"text": text, "embedding": embedding, "idx": i}
+                            for i, (text, embedding) in enumerate(
+                                zip(texts, embeddings, strict=True)
+                            )
+                        ],
+                    }
+                    for relative_path, texts, embeddings, content_hash in notes
+                ]
+            },
         )
 
-        # Create new chunks with embeddings
-        for i, (text, embedding) in enumerate(zip(texts, embeddings, strict=True)):
-            self.db.query(
-                "LET $doc = (SELECT VALUE id FROM note WHERE path = $path)[0];"
-                "LET $chunk = (CREATE chunk SET "
-                "text = $text, embedding = $embedding, idx = $index)[0].id;"
-                "RELATE $chunk->from_document->$doc;",
-                {"path": relative_path, "text": text, "embedding": embedding, "index": i},
-            )
+    def _run_sync(self, file_path: str, content: str | None = None) -> None:
+        """Process a single note synchronously: load, split, embed, write chunks.
+
+        Callers that already hold the file's text pass it as ``content`` to
+        skip the read.
 
-    def _run_sync(self, file_path: str) -> None:
-        """Process a single note synchronously: load, split, embed, write chunks."""
+        There is no content-hash gate here: callers ask for a note to be
+        embedded, and sync_semantic() is the path that skips unchanged notes.
+        When the file is read here, its hash is stored with the chunks so that
+        path skips it afterwards.
+        """
         path = Path(file_path)
-        content = path.read_text(encoding="utf-8")
-        relative_path = str(path.relative_to(self.notes_path))
+        if content is None:
+            self._embed_and_write([_read_note(path)])
+        else:
+            self._embed_and_write([(path, content, None)])
 
-        # Split into chunks
-        chunks = _split_text(content)
-        if not chunks:
-            return
+    def run_batch(self, file_paths: list[str]) -> None:
+        """Process several notes with a single embedding call.
 
-        # Embed all chunks
-        embeddings = self._get_model().encode(chunks).tolist()
+        Chunks from every file are embedded together, then written back in
+        one transaction, with each file's content hash.
+        """
+        self._embed_and_write([_read_note(Path(p)) for p in file_paths])
 
-        # Write to database
-        self._write_chunks(relative_path, chunks, embeddings)
+    def _embed_and_write(self, notes: list[tuple[Path, str, str | None]]) -> None:
+        split = [(path, self.split_content(content), sha) for path, content, sha in notes]
+        split = [note for note in split if note[1]]
+        embeddings = self.embed_batch([text for _, chunks, _ in split for text in chunks])
+        writes = []
+        start = 0
+        for path, chunks, sha in split:
+            end = start + len(chunks)
+            relative_path = str(path.relative_to(self.notes_path))
+            writes.append((relative_path, chunks, embeddings[start:end], sha))
+            start = end
+        if writes:
+            self._write_notes(writes)
 
-    async def run_async(self, file_path: str) -> None:
+    async def run_async(self, file_path: str, content: str | None = None) -> None:
         """Process a single note without blocking the event loop."""
         import asyncio
 
-        await asyncio.to_thread(self._run_sync, file_path)
+        await asyncio.to_thread(self._run_sync, file_path, content)
+
+    async def run_batch_async(self, file_paths: list[str]) -> None:
+        """run_batch() without blocking the event loop."""
+        import asyncio
+
+        await asyncio.to_thread(self.run_batch, file_paths)
+
+    async def embed_batch_async(self, texts: list[str]) -> list[list[float]]:
+        """embed_batch() without blocking the event loop."""
+        import asyncio
+
+        return await asyncio.to_thread(self.embed_batch, texts)
+
+    async def write_async(
+        self,
+        relative_path: str,
+        chunks: list[str],
+        embeddings: list[list[float]],
+        content_hash: str | None = None,
+    ) -> None:
+        """_write_chunks() without blocking the event loop."""
+        import asyncio
+
+        await asyncio.to_thread(self._write_chunks, relative_path, chunks, embeddings, content_hash)
+
+    async def write_many_async(
+        self, notes: list[tuple[str, list[str], list[list[float]], str | None]]
+    ) -> None:
+        """_write_notes() without blocking the event loop."""
+        import asyncio
+
+        await asyncio.to_thread(self._write_notes, notes)
 
 
 def create_kg_pipeline(db: GraphDB, notes_path: Path) -> KGPipeline:
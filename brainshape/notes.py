@@ -1,11 +1,22 @@
+import atexit
+import contextlib
+import functools
 import hashlib
 import logging
+import multiprocessing
+import os
 import re
 import shutil
 import sys
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
 from pathlib import Path
 
 import frontmatter
+import yaml
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +26,16 @@ if getattr(sys, "frozen", False):
 else:
     SEED_NOTES_DIR = Path(__file__).resolve().parent.parent / "seed_notes"
 
+# Stdlib re on purpose: none of these patterns can backtrack badly, and
+# RE2's ASCII-only \w would stop matching non-ASCII tags like #café.
 WIKILINK_RE = re.compile(r"\[\[([^\]|]+)(?:\|[^\]]+)?\]\]")
 TAG_RE = re.compile(r"(?:^|\s)#([a-zA-Z][\w/-]*)", re.MULTILINE)
 FENCED_CODE_RE = re.compile(r"^`{3,}[^\n]*\n.*?^`{3,}", re.MULTILINE | re.DOTALL)
+# The "---" delimiter lines python-frontmatter splits YAML frontmatter on
+FRONTMATTER_RE = re.compile(r"^-{3,}\s*$", re.MULTILINE)
+
+# libyaml's C loader when PyYAML was built with it, as python-frontmatter uses
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 # File extensions that indicate embeds (images, attachments), not note links
 _EMBED_EXTENSIONS = frozenset(
@@ -42,7 +60,24 @@ _EMBED_EXTENSIONS = frozenset(
 
 def _strip_fenced_code(text: str) -> str:
     """Remove fenced code blocks so tags inside them aren't extracted."""
-    return FENCED_CODE_RE.sub("", text)
+    # Most notes have no fences; the substring scan is far cheaper than the regex
+    return FENCED_CODE_RE.sub("", text) if "```" in text else text
+
+
+def _split_frontmatter(text: str) -> tuple[dict, str]:
+    """Split *text* into ``(metadata, content)`` the way ``frontmatter.load`` does.
+
+    Works on text that's already been read, so parse_note reads each file
+    once. Raises ``yaml.YAMLError`` on malformed frontmatter.
+    """
+    text = text.strip()
+    if not FRONTMATTER_RE.match(text):
+        return {}, text
+    parts = FRONTMATTER_RE.split(text, 2)
+    if len(parts) < 3:
+        return {}, text
+    metadata = yaml.load(parts[1], Loader=_YAML_LOADER)  # noqa: S506 - a SafeLoader
+    return (metadata if isinstance(metadata, dict) else {}), parts[2].strip()
 
 
 def _clean_wikilink(raw: str) -> str:
@@ -51,14 +86,15 @@ def _clean_wikilink(raw: str) -> str:
     return name.split("/")[-1].strip()
 
 
-def _extract_wikilinks(content: str) -> list[str]:
-    """Extract wikilink targets from content, skipping image/file embeds.
+def _extract_wikilinks(body: str) -> list[str]:
+    """Extract wikilink targets from a note body, skipping image/file embeds.
 
-    Strips fenced code blocks first so ``[[links]]`` inside code aren't treated
+    *body* must already have fenced code blocks stripped (see
+    :func:`_strip_fenced_code`), so ``[[links]]`` inside code aren't treated
     as real wikilinks.
     """
     links = []
-    for raw in WIKILINK_RE.findall(_strip_fenced_code(content)):
+    for raw in WIKILINK_RE.findall(body):
         cleaned = _clean_wikilink(raw)
         if not cleaned:
             continue
@@ -75,15 +111,31 @@ def _ensure_within_notes_dir(notes_path: Path, file_path: Path) -> Path:
     Raises ``ValueError`` if the resolved path escapes the notes directory
     (e.g. via ``../`` traversal sequences).
     """
+    return _check_within(notes_path.resolve(), file_path)
+
+
+def _check_within(root: Path, file_path: Path) -> Path:
+    """:func:`_ensure_within_notes_dir` against an already-resolved *root*.
+
+    Callers that check several paths resolve the notes directory once and
+    use this, so each check only pays for resolving *file_path*.
+    """
     resolved = file_path.resolve()
-    if not resolved.is_relative_to(notes_path.resolve()):
+    if not resolved.is_relative_to(root):
         raise ValueError(f"Path escapes notes directory: {file_path}")
     return resolved
 
 
 def compute_file_hash(file_path: Path) -> str:
-    """SHA-256 hash of a file's raw content."""
-    return hashlib.sha256(file_path.read_bytes()).hexdigest()
+    """SHA-256 hash of a file's raw content.
+
+    Streams the file through ``hashlib.file_digest`` instead of reading it
+    into one bytes object. Unbuffered, so its reads land straight in the
+    digest's buffer. No mmap: a note truncated mid-hash (editor save,
+    PUT /notes) would raise SIGBUS instead of an error.
+    """
+    with file_path.open("rb", buffering=0) as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 
 def parse_note(file_path: Path, notes_path: Path) -> dict:
@@ -92,26 +144,29 @@ def parse_note(file_path: Path, notes_path: Path) -> dict:
     The path stored is relative to notes_path, so it stays consistent
     across devices regardless of where the notes directory is mounted.
     """
+    text = file_path.read_text(encoding="utf-8")
     try:
-        post = frontmatter.load(str(file_path))
-        content = post.content
-        metadata = dict(post.metadata)
-    except Exception:
+        metadata, content = _split_frontmatter(text)
+    except yaml.YAMLError:
         logger.warning("Failed to parse frontmatter in %s, using raw content", file_path.name)
-        content = file_path.read_text(encoding="utf-8")
+        content = text
         metadata = {}
 
+    # Links and tags inside fenced code don't count; strip it once for both
+    body = _strip_fenced_code(content)
+
     # Extract wikilinks: [[Page Name]] or [[Page Name|display text]]
-    links = _extract_wikilinks(content)
+    links = _extract_wikilinks(body)
 
-    # Extract tags from content body (strip fenced code blocks first)
-    body_tags = TAG_RE.findall(_strip_fenced_code(content))
+    # Extract tags from content body
+    body_tags = TAG_RE.findall(body)
 
     # Tags may also be in frontmatter
     raw_fm_tags = metadata.get("tags", [])
     fm_tags: list[str] = [raw_fm_tags] if isinstance(raw_fm_tags, str) else list(raw_fm_tags)
 
-    all_tags = list({t.lower() for t in body_tags + fm_tags})
+    # dict.fromkeys dedupes in first-seen order, so tags come out stable across runs
+    all_tags = list(dict.fromkeys(t.lower() for t in chain(body_tags, fm_tags)))
 
     return {
         "path": str(file_path.relative_to(notes_path)),
@@ -126,19 +181,192 @@ def parse_note(file_path: Path, notes_path: Path) -> dict:
 _TRASH_DIR = ".trash"
 
 
+def _iter_markdown(
+    root: Path, skip: frozenset[str] = frozenset({_TRASH_DIR}), *, skip_hidden: bool = False
+) -> Iterator[os.DirEntry[str]]:
+    """Yield a ``DirEntry`` for every ``.md`` file under *root*, in no particular order.
+
+    Walks with ``os.scandir``, so file types come from the directory listing
+    instead of a ``stat`` per path. Directories named in *skip* (and, with
+    *skip_hidden*, any starting with ``"."``) are pruned rather than walked
+    and filtered afterwards. Like ``Path.rglob``, symlinked directories
+    aren't followed.
+    """
+    stack = [str(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    name = entry.name
+                    if name not in skip and not (skip_hidden and name.startswith(".")):
+                        stack.append(entry.path)
+                elif entry.name.endswith(".md"):
+                    yield entry
+
+
+def _remove_empty_dirs(root: Path) -> None:
+    """Remove the empty directories below *root*, deepest first."""
+    top = str(root)
+    for dirpath, _, _ in os.walk(top, topdown=False):
+        if dirpath != top:
+            # rmdir only succeeds once the directory is empty
+            with contextlib.suppress(OSError):
+                Path(dirpath).rmdir()
+
+
 def list_notes(notes_path: Path) -> list[Path]:
     """List all markdown files in the notes directory, excluding .trash."""
-    return sorted(p for p in notes_path.rglob("*.md") if _TRASH_DIR not in p.parts)
+    return sorted(Path(entry.path) for entry in _iter_markdown(notes_path))
+
+
+def select_notes(notes_path: Path, paths: Iterable[Path]) -> list[Path]:
+    """The existing notes among ``paths``, as list_notes() would list them.
+
+    Lets callers that already know which files changed skip the vault scan.
+    Paths are matched after resolving symlinks (file watchers may report
+    canonical paths) and returned under ``notes_path``.
+    """
+    root = notes_path.resolve()
+    selected = set()
+    for p in paths:
+        if p.suffix != ".md":
+            continue
+        try:
+            relative = p.resolve().relative_to(root)
+        except ValueError:
+            continue
+        note = notes_path / relative
+        if _TRASH_DIR not in relative.parts and note.is_file():
+            selected.add(note)
+    return sorted(selected)
+
+
+def list_note_entries(notes_path: Path) -> list[tuple[str, str]]:
+    """List ``(relative_path, title)`` pairs for all notes, excluding .trash.
+
+    Same files and order as :func:`list_notes`, but built in a single
+    ``os.scandir`` pass: the relative path is sliced off ``DirEntry.path``
+    and the title from ``DirEntry.name``, so no per-note ``Path`` is created.
+    """
+    base_len = len(str(notes_path)) + 1
+    entries = [(entry.path[base_len:], entry.name[:-3]) for entry in _iter_markdown(notes_path)]
+    # Sort by path components like list_notes, without building Path objects
+    entries.sort(key=lambda e: e[0].split(os.sep))  # noqa: PTH206
+    return entries
+
+
+def has_notes(notes_path: Path) -> bool:
+    """Return True if *notes_path* contains at least one note outside .trash.
+
+    Stops at the first ``.md`` file found instead of listing the whole vault.
+    """
+    return next(_iter_markdown(notes_path), None) is not None
+
+
+def note_dir_mtimes(notes_path: Path) -> dict[str, int]:
+    """Map every directory under *notes_path* (itself included, .trash excluded)
+    to its ``st_mtime_ns``.
+
+    A directory's mtime changes whenever an entry is added, removed or renamed
+    in it, so comparing this map is enough to tell whether :func:`list_notes`
+    would return something different.
+    """
+    root = str(notes_path)
+    mtimes: dict[str, int] = {}
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns  # noqa: PTH116 - str paths from scandir
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False) and entry.name != _TRASH_DIR:
+                    stack.append(entry.path)
+    return mtimes
+
+
+# Vaults with at least this many notes are parsed in a process pool; below
+# it, handing work to the workers costs more than the parsing saves.
+_PARALLEL_PARSE_THRESHOLD = 200
+
+# Long-lived parse pool, created on first use. "spawn" never forks the
+# server, which is multi-threaded (uvicorn, SurrealDB runtime, watchdog)
+# and could deadlock a forked child. Workers only need this module, and
+# each pays its start-up imports once instead of once per sync.
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_parse_pool.shutdown, cancel_futures=True)
+        return _parse_pool
+
+
+def _discard_parse_pool() -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+
+def _gil_enabled() -> bool:
+    """False on a free-threaded build running without the GIL."""
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def _try_parse_note(file_path: Path, notes_path: Path) -> dict | None:
+    """parse_note() that returns None instead of raising (picklable for workers)."""
+    try:
+        return parse_note(file_path, notes_path)
+    except Exception:
+        return None
 
 
 def read_all_notes(notes_path: Path) -> list[dict]:
-    """Parse all notes in the notes directory. Skips notes that fail to parse."""
-    notes = []
-    for p in list_notes(notes_path):
+    """Parse all notes in the notes directory. Skips notes that fail to parse.
+
+    Frontmatter parsing and link/tag extraction are CPU-bound, so large
+    vaults are spread across a shared process pool. Threads would only
+    overlap the file reads while parsing holds the GIL; on a free-threaded
+    build they parse in parallel too, without the workers' start-up and
+    pickling, so they are used instead.
+    """
+    files = list_notes(notes_path)
+    parse = functools.partial(_try_parse_note, notes_path=notes_path)
+    results: list[dict | None] | None = None
+    if len(files) >= _PARALLEL_PARSE_THRESHOLD and not _gil_enabled():
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2)) as executor:
+            results = list(executor.map(parse, files))
+    elif len(files) >= _PARALLEL_PARSE_THRESHOLD:
         try:
-            notes.append(parse_note(p, notes_path))
-        except Exception:
+            results = list(_get_parse_pool().map(parse, files, chunksize=32))
+        except (OSError, BrokenProcessPool) as exc:
+            logger.warning("Parallel note parsing unavailable (%s), parsing serially", exc)
+            _discard_parse_pool()
+    if results is None:
+        results = [parse(p) for p in files]
+
+    notes = []
+    for p, note in zip(files, results, strict=True):
+        if note is None:
             logger.warning("Skipping unreadable note: %s", p.name)
+        else:
+            notes.append(note)
     return notes
 
 
@@ -183,7 +411,7 @@ def rewrite_note(notes_path: Path, title: str, new_content: str, relative_path:
     # still unions body + frontmatter tags at read time, so user-added
     # frontmatter-only tags are preserved for display/graph purposes.
     body_tags = TAG_RE.findall(_strip_fenced_code(new_content))
-    post.metadata["tags"] = list({t.lower() for t in body_tags})
+    post.metadata["tags"] = list(dict.fromkeys(t.lower() for t in body_tags))
 
     with file_path.open("w") as f:
         f.write(frontmatter.dumps(post))
@@ -205,7 +433,11 @@ def move_to_trash(notes_path: Path, relative_path: str) -> Path:
 
     Appends a timestamp suffix on name collision. Returns the new trash path.
     """
-    file_path = _ensure_within_notes_dir(notes_path, notes_path / relative_path)
+    return _move_to_trash(notes_path, notes_path.resolve(), relative_path)
+
+
+def _move_to_trash(notes_path: Path, root: Path, relative_path: str) -> Path:
+    file_path = _check_within(root, notes_path / relative_path)
     if not file_path.exists():
         raise FileNotFoundError(f"Note not found at {relative_path}")
 
@@ -229,7 +461,7 @@ def list_trash(notes_path: Path) -> list[Path]:
     trash_dir = notes_path / _TRASH_DIR
     if not trash_dir.exists():
         return []
-    return sorted(trash_dir.rglob("*.md"))
+    return sorted(Path(entry.path) for entry in _iter_markdown(trash_dir, frozenset()))
 
 
 def restore_from_trash(notes_path: Path, trash_relative_path: str) -> Path:
@@ -265,15 +497,11 @@ def empty_trash(notes_path: Path) -> int:
         return 0
 
     count = 0
-    for f in trash_dir.rglob("*.md"):
-        f.unlink()
+    for entry in _iter_markdown(trash_dir, frozenset()):
+        Path(entry.path).unlink()
         count += 1
 
-    # Remove empty directories
-    for d in sorted(trash_dir.rglob("*"), reverse=True):
-        if d.is_dir() and not any(d.iterdir()):
-            d.rmdir()
-
+    _remove_empty_dirs(trash_dir)
     return count
 
 
@@ -286,15 +514,23 @@ def list_folders(notes_path: Path) -> list[str]:
 
     Excludes ``.trash`` and hidden directories (names starting with ``"."``).
     """
+    base_len = len(str(notes_path)) + 1
     folders: list[str] = []
-    for d in sorted(notes_path.rglob("*")):
-        if not d.is_dir():
-            continue
-        rel = str(d.relative_to(notes_path))
-        parts = rel.split("/") if "/" in rel else [rel]
-        if any(p.startswith(".") for p in parts):
+    stack = [str(notes_path)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
             continue
-        folders.append(rel)
+        with it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                folders.append(entry.path[base_len:])
+                # Symlinked folders are listed but not walked, as with rglob
+                if not entry.is_symlink():
+                    stack.append(entry.path)
+    folders.sort(key=lambda rel: rel.split(os.sep))  # noqa: PTH206
     return folders
 
 
@@ -317,7 +553,8 @@ def create_folder(notes_path: Path, folder_path: str) -> Path:
 
 def rename_folder(notes_path: Path, old_rel_path: str, new_name: str) -> tuple[str, str]:
     """Rename a folder's leaf directory. Returns ``(old_rel, new_rel)``."""
-    old_path = _ensure_within_notes_dir(notes_path, notes_path / old_rel_path)
+    root = notes_path.resolve()
+    old_path = _check_within(root, notes_path / old_rel_path)
     if not old_path.is_dir():
         raise FileNotFoundError(f"Folder not found: {old_rel_path}")
 
@@ -328,7 +565,7 @@ def rename_folder(notes_path: Path, old_rel_path: str, new_name: str) -> tuple[s
         raise ValueError("Folder name contains invalid characters")
 
     new_path = old_path.parent / new_name
-    _ensure_within_notes_dir(notes_path, new_path)
+    _check_within(root, new_path)
     if new_path.exists():
         raise FileExistsError(f"A folder named '{new_name}' already exists")
 
@@ -342,20 +579,18 @@ def delete_folder(notes_path: Path, folder_rel_path: str) -> list[Path]:
 
     Returns list of trash paths for the moved files.
     """
-    folder = _ensure_within_notes_dir(notes_path, notes_path / folder_rel_path)
+    root = notes_path.resolve()
+    folder = _check_within(root, notes_path / folder_rel_path)
     if not folder.is_dir():
         raise FileNotFoundError(f"Folder not found: {folder_rel_path}")
 
     trashed: list[Path] = []
-    for md in sorted(folder.rglob("*.md")):
+    for md in sorted(Path(entry.path) for entry in _iter_markdown(folder, frozenset())):
         rel = str(md.relative_to(notes_path))
-        trash_path = move_to_trash(notes_path, rel)
+        trash_path = _move_to_trash(notes_path, root, rel)
         trashed.append(trash_path)
 
-    # Remove empty dirs bottom-up
-    for d in sorted(folder.rglob("*"), reverse=True):
-        if d.is_dir() and not any(d.iterdir()):
-            d.rmdir()
+    _remove_empty_dirs(folder)
     if folder.exists() and not any(folder.iterdir()):
         folder.rmdir()
 
@@ -370,17 +605,17 @@ def move_note(notes_path: Path, old_relative_path: str, new_folder: str) -> str:
     doesn't exist, ``FileExistsError`` on name collision, ``ValueError`` on
     path traversal.
     """
-    old_path = _ensure_within_notes_dir(notes_path, notes_path / old_relative_path)
+    root = notes_path.resolve()
+    old_path = _check_within(root, notes_path / old_relative_path)
     if not old_path.exists():
         raise FileNotFoundError(f"Note not found at {old_relative_path}")
 
     dest_dir = notes_path / new_folder if new_folder else notes_path
-    dest_dir = _ensure_within_notes_dir(notes_path, dest_dir)
+    dest_dir = _check_within(root, dest_dir)
     new_path = dest_dir / old_path.name
-    _ensure_within_notes_dir(notes_path, new_path)
 
-    # No-op when source and destination are the same
-    if old_path.resolve() == new_path.resolve():
+    # No-op when source and destination are the same (old_path is resolved)
+    if old_path == _check_within(root, new_path):
         return old_relative_path
 
     if new_path.exists():
@@ -411,7 +646,8 @@ def rename_note(notes_path: Path, old_relative_path: str, new_title: str) -> tup
     if len(new_title.encode("utf-8")) > 255:
         raise ValueError("Title is too long")
 
-    old_path = _ensure_within_notes_dir(notes_path, notes_path / old_relative_path)
+    root = notes_path.resolve()
+    old_path = _check_within(root, notes_path / old_relative_path)
     if not old_path.exists():
         raise FileNotFoundError(f"Note not found at {old_relative_path}")
 
@@ -419,7 +655,7 @@ def rename_note(notes_path: Path, old_relative_path: str, new_title: str) -> tup
     new_path = old_path.with_name(f"{new_title}.md")
 
     # Verify new path stays within notes directory
-    _ensure_within_notes_dir(notes_path, new_path)
+    _check_within(root, new_path)
 
     if new_path.exists():
         raise FileExistsError(f"A note named '{new_title}' already exists")
@@ -435,21 +671,27 @@ def rewrite_wikilinks(notes_path: Path, old_title: str, new_title: str) -> int:
     Returns count of files modified.
     """
     pattern = re.compile(r"\[\[" + re.escape(old_title) + r"(\|[^\]]+)?\]\]")
+    # Every match starts with this, so notes without it are skipped before
+    # being decoded or handed to the regex
+    needle = f"[[{old_title}".encode()
+
+    def _replacer(m: re.Match) -> str:
+        alias = m.group(1) or ""
+        return f"[[{new_title}{alias}]]"
+
     count = 0
     for note_path in list_notes(notes_path):
         try:
-            content = note_path.read_text(encoding="utf-8")
+            raw = note_path.read_bytes()
         except OSError:
             continue
-        if not pattern.search(content):
+        if needle not in raw:
             continue
-
-        def _replacer(m: re.Match) -> str:
-            alias = m.group(1) or ""
-            return f"[[{new_title}{alias}]]"
-
-        new_content = pattern.sub(_replacer, content)
-        note_path.write_text(new_content, encoding="utf-8")
+        new_content, replaced = pattern.subn(_replacer, raw.decode("utf-8"))
+        if not replaced:
+            continue
+        # Bytes in, bytes out: the note keeps its own line endings
+        note_path.write_bytes(new_content.encode("utf-8"))
         count += 1
 
     return count
@@ -463,14 +705,15 @@ def init_notes(notes_path: Path) -> int:
     """
     notes_path.mkdir(parents=True, exist_ok=True)
 
-    if any(notes_path.rglob("*.md")):
+    if next(_iter_markdown(notes_path, frozenset()), None) is not None:
         return 0
 
     if not SEED_NOTES_DIR.is_dir():
         return 0
 
     copied = 0
-    for src in SEED_NOTES_DIR.rglob("*.md"):
+    for entry in _iter_markdown(SEED_NOTES_DIR, frozenset()):
+        src = Path(entry.path)
         relative = src.relative_to(SEED_NOTES_DIR)
         dest = notes_path / relative
         dest.parent.mkdir(parents=True, exist_ok=True)
@@ -497,10 +740,11 @@ _SKIP_DIRS = frozenset(
 def import_vault(source_path: Path, notes_path: Path) -> dict:
     """Import markdown notes from a source directory into the Brainshape notes directory.
 
-    Copies .md files preserving folder structure.  Skips hidden directories
-    and known non-note directories (.obsidian, .trash, .git, etc.).
+    Copies .md files preserving folder structure.  Hidden directories and
+    known non-note directories (.obsidian, .trash, .git, etc.) aren't walked.
 
-    Returns stats dict with files_copied, files_skipped, folders_created.
+    Returns stats dict with files_copied, files_skipped (notes already at the
+    destination), folders_created.
     """
     source_path = source_path.expanduser().resolve()
     notes_path = notes_path.expanduser().resolve()
@@ -519,26 +763,24 @@ def import_vault(source_path: Path, notes_path: Path) -> dict:
     notes_path.mkdir(parents=True, exist_ok=True)
 
     stats: dict[str, int] = {"files_copied": 0, "files_skipped": 0, "folders_created": 0}
-    created_dirs: set[Path] = set()
+    # Every destination folder is stat'ed (and created) once, not once per note
+    seen_dirs: set[Path] = set()
 
-    for md_file in source_path.rglob("*.md"):
+    for entry in _iter_markdown(source_path, _SKIP_DIRS, skip_hidden=True):
+        md_file = Path(entry.path)
         relative = md_file.relative_to(source_path)
-        parts = relative.parts
-        # Skip files inside hidden or excluded directories
-        if any(part.startswith(".") or part in _SKIP_DIRS for part in parts[:-1]):
-            stats["files_skipped"] += 1
-            continue
-
         dest = notes_path / relative
-        if dest.parent not in created_dirs and not dest.parent.exists():
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            created_dirs.add(dest.parent)
-            stats["folders_created"] += 1
+        if dest.parent not in seen_dirs:
+            seen_dirs.add(dest.parent)
+            if not dest.parent.exists():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                stats["folders_created"] += 1
 
         if dest.exists():
             stats["files_skipped"] += 1
             continue
 
+        # copy2 goes through shutil's sendfile/fcopyfile fast path for the data
         shutil.copy2(md_file, dest)
         stats["files_copied"] += 1
 
@@ -2,26 +2,32 @@
 
 import asyncio
 import contextlib
-import json
 import logging
 import os
 import tempfile
+import threading
 import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+import orjson
+from fastapi import FastAPI, File, Form, HTTPException, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 
 from brainshape.agent import create_brainshape_agent
 from brainshape.claude_code import clear_sessions as clear_claude_sessions
+from brainshape.claude_code import has_session as has_claude_session
 from brainshape.claude_code import stream_claude_code_response
 from brainshape.config import settings
 from brainshape.graph_db import GraphDB
-from brainshape.kg_pipeline import KGPipeline, create_kg_pipeline
+from brainshape.kg_pipeline import KGPipeline, create_kg_pipeline, knn_operator
 from brainshape.mcp_client import close_mcp_client
 from brainshape.mcp_client import load_mcp_tools as load_mcp
 from brainshape.mcp_server import create_mcp_server
@@ -31,12 +37,13 @@ from brainshape.notes import (
     delete_folder,
     delete_note,
     empty_trash,
+    has_notes,
     import_vault,
     init_notes,
     list_folders,
-    list_notes,
-    list_trash,
+    list_note_entries,
     move_note,
+    note_dir_mtimes,
     parse_note,
     rename_folder,
     rename_note,
@@ -53,6 +60,7 @@ from brainshape.sync import (
     sync_semantic_async,
     sync_structural,
 )
+from brainshape.tools import clear_search_cache
 from brainshape.watcher import start_watcher
 
 logger = logging.getLogger(__name__)
@@ -65,10 +73,24 @@ _observer = None  # watchdog observer
 _ready = False  # True once background initialization completes
 
 # In-memory session store: session_id → {"config": LangGraph config, "last_used": timestamp}
-_sessions: dict[str, dict] = {}
+# Kept in least-recently-used order so eviction only ever looks at the front.
+# /agent/init runs in the threadpool while /agent/message runs on the event
+# loop, so reordering/eviction is serialized by _sessions_lock. Lookups stay
+# lock-free: a single dict.get is atomic under the GIL.
+_sessions: OrderedDict[str, dict] = OrderedDict()
+_sessions_lock = threading.Lock()
 _SESSION_TTL = 3600  # 1 hour
 _SESSION_MAX = 100
 
+# Agent/pipeline hot-reload runs in the background after PUT /settings;
+# clients poll GET /settings/reload/status for completion.
+_reload_state: dict = {"status": "ready"}
+_reload_task: asyncio.Task | None = None
+
+# Cached GET /notes/files listing: (notes_path, directory mtimes, note entries).
+# Reused while no directory in the vault has changed since it was built.
+_notes_cache: tuple[str, dict[str, int], list[tuple[str, str]]] | None = None
+
 
 async def _initialize_backend():
     """Heavy initialization that runs in a background task after the server starts."""
@@ -99,25 +121,22 @@ async def _initialize_backend():
 
         notes_path = Path(get_notes_path()).expanduser()
         init_notes(notes_path)
-        if notes_path.exists() and _db is not None:
-            notes = list_notes(notes_path)
-            if notes:
-                sync_structural(_db, notes_path)
-                if _pipeline is not None:
-                    await sync_semantic_async(_db, _pipeline, notes_path)
+        if notes_path.exists() and _db is not None and has_notes(notes_path):
+            sync_structural(_db, notes_path)
+            if _pipeline is not None:
+                await sync_semantic_async(_db, _pipeline, notes_path)
 
         # Start file watcher for auto-sync
         if notes_path.exists() and _db is not None:
             db = _db  # local binding for closure type narrowing
 
-            def on_notes_changed():
-                sync_structural(db, notes_path)
+            def on_notes_changed(changed: set[Path]):
+                sync_structural(db, notes_path, changed)
                 if _pipeline is not None:
-                    import threading
-
                     threading.Thread(
                         target=sync_semantic,
                         args=(db, _pipeline, notes_path),
+                        kwargs={"changed": changed},
                         daemon=True,
                     ).start()
 
@@ -144,6 +163,16 @@ async def lifespan(app: FastAPI):
         with contextlib.suppress(asyncio.CancelledError):
             await init_task
 
+    if _reload_task is not None and not _reload_task.done():
+        _reload_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _reload_task
+
+    for task in list(_sync_tasks):
+        task.cancel()
+    if _sync_tasks:
+        await asyncio.gather(*_sync_tasks, return_exceptions=True)
+
     if _observer is not None:
         _observer.stop()
     await close_mcp_client()
@@ -151,7 +180,18 @@ async def lifespan(app: FastAPI):
         _db.close()
 
 
-app = FastAPI(title="Brainshape", lifespan=lifespan)
+class _ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson instead of the stdlib encoder.
+
+    Graph and note-listing payloads run to hundreds of objects; orjson encodes
+    them several times faster. Unknown types fall back to ``str``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+app = FastAPI(title="Brainshape", lifespan=lifespan, default_response_class=_ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,  # type: ignore[arg-type]  # Starlette middleware typing is too strict for ty
@@ -230,6 +270,7 @@ class UpdateSettingsRequest(BaseModel):
     transcription_model: str | None = None
     embedding_model: str | None = None
     embedding_dimensions: int | None = None
+    semantic_sync_concurrency: int | None = None
     mcp_servers: list[dict] | None = None
     theme: dict | None = None
     custom_themes: list[dict] | None = None
@@ -270,26 +311,76 @@ def get_config():
 
 
 def _evict_stale_sessions() -> None:
-    """Remove sessions older than TTL and enforce max count."""
+    """Remove sessions older than TTL and enforce max count.
+
+    ``_sessions`` is ordered oldest-first, so both checks stop at the first
+    session that is still fresh instead of scanning or sorting the store.
+    Callers must hold ``_sessions_lock``.
+    """
     now = time.monotonic()
-    expired = [sid for sid, s in _sessions.items() if now - s["last_used"] > _SESSION_TTL]
-    for sid in expired:
+    while _sessions:
+        sid, oldest = next(iter(_sessions.items()))
+        if now - oldest["last_used"] <= _SESSION_TTL:
+            break
         del _sessions[sid]
     # If still over limit, remove oldest
-    if len(_sessions) > _SESSION_MAX:
-        by_age = sorted(_sessions, key=lambda k: _sessions[k]["last_used"])
-        for sid in by_age[: len(_sessions) - _SESSION_MAX]:
-            del _sessions[sid]
+    while len(_sessions) > _SESSION_MAX:
+        _sessions.popitem(last=False)
 
 
-@app.post("/agent/init")
-def agent_init():
-    _evict_stale_sessions()
-    session_id = str(uuid.uuid4())
-    _sessions[session_id] = {
+# Keep-alive comment interval for agent streams, so proxies don't drop the
+# connection during long tool calls, and how long a single send may block
+# on a slow client before the stream is abandoned.
+_SSE_PING_SECONDS = 15
+_SSE_SEND_TIMEOUT = 30
+
+
+def _sse_response(events) -> EventSourceResponse:
+    """Wrap an event generator in an unbuffered, keep-alive SSE response."""
+    return EventSourceResponse(
+        events,
+        ping=_SSE_PING_SECONDS,
+        send_timeout=_SSE_SEND_TIMEOUT,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _content_text(content) -> str:
+    """Concatenate the text of an AI message chunk's ``content``.
+
+    Content is either a plain string or a list of ``str`` / ``{"type": ...}``
+    blocks. Uses exact ``type()`` checks since this runs once per streamed token.
+    """
+    kind = type(content)
+    if kind is str:
+        return content
+    if kind is not list:
+        return ""
+    parts = []
+    for block in content:
+        block_kind = type(block)
+        if block_kind is str:
+            parts.append(block)
+        elif block_kind is dict and block.get("type") == "text":
+            parts.append(block["text"])
+    return "".join(parts)
+
+
+def _register_session(session_id: str) -> dict:
+    session = {
         "config": {"configurable": {"thread_id": session_id}},
         "last_used": time.monotonic(),
     }
+    with _sessions_lock:
+        _evict_stale_sessions()
+        _sessions[session_id] = session
+    return session
+
+
+@app.post("/agent/init")
+def agent_init():
+    session_id = str(uuid.uuid4())
+    _register_session(session_id)
     return {"session_id": session_id}
 
 
@@ -297,8 +388,14 @@ def agent_init():
 async def agent_message(req: MessageRequest):
     session = _sessions.get(req.session_id)
     if session is None:
-        raise HTTPException(status_code=404, detail="Session not found")
+        # Claude Code conversations outlive this store (restart or idle
+        # eviction): the CLI still has the history, so pick the session back up
+        if not has_claude_session(req.session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = _register_session(req.session_id)
     session["last_used"] = time.monotonic()
+    with _sessions_lock, contextlib.suppress(KeyError):  # evicted since the lookup
+        _sessions.move_to_end(req.session_id)
     config = session["config"]
 
     # Branch based on LLM provider
@@ -321,33 +418,26 @@ async def agent_message(req: MessageRequest):
                 if msg_chunk.type != "AIMessageChunk":
                     continue
                 # Tool call chunks
-                if hasattr(msg_chunk, "tool_call_chunks") and msg_chunk.tool_call_chunks:
-                    for tc in msg_chunk.tool_call_chunks:
+                tool_call_chunks = getattr(msg_chunk, "tool_call_chunks", None)
+                if tool_call_chunks:
+                    for tc in tool_call_chunks:
                         if tc.get("name"):
                             # Only emit on first chunk (has name); args stream
                             # incrementally and aren't needed for the UI indicator.
                             yield {
                                 "event": "tool_call",
-                                "data": json.dumps({"name": tc["name"], "args": {}}),
+                                "data": orjson.dumps({"name": tc["name"], "args": {}}).decode(),
                             }
                 # Text content token
                 elif msg_chunk.content:
-                    text = ""
-                    if isinstance(msg_chunk.content, str):
-                        text = msg_chunk.content
-                    elif isinstance(msg_chunk.content, list):
-                        for block in msg_chunk.content:
-                            if isinstance(block, dict) and block.get("type") == "text":
-                                text += block["text"]
-                            elif isinstance(block, str):
-                                text += block
+                    text = _content_text(msg_chunk.content)
                     if text:
-                        yield {"event": "text", "data": json.dumps(text)}
+                        yield {"event": "text", "data": orjson.dumps(text).decode()}
         except Exception as e:
             yield {"event": "error", "data": str(e)}
         yield {"event": "done", "data": ""}
 
-    return EventSourceResponse(event_generator())
+    return _sse_response(event_generator())
 
 
 async def _agent_message_claude_code(req: MessageRequest):
@@ -370,7 +460,7 @@ async def _agent_message_claude_code(req: MessageRequest):
             yield {"event": "error", "data": str(e)}
             yield {"event": "done", "data": ""}
 
-    return EventSourceResponse(event_generator())
+    return _sse_response(event_generator())
 
 
 # --- Notes ---
@@ -380,16 +470,38 @@ def _notes_path() -> Path:
     return Path(get_notes_path()).expanduser()
 
 
+def _cached_note_entries(notes_path: Path) -> list[tuple[str, str]]:
+    """Return ``list_note_entries(notes_path)``, reusing the last result when
+    no directory mtime in the vault has changed.
+
+    Validating a hit costs one ``stat`` per directory instead of a full walk.
+    """
+    global _notes_cache
+    root = str(notes_path)
+    if _notes_cache is not None and _notes_cache[0] == root:
+        mtimes = _notes_cache[1]
+        try:
+            if all(os.stat(d).st_mtime_ns == m for d, m in mtimes.items()):  # noqa: PTH116
+                return _notes_cache[2]
+        except OSError:
+            pass
+    mtimes = note_dir_mtimes(notes_path)
+    entries = list_note_entries(notes_path)
+    _notes_cache = (root, mtimes, entries)
+    return entries
+
+
+def _invalidate_notes_cache() -> None:
+    global _notes_cache
+    _notes_cache = None
+
+
 @app.get("/notes/files")
 def notes_files():
     notes_path = _notes_path()
     if not notes_path.exists():
         return {"files": [], "folders": []}
-    note_list = list_notes(notes_path)
-    files = []
-    for note in note_list:
-        rel = str(note.relative_to(notes_path))
-        files.append({"path": rel, "title": note.stem})
+    files = [{"path": rel, "title": title} for rel, title in _cached_note_entries(notes_path)]
     folders = list_folders(notes_path)
     return {"files": files, "folders": folders}
 
@@ -420,6 +532,9 @@ def notes_create(req: CreateNoteRequest):
             tags=req.tags if req.tags else None,
             metadata=req.metadata,
         )
+        _invalidate_notes_cache()
+        # The watcher's sync clears it again once the graph has caught up
+        clear_search_cache()
         rel = str(file_path.relative_to(notes_path))
         return {"path": rel, "title": req.title}
     except ValueError:
@@ -434,6 +549,7 @@ def notes_create_folder(req: CreateFolderRequest):
     notes_path = _notes_path()
     try:
         folder_path = create_folder(notes_path, req.path)
+        _invalidate_notes_cache()
         rel = str(folder_path.relative_to(notes_path))
         return {"path": rel}
     except ValueError as e:
@@ -451,6 +567,7 @@ def notes_rename_folder(path: str, req: RenameFolderRequest):
         raise HTTPException(status_code=409, detail=str(e)) from None
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from None
+    _invalidate_notes_cache()
 
     if _db is not None:
         sync_structural(_db, notes_path)
@@ -467,6 +584,7 @@ def notes_delete_folder(path: str):
         raise HTTPException(status_code=404, detail="Folder not found") from None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid path") from None
+    _invalidate_notes_cache()
 
     if _db is not None:
         sync_structural(_db, notes_path)
@@ -475,19 +593,23 @@ def notes_delete_folder(path: str):
 
 
 def _delete_note_from_graph(db: GraphDB, path: str) -> None:
-    """Remove a note and all its edges from the graph."""
-    db.query(
-        "DELETE chunk WHERE ->from_document->(note WHERE path = $path)",
+    """Remove a note and all its edges from the graph in a single round-trip."""
+    # Clean edges from all relation tables (structural + custom agent-created)
+    edge_deletes = "".join(
+        f"DELETE {edge_table} WHERE in = $nid OR out = $nid;"
+        for edge_table in db.get_relation_tables(exclude_internal=False)
+    )
+    # execute() checks every statement, not just the first
+    db.execute(
+        "LET $nid = (SELECT VALUE id FROM note WHERE path = $path)[0];"
+        "DELETE chunk WHERE ->from_document->(note WHERE path = $path);"
+        f"{edge_deletes}"
+        "DELETE note WHERE path = $path;"
+        # Clean orphan tags with no remaining edges
+        "DELETE tag WHERE (SELECT VALUE id FROM tagged_with WHERE out = tag.id) = [];",
         {"path": path},
     )
-    nid_q = "(SELECT VALUE id FROM note WHERE path = $path)[0]"
-    # Clean edges from all relation tables (structural + custom agent-created)
-    for edge_table in db.get_relation_tables(exclude_internal=False):
-        db.query(f"DELETE {edge_table} WHERE in = {nid_q}", {"path": path})
-        db.query(f"DELETE {edge_table} WHERE out = {nid_q}", {"path": path})
-    db.query("DELETE note WHERE path = $path", {"path": path})
-    # Clean orphan tags with no remaining edges
-    db.query("DELETE tag WHERE (SELECT VALUE id FROM tagged_with WHERE out = tag.id) = []")
+    clear_search_cache()
 
 
 @app.delete("/notes/file/{path:path}")
@@ -499,10 +621,16 @@ def notes_delete(path: str):
         raise HTTPException(status_code=404, detail="Note not found") from None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid path") from None
+    _invalidate_notes_cache()
 
     # Clean up graph (skip if DB unavailable — will be cleaned on next sync)
     if _db is not None:
-        _delete_note_from_graph(_db, path)
+        try:
+            _delete_note_from_graph(_db, path)
+        except RuntimeError as e:
+            raise HTTPException(
+                status_code=500, detail=f"Note trashed, but graph cleanup failed: {e}"
+            ) from None
     return {"status": "ok"}
 
 
@@ -518,6 +646,7 @@ def notes_rename(path: str, req: RenameNoteRequest):
         raise HTTPException(status_code=409, detail=str(e)) from None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid path or title") from None
+    _invalidate_notes_cache()
 
     new_rel_path = str(new_path.relative_to(notes_path))
 
@@ -533,6 +662,7 @@ def notes_rename(path: str, req: RenameNoteRequest):
                 {"old_path": path, "new_path": new_rel_path, "new_title": req.new_title},
             )
             _sync_structural_unlocked(_db, notes_path)
+        clear_search_cache()
 
     return {
         "path": new_rel_path,
@@ -554,6 +684,7 @@ def notes_move(path: str, req: MoveNoteRequest):
         raise HTTPException(status_code=409, detail=str(e)) from None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid path") from None
+    _invalidate_notes_cache()
 
     # Hold the structural lock around UPDATE + sync so the watcher's
     # sync_structural cannot interleave and create a duplicate node.
@@ -564,6 +695,7 @@ def notes_move(path: str, req: MoveNoteRequest):
                 {"old_path": path, "new_path": new_rel_path},
             )
             _sync_structural_unlocked(_db, notes_path)
+        clear_search_cache()
 
     return {"path": new_rel_path, "title": Path(new_rel_path).stem}
 
@@ -581,6 +713,7 @@ def notes_update(path: str, req: UpdateNoteRequest):
     title = file_path.stem
     try:
         rewrite_note(notes_path, title, req.content, relative_path=path)
+        clear_search_cache()
         return {"path": path, "title": title}
     except (FileNotFoundError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid path") from None
@@ -592,13 +725,8 @@ def notes_update(path: str, req: UpdateNoteRequest):
 @app.get("/notes/trash")
 def notes_trash():
     """List all notes in the trash."""
-    notes_path = _notes_path()
-    trash_notes = list_trash(notes_path)
-    trash_dir = notes_path / ".trash"
-    files = []
-    for note in trash_notes:
-        rel = str(note.relative_to(trash_dir))
-        files.append({"path": rel, "title": note.stem})
+    trash_dir = _notes_path() / ".trash"
+    files = [{"path": rel, "title": title} for rel, title in list_note_entries(trash_dir)]
     return {"files": files}
 
 
@@ -616,6 +744,7 @@ def notes_restore(path: str):
         ) from None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid path") from None
+    _invalidate_notes_cache()
 
     rel = str(restored_path.relative_to(notes_path))
 
@@ -634,13 +763,14 @@ def notes_empty_trash():
 
     # Clean orphan graph nodes: remove notes that no longer exist on disk
     if _db is not None:
-        existing_paths = {str(f.relative_to(notes_path)) for f in list_notes(notes_path)}
+        existing_paths = {rel for rel, _ in list_note_entries(notes_path)}
         stored = _db.query("SELECT path FROM note WHERE path != NONE")
         for row in stored:
             if row.get("path") and row["path"] not in existing_paths:
                 _delete_note_from_graph(_db, row["path"])
         # Also clean orphan tags with no remaining edges
         _db.query("DELETE tag WHERE (SELECT VALUE id FROM tagged_with WHERE out = tag.id) = []")
+        clear_search_cache()
 
     return {"status": "ok", "deleted": count}
 
@@ -657,30 +787,45 @@ def _require_db() -> GraphDB:
 @app.get("/graph/stats")
 def graph_stats():
     db = _require_db()
+    core_tables = ("note", "tag", "memory", "chunk")
+    custom_tables = db.get_custom_node_tables()
+    edge_tables = db.get_relation_tables(exclude_internal=False)
+
+    # Every count is an independent read, so fold them into one RETURN object
+    # and pay a single round-trip instead of one per table.
+    def count_expr(table: str) -> str:
+        return f"(SELECT count() AS count FROM {table} GROUP ALL)[0].count ?? 0"
+
+    fields = [f"n{i}: {count_expr(t)}" for i, t in enumerate(core_tables)]
+    fields += [f"c{i}: {count_expr(t)}" for i, t in enumerate(custom_tables)]
+    fields += [f"e{i}: {count_expr(t)}" for i, t in enumerate(edge_tables)]
+    result = db.query("RETURN {" + ", ".join(fields) + "}")
+    if isinstance(result, list):
+        result = result[0] if result else {}
+    if not isinstance(result, dict):
+        result = {}
+
     # Count each core node table
-    node_counts = {}
-    for table in ("note", "tag", "memory", "chunk"):
-        rows = db.query(f"SELECT count() AS count FROM {table} GROUP ALL")
-        node_counts[table.capitalize()] = rows[0]["count"] if rows else 0
+    node_counts = {t.capitalize(): result.get(f"n{i}") or 0 for i, t in enumerate(core_tables)}
 
     # Count custom node tables (person, project, etc.)
-    for table in db.get_custom_node_tables():
-        rows = db.query(f"SELECT count() AS count FROM {table} GROUP ALL")
-        count = rows[0]["count"] if rows else 0
+    for i, table in enumerate(custom_tables):
+        count = result.get(f"c{i}") or 0
         if count > 0:
             node_counts[table.capitalize()] = count
 
     # Count all edge tables (dynamically discovered)
-    rel_counts = {}
-    for table in db.get_relation_tables(exclude_internal=False):
-        rows = db.query(f"SELECT count() AS count FROM {table} GROUP ALL")
-        rel_counts[table.upper()] = rows[0]["count"] if rows else 0
+    rel_counts = {t.upper(): result.get(f"e{i}") or 0 for i, t in enumerate(edge_tables)}
 
     return {"nodes": node_counts, "relationships": rel_counts}
 
 
 _ALLOWED_GRAPH_LABELS = {"Note", "Tag", "Memory", "Chunk"}
+# Display names in graph payloads are cut to this length (truncated inline in
+# the per-row loops below rather than via _truncate to skip a call per row)
+_NAME_MAX = 60
 _LABEL_TO_TABLE = {"Note": "note", "Tag": "tag", "Memory": "memory", "Chunk": "chunk"}
+_TABLE_TO_LABEL = {table: label for label, table in _LABEL_TO_TABLE.items()}
 
 
 @app.get("/graph/overview")
@@ -689,59 +834,60 @@ def graph_overview(limit: int = 200, label: str = ""):
     limit = min(limit, 500)
     params: dict = {"limit": limit}
 
-    # Fetch nodes from each table (exclude Chunk by default)
-    all_nodes = []
     if label and label not in _LABEL_TO_TABLE:
         raise HTTPException(status_code=400, detail=f"Invalid label: {label}")
     tables = [_LABEL_TO_TABLE[label]] if label else ["note", "tag", "memory"]
-    for table in tables:
-        rows = db.query(
-            f"SELECT meta::id(id) AS nid, "
-            f"title ?? name ?? content AS name, "
-            f"path, type FROM {table} LIMIT $limit",
-            params,
-        )
-        for r in rows:
+    # Include custom entity nodes (person, project, etc.)
+    custom_tables = [] if label else db.get_custom_node_tables()
+    # Edges are dynamically discovered and exclude from_document
+    edge_tables = db.get_relation_tables(exclude_internal=True)
+
+    # Fold every per-table SELECT into one RETURN object so the whole overview
+    # is a single round-trip. Keys are positional to avoid quoting table names.
+    subqueries = [
+        f"n{i}: (SELECT meta::id(id) AS nid, title ?? name ?? content AS name, "
+        f"path, type FROM {table} LIMIT $limit)"
+        for i, table in enumerate(tables)
+    ]
+    subqueries += [
+        f"c{i}: (SELECT meta::id(id) AS nid, name, path, type FROM {table} LIMIT $limit)"
+        for i, table in enumerate(custom_tables)
+    ]
+    subqueries += [
+        f"e{i}: (SELECT in AS src, out AS tgt FROM {table} LIMIT $limit)"
+        for i, table in enumerate(edge_tables)
+    ]
+    result = db.query("RETURN {" + ", ".join(subqueries) + "}", params)
+    if isinstance(result, list):
+        result = result[0] if result else {}
+    if not isinstance(result, dict):
+        result = {}
+
+    all_nodes = []
+    node_sources = [(f"n{i}", t) for i, t in enumerate(tables)]
+    node_sources += [(f"c{i}", t) for i, t in enumerate(custom_tables)]
+    for key, table in node_sources:
+        # Resolved once per table, not per row
+        node_label = _primary_label(table)
+        for r in result.get(key) or []:
             if not isinstance(r, dict):
                 continue
+            name = r.get("name")
+            if name and len(name) > _NAME_MAX:
+                name = name[:_NAME_MAX] + "..."
             all_nodes.append(
                 {
                     "id": f"{table}:{r.get('nid', '')}",
-                    "label": table.capitalize(),
-                    "name": _truncate(r.get("name"), 60),
+                    "label": node_label,
+                    "name": name,
                     "path": r.get("path"),
                     "type": r.get("type"),
                 }
             )
 
-    # Include custom entity nodes (person, project, etc.)
-    if not label:
-        for table in db.get_custom_node_tables():
-            rows = db.query(
-                f"SELECT meta::id(id) AS nid, name, path, type FROM {table} LIMIT $limit",
-                params,
-            )
-            for r in rows:
-                if not isinstance(r, dict):
-                    continue
-                all_nodes.append(
-                    {
-                        "id": f"{table}:{r.get('nid', '')}",
-                        "label": table.capitalize(),
-                        "name": _truncate(r.get("name"), 60),
-                        "path": r.get("path"),
-                        "type": r.get("type"),
-                    }
-                )
-
-    # Fetch edges (dynamically discovered, excludes from_document)
     all_edges = []
-    for edge_table in db.get_relation_tables(exclude_internal=True):
-        rows = db.query(
-            f"SELECT in AS src, out AS tgt FROM {edge_table} LIMIT $limit",
-            params,
-        )
-        for r in rows:
+    for i, edge_table in enumerate(edge_tables):
+        for r in result.get(f"e{i}") or []:
             all_edges.append(
                 {
                     "source": str(r["src"]) if r.get("src") else "",
@@ -776,85 +922,70 @@ def graph_neighborhood(path: str, depth: int = 1):
             "path": center["path"],
         }
     }
-    edges_set: set = set()
-    edges: list = []
-
-    # BFS through all visible relation tables
+    edges: list[dict] = []
+
+    # BFS through all visible relation tables. Each level costs two round-trips
+    # regardless of frontier size: one query over every edge table touching the
+    # frontier, then one batched detail fetch for the newly discovered nodes.
+    #
+    # Edges are deduplicated by the query itself: GROUP BY collapses parallel
+    # edges of the same type, and edges touching an earlier level are skipped
+    # because they were already returned when that level was the frontier.
     edge_tables = db.get_relation_tables(exclude_internal=True)
+    in_frontier = "array::map($nids, |$v| type::thing($v))"
+    in_seen = "array::map($seen, |$v| type::thing($v))"
     frontier = [center_id]
     for _ in range(depth):
-        if not frontier:
+        if not frontier or not edge_tables:
             break
+        frontier_set = set(frontier)
+        seen = [nid for nid in nodes_map if nid not in frontier_set]
+        edge_rows = db.query(
+            f"SELECT in AS source, out AS target, meta::tb(id) AS etype "
+            f"FROM {', '.join(edge_tables)} "
+            f"WHERE (in INSIDE {in_frontier} OR out INSIDE {in_frontier}) "
+            f"AND in NOTINSIDE {in_seen} AND out NOTINSIDE {in_seen} "
+            f"GROUP BY source, target, etype",
+            {"nids": frontier, "seen": seen},
+        )
+        new_ids: list[str] = []
+        for row in edge_rows:
+            src_id = str(row["source"]) if row.get("source") else ""
+            tgt_id = str(row["target"]) if row.get("target") else ""
+            if not src_id or not tgt_id:
+                continue
+            etype = str(row.get("etype", "")).upper()
+            edges.append({"source": src_id, "target": tgt_id, "type": etype})
+            # Whichever endpoint lies outside the frontier is a newly reached node
+            for other in (tgt_id, src_id):
+                if other not in frontier_set and other not in nodes_map:
+                    nodes_map[other] = {}  # placeholder until details are fetched
+                    new_ids.append(other)
+
         next_frontier = []
-        for node_id in frontier:
-            # Outgoing edges
-            for edge_table in edge_tables:
-                out_rows = db.query(
-                    f"SELECT out AS target, meta::id(id) AS eid "
-                    f"FROM {edge_table} WHERE in = type::thing($nid)",
-                    {"nid": node_id},
-                )
-                for row in out_rows:
-                    tgt_id = str(row["target"]) if row.get("target") else ""
-                    if not tgt_id:
-                        continue
-                    etype = edge_table.upper()
-                    edge_key = (node_id, tgt_id, etype)
-                    if edge_key not in edges_set:
-                        edges_set.add(edge_key)
-                        edges.append({"source": node_id, "target": tgt_id, "type": etype})
-                    if tgt_id not in nodes_map:
-                        # Fetch node details
-                        table = tgt_id.split(":")[0] if ":" in tgt_id else "note"
-                        detail = db.query(
-                            "SELECT meta::id(id) AS nid, title ?? name ?? content AS name, "
-                            "path, type FROM type::thing($tid)",
-                            {"tid": tgt_id},
-                        )
-                        if detail:
-                            d = detail[0]
-                            nodes_map[tgt_id] = {
-                                "id": tgt_id,
-                                "label": table.capitalize(),
-                                "name": _truncate(d.get("name"), 60),
-                                "path": d.get("path"),
-                                "type": d.get("type"),
-                            }
-                            next_frontier.append(tgt_id)
-
-            # Incoming edges
-            for edge_table in edge_tables:
-                in_rows = db.query(
-                    f"SELECT in AS source, meta::id(id) AS eid "
-                    f"FROM {edge_table} WHERE out = type::thing($nid)",
-                    {"nid": node_id},
-                )
-                for row in in_rows:
-                    src_id = str(row["source"]) if row.get("source") else ""
-                    if not src_id:
-                        continue
-                    etype = edge_table.upper()
-                    edge_key = (src_id, node_id, etype)
-                    if edge_key not in edges_set:
-                        edges_set.add(edge_key)
-                        edges.append({"source": src_id, "target": node_id, "type": etype})
-                    if src_id not in nodes_map:
-                        table = src_id.split(":")[0] if ":" in src_id else "note"
-                        detail = db.query(
-                            "SELECT meta::id(id) AS nid, title ?? name ?? content AS name, "
-                            "path, type FROM type::thing($tid)",
-                            {"tid": src_id},
-                        )
-                        if detail:
-                            d = detail[0]
-                            nodes_map[src_id] = {
-                                "id": src_id,
-                                "label": table.capitalize(),
-                                "name": _truncate(d.get("name"), 60),
-                                "path": d.get("path"),
-                                "type": d.get("type"),
-                            }
-                            next_frontier.append(src_id)
+        if new_ids:
+            details = db.query(
+                "SELECT id, title ?? name ?? content AS name, path, type "
+                "FROM array::map($nids, |$v| type::thing($v))",
+                {"nids": new_ids},
+            )
+            by_id = {str(d["id"]): d for d in details if isinstance(d, dict) and d.get("id")}
+            for nid in new_ids:
+                d = by_id.get(nid)
+                if d is None:
+                    del nodes_map[nid]
+                    continue
+                name = d.get("name")
+                if name and len(name) > _NAME_MAX:
+                    name = name[:_NAME_MAX] + "..."
+                nodes_map[nid] = {
+                    "id": nid,
+                    "label": _primary_label(nid.partition(":")[0]) if ":" in nid else "Note",
+                    "name": name,
+                    "path": d.get("path"),
+                    "type": d.get("type"),
+                }
+                next_frontier.append(nid)
 
         frontier = next_frontier
 
@@ -864,55 +995,50 @@ def graph_neighborhood(path: str, depth: int = 1):
 @app.get("/graph/memories")
 def graph_memories():
     db = _require_db()
-    rows = db.query("SELECT mid, type, content, created_at FROM memory")
+    rows = db.query("SELECT mid, type, content, created_at, id FROM memory")
     edge_tables = db.get_relation_tables(exclude_internal=True)
 
     memories = []
+    by_record: dict[str, list[dict]] = {}
     for r in rows:
-        # Find connections through any edge table (outgoing and incoming)
-        connections = []
-        mid = r.get("mid")
-        for et in edge_tables:
-            out_rows = db.query(
-                f"SELECT out AS target FROM {et} "
-                f"WHERE in = (SELECT VALUE id FROM memory WHERE mid = $mid)[0]",
-                {"mid": mid},
-            )
-            for o in out_rows:
-                tgt = str(o["target"]) if o.get("target") else ""
-                if tgt:
-                    detail = db.query(
-                        "SELECT title ?? name ?? content AS name FROM type::thing($tid)",
-                        {"tid": tgt},
-                    )
-                    name = detail[0].get("name") if detail else None
-                    if name:
-                        connections.append({"name": name, "relationship": et})
-            in_rows = db.query(
-                f"SELECT in AS source FROM {et} "
-                f"WHERE out = (SELECT VALUE id FROM memory WHERE mid = $mid)[0]",
-                {"mid": mid},
-            )
-            for i in in_rows:
-                src = str(i["source"]) if i.get("source") else ""
-                if src:
-                    detail = db.query(
-                        "SELECT title ?? name ?? content AS name FROM type::thing($tid)",
-                        {"tid": src},
-                    )
-                    name = detail[0].get("name") if detail else None
-                    if name:
-                        connections.append({"name": name, "relationship": et})
-
+        connections: list[dict] = []
+        if r.get("id"):
+            by_record[str(r["id"])] = connections
         memories.append(
             {
-                "id": mid,
+                "id": r.get("mid"),
                 "type": r.get("type"),
                 "content": r.get("content"),
                 "created_at": r.get("created_at"),
                 "connections": connections,
             }
         )
+
+    if not by_record or not edge_tables:
+        return {"memories": memories}
+
+    # One query for every edge touching a memory, in either direction, with the
+    # display name of both endpoints resolved server-side via record links.
+    # Filtering on the memory ids lets the in/out edge indexes do the lookup.
+    mem_ids = "array::map($mids, |$v| type::thing($v))"
+    edge_rows = db.query(
+        f"SELECT meta::tb(id) AS etype, in AS source, out AS target, "
+        f"in.title ?? in.name ?? in.content AS source_name, "
+        f"out.title ?? out.name ?? out.content AS target_name "
+        f"FROM {', '.join(edge_tables)} "
+        f"WHERE in INSIDE {mem_ids} OR out INSIDE {mem_ids}",
+        {"mids": list(by_record)},
+    )
+    for e in edge_rows:
+        etype = e.get("etype")
+        src = str(e["source"]) if e.get("source") else ""
+        tgt = str(e["target"]) if e.get("target") else ""
+        # Outgoing: memory -> target
+        if src in by_record and e.get("target_name"):
+            by_record[src].append({"name": e["target_name"], "relationship": etype})
+        # Incoming: source -> memory
+        if tgt in by_record and e.get("source_name"):
+            by_record[tgt].append({"name": e["source_name"], "relationship": etype})
     return {"memories": memories}
 
 
@@ -995,7 +1121,7 @@ def search_semantic(req: SearchRequest):
         "string::slice(text, 0, 300) AS snippet, "
         "vector::similarity::cosine(embedding, $embedding) AS score "
         "FROM chunk "
-        "WHERE embedding <|10,40|> $embedding "
+        f"WHERE embedding {knn_operator(max(limit, 1))} $embedding "
         "ORDER BY score DESC LIMIT $limit",
         {"embedding": embedding, "limit": limit},
     )
@@ -1011,8 +1137,10 @@ def search_semantic(req: SearchRequest):
 
 
 def _primary_label(table: str) -> str:
-    """Capitalize a SurrealDB table name for display."""
-    return table.capitalize() if table else "Unknown"
+    """Display label for a SurrealDB table name (core tables via dict lookup)."""
+    if not table:
+        return "Unknown"
+    return _TABLE_TO_LABEL.get(table) or table.capitalize()
 
 
 def _truncate(text: str | None, max_len: int) -> str | None:
@@ -1034,14 +1162,20 @@ async def _save_upload_to_temp(audio: UploadFile) -> str:
 
 
 @app.post("/transcribe")
-async def transcribe(audio: UploadFile = File(...)):  # noqa: B008
-    """Transcribe an uploaded audio file using the configured provider."""
+async def transcribe(audio: UploadFile = File(...), segments: bool = True):  # noqa: B008
+    """Transcribe an uploaded audio file using the configured provider.
+
+    Pass ``segments=false`` when only the text is needed to skip building
+    the timestamped segment list.
+    """
     from brainshape.transcribe import transcribe_audio
 
     tmp_path = None
     try:
         tmp_path = await _save_upload_to_temp(audio)
-        result = transcribe_audio(tmp_path)
+        # Transcription is CPU/network bound; keep the event loop free for
+        # concurrent agent streams while it runs.
+        result = await asyncio.to_thread(transcribe_audio, tmp_path, segments)
         return result
     except HTTPException:
         raise
@@ -1069,7 +1203,7 @@ async def transcribe_meeting(
     tmp_path = None
     try:
         tmp_path = await _save_upload_to_temp(audio)
-        result = transcribe_audio(tmp_path)
+        result = await asyncio.to_thread(transcribe_audio, tmp_path)
     except HTTPException:
         raise
     except Exception as e:
@@ -1179,9 +1313,49 @@ def get_settings():
     return safe
 
 
+async def _reload_agent_bg(db: GraphDB, provider: str, reload_pipeline: bool) -> None:
+    """Rebuild the pipeline and/or agent after a settings change.
+
+    Runs as a background task so slow MCP server cold starts (``npx``/``uvx``)
+    don't block the PUT /settings response. Progress is reported via
+    ``_reload_state``. Pipeline and agent construction are blocking, so they
+    run in worker threads to keep the event loop serving other requests.
+    """
+    global _agent, _pipeline, _reload_state
+    try:
+        if reload_pipeline or _pipeline is None:
+            _pipeline = await asyncio.to_thread(create_kg_pipeline, db, _notes_path())
+
+        if provider == "claude-code":
+            # Claude Code doesn't use LangChain — just clear sessions
+            _agent = None
+            clear_claude_sessions()
+        else:
+            from brainshape.agent import recreate_agent
+            from brainshape.mcp_client import reload_mcp_tools
+
+            mcp_tools = await reload_mcp_tools()
+            _agent = await asyncio.to_thread(
+                recreate_agent, db, _pipeline, mcp_tools=mcp_tools or None
+            )
+
+        with _sessions_lock:
+            _sessions.clear()  # Clear stale sessions since provider/model changed
+        _reload_state = {"status": "ready"}
+        logger.info("Agent reload complete")
+    except Exception as e:
+        logger.exception("Agent reload failed")
+        _reload_state = {"status": "error", "error": str(e)}
+
+
+@app.get("/settings/reload/status")
+def settings_reload_status():
+    return _reload_state
+
+
 @app.put("/settings")
-async def put_settings(req: UpdateSettingsRequest):
-    global _agent, _pipeline
+async def put_settings(req: UpdateSettingsRequest, response: Response):
+    global _pipeline, _reload_state, _reload_task
     updates = {}
     if req.notes_path is not None:
         np = Path(req.notes_path).expanduser().resolve()
@@ -1232,6 +1406,12 @@ async def put_settings(req: UpdateSettingsRequest):
         updates["embedding_model"] = req.embedding_model
     if req.embedding_dimensions is not None:
         updates["embedding_dimensions"] = req.embedding_dimensions
+    if req.semantic_sync_concurrency is not None:
+        if req.semantic_sync_concurrency < 1:
+            raise HTTPException(
+                status_code=400, detail="semantic_sync_concurrency must be at least 1"
+            )
+        updates["semantic_sync_concurrency"] = req.semantic_sync_concurrency
     if req.mcp_servers is not None:
         _validate_mcp_servers(req.mcp_servers)
         updates["mcp_servers"] = req.mcp_servers
@@ -1290,23 +1470,14 @@ async def put_settings(req: UpdateSettingsRequest):
         ]
     )
     if (needs_agent_reload or needs_pipeline_reload) and _db is not None:
-        new_provider = updated.get("llm_provider", "anthropic")
-
-        if needs_pipeline_reload or _pipeline is None:
-            _pipeline = create_kg_pipeline(_db, _notes_path())
-
-        if new_provider == "claude-code":
-            # Claude Code doesn't use LangChain — just clear sessions
-            _agent = None
-            clear_claude_sessions()
-        else:
-            from brainshape.agent import recreate_agent
-            from brainshape.mcp_client import reload_mcp_tools
-
-            mcp_tools = await reload_mcp_tools()
-            _agent = recreate_agent(_db, _pipeline, mcp_tools=mcp_tools or None)
-
-        _sessions.clear()  # Clear stale sessions since provider/model changed
+        # Supersede any reload still in flight — the newest settings win
+        if _reload_task is not None and not _reload_task.done():
+            _reload_task.cancel()
+        _reload_state = {"status": "in_progress"}
+        _reload_task = asyncio.create_task(
+            _reload_agent_bg(_db, updated.get("llm_provider", "anthropic"), needs_pipeline_reload)
+        )
+        response.status_code = 202
 
     # Hot-reload notes directory when notes_path changes
     if req.notes_path is not None:
@@ -1327,14 +1498,13 @@ async def put_settings(req: UpdateSettingsRequest):
             db = _db  # local binding for closure type narrowing
             sync_structural(db, new_path)
 
-            def on_notes_changed():
-                sync_structural(db, new_path)
+            def on_notes_changed(changed: set[Path]):
+                sync_structural(db, new_path, changed)
                 if _pipeline is not None:
-                    import threading
-
                     threading.Thread(
                         target=sync_semantic,
                         args=(db, _pipeline, new_path),
+                        kwargs={"changed": changed},
                         daemon=True,
                     ).start()
 
@@ -1382,38 +1552,94 @@ def ollama_models(base_url: str = "http://localhost:11434"):
 # --- Sync ---
 
 
+# Background sync jobs: job_id → {"status": "running" | "done" | "error", "kind", ...}.
+# Only the most recent _SYNC_JOBS_MAX jobs are kept for polling.
+_sync_jobs: OrderedDict[str, dict] = OrderedDict()
+_sync_tasks: set[asyncio.Task] = set()
+_SYNC_JOBS_MAX = 50
+
+
+async def _run_sync_job(job_id: str, kind: str, work: Callable[[], Awaitable[dict]]) -> None:
+    try:
+        stats = await work()
+        result = {"status": "done", "kind": kind, "stats": stats}
+    except Exception as e:
+        logger.exception("%s sync job %s failed", kind, job_id)
+        result = {"status": "error", "kind": kind, "error": str(e)}
+    if job_id in _sync_jobs:  # may have been evicted while running
+        _sync_jobs[job_id] = result
+
+
+def _start_sync_job(kind: str, work: Callable[[], Awaitable[dict]], response: Response) -> dict:
+    """Schedule *work* as a background task and answer 202 with its job id.
+
+    Large vaults can take minutes to sync; clients poll
+    ``GET /sync/status/{job_id}`` instead of holding the request open.
+    """
+    job_id = uuid.uuid4().hex
+    _sync_jobs[job_id] = {"status": "running", "kind": kind}
+    while len(_sync_jobs) > _SYNC_JOBS_MAX:
+        _sync_jobs.popitem(last=False)
+    task = asyncio.create_task(_run_sync_job(job_id, kind, work))
+    _sync_tasks.add(task)
+    task.add_done_callback(_sync_tasks.discard)
+    response.status_code = 202
+    return {"status": "started", "job_id": job_id}
+
+
 @app.post("/sync/structural")
-def sync_structural_endpoint():
+async def sync_structural_endpoint(response: Response):
     if _db is None:
         raise HTTPException(status_code=503, detail="Server not initialized")
     notes_path = _notes_path()
     if not notes_path.exists():
         raise HTTPException(status_code=400, detail="Notes path not found")
-    stats = sync_structural(_db, notes_path)
-    return {"status": "ok", "stats": stats}
+    db = _db
+
+    async def work() -> dict:
+        return await asyncio.to_thread(sync_structural, db, notes_path)
+
+    return _start_sync_job("structural", work, response)
 
 
 @app.post("/sync/semantic")
-async def sync_semantic_endpoint():
+async def sync_semantic_endpoint(response: Response):
     if _db is None or _pipeline is None:
         raise HTTPException(status_code=503, detail="Server not initialized")
     notes_path = _notes_path()
     if not notes_path.exists():
         raise HTTPException(status_code=400, detail="Notes path not found")
-    stats = await sync_semantic_async(_db, _pipeline, notes_path)
-    return {"status": "ok", "stats": stats}
+    db, pipeline = _db, _pipeline
+
+    async def work() -> dict:
+        return await sync_semantic_async(db, pipeline, notes_path)
+
+    return _start_sync_job("semantic", work, response)
 
 
 @app.post("/sync/full")
-async def sync_full_endpoint():
+async def sync_full_endpoint(response: Response):
     if _db is None or _pipeline is None:
         raise HTTPException(status_code=503, detail="Server not initialized")
     notes_path = _notes_path()
     if not notes_path.exists():
         raise HTTPException(status_code=400, detail="Notes path not found")
-    structural_stats = sync_structural(_db, notes_path)
-    semantic_stats = await sync_semantic_async(_db, _pipeline, notes_path)
-    return {"status": "ok", "stats": {"structural": structural_stats, "semantic": semantic_stats}}
+    db, pipeline = _db, _pipeline
+
+    async def work() -> dict:
+        structural_stats = await asyncio.to_thread(sync_structural, db, notes_path)
+        semantic_stats = await sync_semantic_async(db, pipeline, notes_path)
+        return {"structural": structural_stats, "semantic": semantic_stats}
+
+    return _start_sync_job("full", work, response)
+
+
+@app.get("/sync/status/{job_id}")
+def sync_status(job_id: str):
+    job = _sync_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job
 
 
 # --- Import ---
@@ -1435,6 +1661,7 @@ def import_vault_endpoint(req: ImportVaultRequest):
         stats = import_vault(source, notes_path)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from None
+    _invalidate_notes_cache()
 
     # Auto-trigger structural sync after import
     if stats["files_copied"] > 0:
@@ -1447,10 +1674,15 @@ def import_vault_endpoint(req: ImportVaultRequest):
 
 if __name__ == "__main__":
     import argparse
+    import multiprocessing
     import sys
 
     import uvicorn
 
+    # Frozen builds re-run this entry point in process-pool workers
+    # (read_all_notes); let those hand off to the worker instead of serving.
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser(description="Brainshape server")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=52836)
@@ -1462,6 +1694,9 @@ if __name__ == "__main__":
     port_file.parent.mkdir(parents=True, exist_ok=True)
     port_file.write_text(str(args.port))
 
+    # uvicorn's default loop="auto" runs on uvloop when it is installed (the
+    # `uvloop` extra), which speeds up the subprocess pipe reads behind the
+    # claude-code stream; otherwise it falls back to the stdlib asyncio loop.
     if getattr(sys, "frozen", False):
         # PyInstaller frozen build: pass the app object directly.
         # String-based import ("brainshape.server:app") fails in frozen envs.
@@ -5,12 +5,16 @@ This module manages user-facing preferences that can be changed at runtime
 via the settings UI: LLM provider, model selection, etc.
 """
 
-import json
+import copy
 import logging
+import os
 import shutil
+import tempfile
 from pathlib import Path
 from typing import Any
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 # Config directory paths
@@ -56,6 +60,9 @@ DEFAULTS: dict[str, Any] = {
     "embedding_model": "sentence-transformers/all-mpnet-base-v2",
     # Embedding dimensions (must match the model's output dimensions)
     "embedding_dimensions": 768,
+    # Changed notes embedded at once during semantic sync. They share one
+    # embedded DB connection and one model, so raise only after measuring.
+    "semantic_sync_concurrency": 1,
     # MCP servers: list of server configs
     # Each: {"name", "transport": "stdio"|"http", "command", "args", "url"}
     "mcp_servers": [],
@@ -76,6 +83,10 @@ DEFAULTS: dict[str, Any] = {
 # Valid LLM providers
 VALID_PROVIDERS = {"anthropic", "openai", "ollama", "claude-code"}
 
+# Providers whose name is also the LangChain model-string prefix; anything
+# else (claude-code, unknown values) falls back to anthropic
+_LANGCHAIN_PROVIDERS = frozenset({"anthropic", "openai", "ollama"})
+
 # Valid transcription providers
 VALID_TRANSCRIPTION_PROVIDERS = {"local", "openai", "mistral"}
 
@@ -87,6 +98,11 @@ TRANSCRIPTION_MODEL_DEFAULTS = {
 }
 
 
+# Last parsed settings file: ((path, mtime_ns, size), migrated stored dict).
+# load_settings() is called on most requests, so skip re-reading an unchanged file.
+_cache: tuple[tuple[str, int, int], dict[str, Any]] | None = None
+
+
 def _ensure_dir() -> None:
     SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
 
@@ -121,27 +137,71 @@ def _migrate_settings(settings: dict[str, Any]) -> dict[str, Any]:
 
 
 def load_settings() -> dict[str, Any]:
-    """Load settings from disk, falling back to defaults for missing keys."""
-    settings = dict(DEFAULTS)
-    if SETTINGS_FILE.exists():
-        try:
-            stored = json.loads(SETTINGS_FILE.read_text(encoding="utf-8"))
-            stored = _migrate_settings(stored)
-            settings.update(stored)
-        except (json.JSONDecodeError, OSError) as exc:
-            logger.warning(
-                "Failed to read settings file %s: %s — using defaults",
-                SETTINGS_FILE,
-                exc,
-            )
+    """Load settings from disk, falling back to defaults for missing keys.
+
+    The parsed file is memoized on its path, mtime and size, so repeated calls
+    only cost a ``stat`` until the file changes. Nested values are deep-copied
+    out of the cache, so callers may edit lists and dicts (``mcp_servers``,
+    ``theme``) in place without touching what save_settings() compares against.
+    """
+    global _cache
+    settings = copy.deepcopy(DEFAULTS)
+    try:
+        st = SETTINGS_FILE.stat()
+    except OSError:
+        return settings
+    key = (str(SETTINGS_FILE), st.st_mtime_ns, st.st_size)
+    if _cache is not None and _cache[0] == key:
+        settings.update(copy.deepcopy(_cache[1]))
+        return settings
+    try:
+        stored = orjson.loads(SETTINGS_FILE.read_bytes())
+        stored = _migrate_settings(stored)
+    except (orjson.JSONDecodeError, OSError) as exc:
+        logger.warning(
+            "Failed to read settings file %s: %s — using defaults",
+            SETTINGS_FILE,
+            exc,
+        )
+        return settings
+    _cache = (key, stored)
+    settings.update(copy.deepcopy(stored))
     return settings
 
 
 def save_settings(settings: dict[str, Any]) -> None:
-    """Write settings to disk. Only persists known keys."""
-    _ensure_dir()
+    """Write settings to disk. Only persists known keys.
+
+    Skips the write when the file already holds exactly these values, and
+    otherwise replaces it atomically so a crash can't leave a torn file.
+    """
+    global _cache
     to_save = {k: settings[k] for k in DEFAULTS if k in settings}
-    SETTINGS_FILE.write_text(json.dumps(to_save, indent=2) + "\n", encoding="utf-8")
+    try:
+        st = SETTINGS_FILE.stat()
+    except OSError:
+        st = None
+    if (
+        st is not None
+        and _cache is not None
+        and _cache[0] == (str(SETTINGS_FILE), st.st_mtime_ns, st.st_size)
+        and _cache[1] == to_save
+    ):
+        return
+
+    _ensure_dir()
+    data = orjson.dumps(to_save, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    fd, tmp = tempfile.mkstemp(dir=SETTINGS_FILE.parent, prefix=".settings-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        Path(tmp).replace(SETTINGS_FILE)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    st = SETTINGS_FILE.stat()
+    # Cache a fresh copy so later mutation of the caller's values can't leak in
+    _cache = ((str(SETTINGS_FILE), st.st_mtime_ns, st.st_size), orjson.loads(data))
 
 
 def update_settings(updates: dict[str, Any]) -> dict[str, Any]:
@@ -165,13 +225,9 @@ def get_llm_model_string(settings: dict[str, Any] | None = None) -> str:
     provider = settings.get("llm_provider", DEFAULTS["llm_provider"])
     model = settings.get("llm_model", DEFAULTS["llm_model"])
 
-    if provider == "anthropic":  # noqa: SIM116
-        return f"anthropic:{model}"
-    elif provider == "openai":
-        return f"openai:{model}"
-    elif provider == "ollama":
-        return f"ollama:{model}"
-    return f"anthropic:{model}"
+    if provider not in _LANGCHAIN_PROVIDERS:
+        provider = "anthropic"
+    return f"{provider}:{model}"
 
 
 def get_llm_kwargs(settings: dict[str, Any] | None = None) -> dict[str, Any]:
@@ -188,15 +244,26 @@ def get_llm_kwargs(settings: dict[str, Any] | None = None) -> dict[str, Any]:
     return kwargs
 
 
-def get_notes_path() -> str:
+def get_notes_path(settings: dict[str, Any] | None = None) -> str:
     """Resolve the notes path: settings.json > .env > default.
 
     Returns the raw path string (not expanded).
     """
     from brainshape.config import settings as config_settings
 
-    runtime = load_settings()
-    path = runtime.get("notes_path", "")
+    if settings is None:
+        settings = load_settings()
+    path = settings.get("notes_path", "")
     if path:
         return path
     return config_settings.notes_path
+
+
+def get_agent_config() -> tuple[str, dict[str, Any], str]:
+    """Return ``(model_string, model_kwargs, notes_path)`` from a single settings load.
+
+    Agent construction needs all three; resolving them from one dict avoids
+    loading settings once per value.
+    """
+    settings = load_settings()
+    return get_llm_model_string(settings), get_llm_kwargs(settings), get_notes_path(settings)
@@ -1,82 +1,293 @@
 import asyncio
+import hashlib
 import logging
+import os
 import threading
+from collections.abc import Callable, Collection
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import cast
 
 from brainshape.graph_db import GraphDB
 from brainshape.kg_pipeline import KGPipeline
-from brainshape.notes import compute_file_hash, list_notes, read_all_notes
+from brainshape.notes import (
+    compute_file_hash,
+    list_notes,
+    parse_note,
+    read_all_notes,
+    select_notes,
+)
+from brainshape.tools import clear_search_cache
 
 logger = logging.getLogger(__name__)
 
 # Serialize structural syncs to prevent concurrent UPSERTs from racing
 _structural_lock = threading.Lock()
 
+# Embedded batches waiting for the writer during a semantic sync; bounds how
+# far embedding can run ahead of the database
+SEMANTIC_QUEUE_SIZE = 4
 
-def _get_stored_hashes(db: GraphDB) -> dict[str, str]:
-    """Batch-fetch all stored content hashes."""
-    results = db.query("SELECT path, content_hash FROM note")
+# Chunks gathered across notes before they are embedded in one model call
+SEMANTIC_BATCH_TEXTS = 256
+
+# Below this many files, hashing serially beats starting a thread pool
+_PARALLEL_HASH_THRESHOLD = 64
+
+
+def _try_hash_file(file_path: Path) -> str | None:
+    try:
+        return compute_file_hash(file_path)
+    except OSError:
+        return None  # vanished or unreadable; the read step will report it
+
+
+def _hash_files(paths: list[Path]) -> list[str | None]:
+    """Content hashes of ``paths``, in order (None where a file can't be read).
+
+    hashlib releases the GIL while digesting, so large vaults are hashed on
+    a thread pool.
+    """
+    if len(paths) < _PARALLEL_HASH_THRESHOLD:
+        return [_try_hash_file(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        return list(pool.map(_try_hash_file, paths, chunksize=16))
+
+
+def _get_stored_hashes(db: GraphDB, relative_paths: list[str]) -> dict[str, str]:
+    """Batch-fetch stored content hashes for the given note paths."""
+    results = db.query(
+        "SELECT path, content_hash FROM note WHERE path INSIDE $paths AND content_hash != NONE",
+        {"paths": relative_paths},
+    )
     return {r["path"]: r["content_hash"] for r in results if r.get("content_hash")}
 
 
-def sync_semantic(db: GraphDB, pipeline: KGPipeline, notes_path: Path) -> dict:
+def sync_semantic(
+    db: GraphDB,
+    pipeline: KGPipeline,
+    notes_path: Path,
+    concurrency: int | None = None,
+    changed: Collection[Path] | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> dict:
     """Run KG pipeline to embed note content into chunks.
 
     Delegates to sync_semantic_async() inside a single event loop,
     avoiding the overhead of creating a new event loop per file.
     """
-    return asyncio.run(sync_semantic_async(db, pipeline, notes_path))
+    return asyncio.run(
+        sync_semantic_async(
+            db,
+            pipeline,
+            notes_path,
+            concurrency=concurrency,
+            changed=changed,
+            on_progress=on_progress,
+        )
+    )
+
+
+async def sync_semantic_async(
+    db: GraphDB,
+    pipeline: KGPipeline,
+    notes_path: Path,
+    concurrency: int | None = None,
+    changed: Collection[Path] | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> dict:
+    """Async version of sync_semantic for use inside a running event loop.
 
+    ``changed`` limits the sync to those files (e.g. from the file watcher);
+    by default the whole vault is checked.
 
-async def sync_semantic_async(db: GraphDB, pipeline: KGPipeline, notes_path: Path) -> dict:
-    """Async version of sync_semantic for use inside a running event loop."""
-    note_files = list_notes(notes_path)
-    hash_map = _get_stored_hashes(db)
+    ``on_progress(done, total)`` is called each time a changed note has been
+    written or skipped, ``total`` being the number of changed notes.
+
+    Chunks of changed files are embedded in batches that span notes, with up
+    to ``concurrency`` batches in flight (default: the
+    ``semantic_sync_concurrency`` setting, which is 1). A single writer
+    stores results as they arrive.
+    """
+    if concurrency is None:
+        from brainshape.settings import load_settings
+
+        concurrency = int(load_settings().get("semantic_sync_concurrency", 1))
+    note_files = list_notes(notes_path) if changed is None else select_notes(notes_path, changed)
+    relative_paths = [str(p.relative_to(notes_path)) for p in note_files]
+    hash_map = _get_stored_hashes(db, relative_paths)
     stats = {"processed": 0, "skipped": 0}
 
-    for file_path in note_files:
-        content = file_path.read_text(encoding="utf-8").strip()
-        if not content:
+    file_hashes = await asyncio.to_thread(_hash_files, note_files)
+    dirty: list[tuple[Path, str]] = []
+    for file_path, relative_path, file_hash in zip(
+        note_files, relative_paths, file_hashes, strict=True
+    ):
+        # Unchanged files are skipped without reading their content
+        if file_hash is not None and hash_map.get(relative_path) == file_hash:
             stats["skipped"] += 1
             continue
+        dirty.append((file_path, relative_path))
 
-        relative_path = str(file_path.relative_to(notes_path))
-        file_hash = compute_file_hash(file_path)
+    done = 0
 
-        if hash_map.get(relative_path) == file_hash:
-            stats["skipped"] += 1
-            continue
+    def _advance(count: int = 1) -> None:
+        nonlocal done
+        done += count
+        if on_progress is not None:
+            on_progress(done, len(dirty))
+
+    # Embedding and writing are pipelined: chunks from several notes are
+    # gathered into one model call, and each embedded batch goes to a single
+    # writer through a bounded queue, so batch N+1 is embedded while batch
+    # N's chunks are written.
+    sem = asyncio.Semaphore(max(1, concurrency))
+    queue: asyncio.Queue[list | None] = asyncio.Queue(maxsize=SEMANTIC_QUEUE_SIZE)
 
+    async def _embed(batch: list[tuple[Path, str, list[str], str]]) -> None:
         try:
-            await pipeline.run_async(str(file_path))
-            db.query(
-                "UPDATE note SET content_hash = $hash WHERE path = $path",
-                {"path": relative_path, "hash": file_hash},
-            )
-            stats["processed"] += 1
+            texts = [text for _, _, chunks, _ in batch for text in chunks]
+            embeddings = await pipeline.embed_batch_async(texts)
         except Exception as e:
-            logger.warning("Failed to process '%s': %s", file_path.stem, e)
-            stats["skipped"] += 1
+            for file_path, *_ in batch:
+                logger.warning("Failed to process '%s': %s", file_path.stem, e)
+            stats["skipped"] += len(batch)
+            _advance(len(batch))
+            return
+        finally:
+            sem.release()
+        notes = []
+        start = 0
+        for file_path, relative_path, chunks, file_hash in batch:
+            end = start + len(chunks)
+            notes.append((file_path, (relative_path, chunks, embeddings[start:end], file_hash)))
+            start = end
+        await queue.put(notes)
+
+    async def _produce() -> None:
+        tasks = []
+        batch: list[tuple[Path, str, list[str], str]] = []
+        batch_texts = 0
+
+        async def _flush() -> None:
+            nonlocal batch, batch_texts
+            # Bounds the batches in flight, and so the note text held in memory
+            await sem.acquire()
+            tasks.append(asyncio.create_task(_embed(batch)))
+            batch, batch_texts = [], 0
+
+        try:
+            for file_path, relative_path in dirty:
+                try:
+                    # Read once: the same bytes are checked, hashed and embedded
+                    data = await asyncio.to_thread(file_path.read_bytes)
+                    content = data.decode("utf-8")
+                except Exception as e:
+                    logger.warning("Failed to process '%s': %s", file_path.stem, e)
+                    stats["skipped"] += 1
+                    _advance()
+                    continue
+                # Same rule as str.strip(): Unicode whitespace (NBSP, U+3000)
+                # counts as blank. isspace() avoids allocating a stripped copy
+                if not content or content.isspace():
+                    stats["skipped"] += 1
+                    _advance()
+                    continue
+                chunks = pipeline.split_content(content)
+                batch.append((file_path, relative_path, chunks, hashlib.sha256(data).hexdigest()))
+                batch_texts += len(chunks)
+                if batch_texts >= SEMANTIC_BATCH_TEXTS:
+                    await _flush()
+            if batch:
+                await _flush()
+            await asyncio.gather(*tasks)
+        finally:
+            await queue.put(None)
 
+    async def _write() -> None:
+        while (notes := await queue.get()) is not None:
+            # One transaction per embedded batch; if it fails, write the notes
+            # one by one so a single bad note doesn't cost the whole batch
+            try:
+                await pipeline.write_many_async([write for _, write in notes])
+            except Exception as e:
+                logger.debug("Batch write failed, retrying per note: %s", e)
+            else:
+                stats["processed"] += len(notes)
+                _advance(len(notes))
+                continue
+            for file_path, (relative_path, chunks, embeddings, file_hash) in notes:
+                try:
+                    await pipeline.write_async(
+                        relative_path, chunks, embeddings, content_hash=file_hash
+                    )
+                    stats["processed"] += 1
+                except Exception as e:
+                    logger.warning("Failed to process '%s': %s", file_path.stem, e)
+                    stats["skipped"] += 1
+                _advance()
+
+    await asyncio.gather(_produce(), _write())
+    clear_search_cache()
     return stats
 
 
-def sync_structural(db: GraphDB, notes_path: Path) -> dict:
+def sync_structural(db: GraphDB, notes_path: Path, changed: Collection[Path] | None = None) -> dict:
     """UPSERT note nodes and structural relationships (tags, wikilinks).
 
-    Uses a three-pass approach:
+    Uses a three-pass approach, each pass a single batched query:
       Pass 0 — Prune graph nodes whose files no longer exist on disk.
       Pass 1 — UPSERT all note nodes (so every note exists before linking).
       Pass 2 — Create tag and wikilink relationships.
 
-    Runs on every note unconditionally — structural sync is cheap
-    queries, so hash-gating isn't worth the complexity.
+    Re-parses every note on each run, but only writes a note's content
+    when it has changed since the last sync.
 
     Serialized via ``_structural_lock`` so concurrent callers (the file
     watcher, API endpoints) cannot produce duplicate UPSERT races.
+
+    ``changed`` names the files known to have changed. When they are all
+    existing notes already in the graph, only they are re-synced. A new or
+    deleted note can affect other notes' links, so it falls back to a full
+    sync.
     """
     with _structural_lock:
-        return _sync_structural_unlocked(db, notes_path)
+        try:
+            if changed is not None:
+                stats = _sync_changed_unlocked(db, notes_path, changed)
+                if stats is not None:
+                    return stats
+            return _sync_structural_unlocked(db, notes_path)
+        finally:
+            # Cached search tool results may predate the rewritten notes
+            clear_search_cache()
+
+
+def _sync_changed_unlocked(db: GraphDB, notes_path: Path, changed: Collection[Path]) -> dict | None:
+    """Re-sync only the changed notes, or return None if a full sync is needed."""
+    files = select_notes(notes_path, changed)
+    if len(files) < len({p for p in changed if p.suffix == ".md"}):
+        return None  # a note was deleted, moved or trashed
+    if not files:
+        return {"notes": 0, "tags": 0, "links": 0, "pruned": 0}
+    paths = [str(p.relative_to(notes_path)) for p in files]
+    stored = db.query(
+        "SELECT path, structural_hash FROM note WHERE path INSIDE $paths", {"paths": paths}
+    )
+    if len(stored) < len(paths):
+        return None  # a new note: existing links may now resolve to it
+    notes = [parse_note(p, notes_path) for p in files]
+    _upsert_notes(db, notes, stored)
+    targets = list({title for n in notes for title in n["links"]})
+    titles: set[str] = set()
+    if targets:
+        # SELECT VALUE rows are bare titles, not the dicts query() is annotated with
+        rows = db.query(
+            "SELECT VALUE title FROM note WHERE title INSIDE $titles", {"titles": targets}
+        )
+        titles = set(cast(list[str], rows))
+    tags, links = _relate_notes(db, notes, titles)
+    return {"notes": len(notes), "tags": tags, "links": links, "pruned": 0}
 
 
 def _sync_structural_unlocked(db: GraphDB, notes_path: Path) -> dict:
@@ -85,105 +296,126 @@ def _sync_structural_unlocked(db: GraphDB, notes_path: Path) -> dict:
 
     # Pass 0: Prune notes that no longer exist on disk
     disk_paths = {n["path"] for n in notes}
-    stored = db.query("SELECT path FROM note")
-    for row in stored:
-        path = row.get("path", "")
-        if path and path not in disk_paths:
-            # Delete relationships first, then the note node
-            db.query(
-                "DELETE tagged_with WHERE in = (SELECT VALUE id FROM note WHERE path = $path)[0]",
-                {"path": path},
-            )
-            db.query(
-                "DELETE links_to WHERE in = (SELECT VALUE id FROM note WHERE path = $path)[0]",
-                {"path": path},
-            )
-            db.query(
-                "DELETE links_to WHERE out = (SELECT VALUE id FROM note WHERE path = $path)[0]",
-                {"path": path},
-            )
-            db.query(
-                "DELETE chunk WHERE ->from_document->(note WHERE path = $path)",
-                {"path": path},
-            )
-            db.query("DELETE FROM note WHERE path = $path", {"path": path})
-            logger.info("Pruned deleted note from graph: %s", path)
-            stats["pruned"] += 1
-
-    # Clean orphan tags left behind by pruned notes
-    if stats["pruned"]:
-        db.query("DELETE tag WHERE (SELECT VALUE id FROM tagged_with WHERE out = tag.id) = []")
-
-    # Pass 1: UPSERT all note nodes
-    for note in notes:
-        db.query(
-            "UPSERT note SET path = $path, title = $title, content = $content, "
-            "modified_at = time::now() WHERE path = $path",
-            {
-                "path": note["path"],
-                "title": note["title"],
-                "content": note["content"],
-            },
-        )
-        # Set created_at only on first insert
-        db.query(
-            "UPDATE note SET created_at = time::now() WHERE path = $path AND created_at = NONE",
-            {"path": note["path"]},
+    stored = db.query("SELECT path, structural_hash FROM note")
+    gone = [row["path"] for row in stored if row.get("path") and row["path"] not in disk_paths]
+    if gone:
+        # Delete relationships and chunks first, then the note nodes, then
+        # any tags the pruned notes were the last users of
+        db.execute(
+            "LET $gone = (SELECT VALUE id FROM note WHERE path INSIDE $paths);"
+            "DELETE tagged_with WHERE in INSIDE $gone;"
+            "DELETE links_to WHERE in INSIDE $gone OR out INSIDE $gone;"
+            "DELETE chunk WHERE ->from_document->(note WHERE path INSIDE $paths);"
+            "DELETE FROM note WHERE path INSIDE $paths;"
+            "DELETE tag WHERE (SELECT VALUE id FROM tagged_with WHERE out = tag.id) = [];",
+            {"paths": gone},
         )
-        stats["notes"] += 1
+        for path in gone:
+            logger.info("Pruned deleted note from graph: %s", path)
+        stats["pruned"] = len(gone)
 
-    # Pass 2: create relationships
-    for note in notes:
-        # Clear old structural relationships before re-creating
-        db.query(
-            "DELETE tagged_with WHERE in = (SELECT VALUE id FROM note WHERE path = $path)[0]",
-            {"path": note["path"]},
-        )
-        db.query(
-            "DELETE links_to WHERE in = (SELECT VALUE id FROM note WHERE path = $path)[0]",
-            {"path": note["path"]},
-        )
+    if not notes:
+        return stats
 
-        # Create tag relationships
-        for tag in note["tags"]:
-            db.query(
-                "UPSERT tag SET name = $tag WHERE name = $tag",
-                {"tag": tag},
-            )
-            db.query(
-                "RELATE (SELECT VALUE id FROM note WHERE path = $path)"
-                "->tagged_with->"
-                "(SELECT VALUE id FROM tag WHERE name = $tag)",
-                {"path": note["path"], "tag": tag},
-            )
-            stats["tags"] += 1
+    # Pass 1: UPSERT all note nodes in one batch
+    _upsert_notes(db, notes, stored)
+    stats["notes"] = len(notes)
 
-        # Create wikilink relationships (only if target note exists)
-        for link_title in note["links"]:
-            target = db.query(
-                "SELECT VALUE id FROM note WHERE title = $title",
-                {"title": link_title},
-            )
-            if target:
-                db.query(
-                    "RELATE (SELECT VALUE id FROM note WHERE path = $source_path)"
-                    "->links_to->"
-                    "(SELECT VALUE id FROM note WHERE title = $target_title)",
-                    {"source_path": note["path"], "target_title": link_title},
-                )
-                stats["links"] += 1
+    # Pass 2: rebuild relationships. After passes 0 and 1 the graph holds
+    # exactly the notes on disk, so wikilink targets are resolved against
+    # their titles without querying.
+    stats["tags"], stats["links"] = _relate_notes(db, notes, {n["title"] for n in notes})
 
     return stats
 
 
+def _upsert_notes(db: GraphDB, notes: list[dict], stored: list[dict]) -> None:
+    """UPSERT note nodes in one batch.
+
+    Note text is only sent and written when its hash differs from the one
+    stored with it (``stored`` rows carry path and structural_hash), so a
+    steady-state re-sync doesn't rewrite every note's content.
+    """
+    stored_hashes = {row["path"]: row.get("structural_hash") for row in stored if row.get("path")}
+    changed = []
+    unchanged = []
+    for n in notes:
+        content_hash = hashlib.sha256(n["content"].encode("utf-8")).hexdigest()
+        if stored_hashes.get(n["path"]) == content_hash:
+            unchanged.append({"path": n["path"], "title": n["title"]})
+        else:
+            changed.append(
+                {
+                    "path": n["path"],
+                    "title": n["title"],
+                    "content": n["content"],
+                    "hash": content_hash,
+                }
+            )
+    db.execute(
+        "FOR $n IN $changed {"
+        " UPSERT note SET path = $n.path, title = $n.title, content = $n.content,"
+        " structural_hash = $n.hash, modified_at = time::now() WHERE path = $n.path;"
+        "};"
+        "FOR $n IN $unchanged {"
+        " UPDATE note SET title = $n.title, modified_at = time::now() WHERE path = $n.path;"
+        "};"
+        # Set created_at only on first insert
+        "UPDATE note SET created_at = time::now() WHERE path INSIDE $paths AND created_at = NONE;",
+        {"changed": changed, "unchanged": unchanged, "paths": [n["path"] for n in notes]},
+    )
+
+
+def _relate_notes(db: GraphDB, notes: list[dict], titles: set[str]) -> tuple[int, int]:
+    """Rebuild the notes' tag and wikilink edges in one batch.
+
+    Wikilinks are only related when their target is in ``titles``.
+    Returns the number of (tag, link) edges created.
+    """
+    # parse_note already dedupes within a note; the pair sets also guard
+    # against repeated (note, tag) / (note, target) rows from any other source
+    tag_pairs = dict.fromkeys((n["path"], tag) for n in notes for tag in n["tags"])
+    link_pairs = dict.fromkeys(
+        (n["path"], title) for n in notes for title in n["links"] if title in titles
+    )
+    tag_rows = [{"path": path, "tag": tag} for path, tag in tag_pairs]
+    link_rows = [{"path": path, "title": title} for path, title in link_pairs]
+    db.execute(
+        # Clear old structural relationships before re-creating
+        "LET $ids = (SELECT VALUE id FROM note WHERE path INSIDE $paths);"
+        "DELETE tagged_with, links_to WHERE in INSIDE $ids;"
+        "FOR $t IN $tags { UPSERT tag SET name = $t WHERE name = $t; };"
+        "FOR $r IN $tag_rows {"
+        " RELATE (SELECT VALUE id FROM note WHERE path = $r.path)"
+        "->tagged_with->(SELECT VALUE id FROM tag WHERE name = $r.tag);"
+        "};"
+        # Wikilinks (only to notes that exist)
+        "FOR $r IN $link_rows {"
+        " RELATE (SELECT VALUE id FROM note WHERE path = $r.path)"
+        "->links_to->(SELECT VALUE id FROM note WHERE title = $r.title);"
+        "};",
+        {
+            "paths": [n["path"] for n in notes],
+            "tags": sorted({tag for _, tag in tag_pairs}),
+            "tag_rows": tag_rows,
+            "link_rows": link_rows,
+        },
+    )
+    return len(tag_rows), len(link_rows)
+
+
 def sync_all(
     db: GraphDB,
     pipeline: KGPipeline,
     notes_path: Path,
+    concurrency: int | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
 ) -> dict:
     """Full sync: semantic first (creates note nodes), then structural
     (adds tags, wikilinks onto those same nodes).
     Both steps are incremental — only dirty files are processed."""
-    semantic = sync_semantic(db, pipeline, notes_path)
+    semantic = sync_semantic(
+        db, pipeline, notes_path, concurrency=concurrency, on_progress=on_progress
+    )
     structural = sync_structural(db, notes_path)
     return {"structural": structural, "semantic": semantic}
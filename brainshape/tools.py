@@ -1,16 +1,30 @@
+import functools
 import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
 from pathlib import Path
 
+import orjson
 from langchain_core.tools import tool
 
 from brainshape.graph_db import GraphDB
-from brainshape.kg_pipeline import KGPipeline
+from brainshape.kg_pipeline import KGPipeline, knn_operator
 from brainshape.notes import parse_note, rewrite_note, write_note
 
-# Set by create_brainshape_agent() before tools are used
+# Set by create_brainshape_agent() before tools are used.
+# The tools stay synchronous: the server drives the agent with astream(), and
+# LangChain runs sync tools in a thread pool there, so parallel tool calls
+# already overlap without blocking the event loop.
 db: GraphDB | None = None
 pipeline: KGPipeline | None = None
 
+# title -> vault-relative path, loaded lazily from the graph and kept fresh by
+# this module's writes. Entries are checked against the filesystem on use, so
+# renames and deletes made elsewhere fall back to a graph lookup.
+_title_index: dict[str, str] | None = None
+
 
 def _get_db() -> GraphDB:
     """Return the db instance, raising if tools are used before agent init."""
@@ -26,10 +40,20 @@ def _get_pipeline() -> KGPipeline:
     return pipeline
 
 
+@functools.lru_cache(maxsize=1)
+def _expand_notes_path(setting: str) -> Path:
+    return Path(setting).expanduser()
+
+
 def _notes_path() -> Path:
+    """The configured notes directory.
+
+    Expansion is memoized on the raw setting, so a changed notes_path is
+    picked up without any explicit cache reset.
+    """
     from brainshape.settings import get_notes_path
 
-    return Path(get_notes_path()).expanduser()
+    return _expand_notes_path(get_notes_path())
 
 
 def _sanitize_identifier(name: str) -> str:
@@ -37,58 +61,127 @@ def _sanitize_identifier(name: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_]", "_", name).lower()
 
 
+def _note_path_for_title(notes_path: Path, title: str) -> str:
+    """Resolve a note title to its vault-relative path, or "" if unknown."""
+    global _title_index
+    _db = _get_db()
+    if _title_index is None:
+        # First row wins for duplicate titles, matching the LIMIT 1 lookup below
+        _title_index = {}
+        for r in _db.query("SELECT title, path FROM note"):
+            if r.get("title") and r.get("path"):
+                _title_index.setdefault(r["title"], r["path"])
+    path = _title_index.get(title)
+    if path and Path(path).stem == title and (notes_path / path).is_file():
+        return path
+
+    results = _db.query(
+        "SELECT path FROM note WHERE title = $title LIMIT 1",
+        {"title": title},
+    )
+    path = results[0]["path"] if results else ""
+    if path:
+        _title_index[title] = path
+    else:
+        _title_index.pop(title, None)
+    return path
+
+
+_NOTE_SYNC_SQL = (
+    # One transaction: readers never see the note with its edges half-rebuilt
+    "BEGIN TRANSACTION;"
+    # Clearing structural_hash makes the next structural sync rewrite content
+    "UPSERT note SET path = $path, title = $title, content = $content, "
+    "structural_hash = NONE, modified_at = time::now() WHERE path = $path;"
+    "UPDATE note SET created_at = time::now() WHERE path = $path AND created_at = NONE;"
+    # Clear old structural edges before re-creating
+    "LET $nid = (SELECT VALUE id FROM note WHERE path = $path)[0];"
+    "DELETE tagged_with WHERE in = $nid;"
+    "DELETE links_to WHERE in = $nid;"
+    "FOR $tag IN $tags {"
+    " UPSERT tag SET name = $tag WHERE name = $tag;"
+    " RELATE $nid->tagged_with->(SELECT VALUE id FROM tag WHERE name = $tag);"
+    "};"
+    # Wikilinks only to notes that exist
+    "FOR $title IN $links {"
+    " LET $targets = (SELECT VALUE id FROM note WHERE title = $title);"
+    " IF array::len($targets) > 0 { RELATE $nid->links_to->$targets; };"
+    "};"
+    "COMMIT TRANSACTION;"
+)
+
+
 def _sync_note_structural(note_data: dict) -> None:
     """UPSERT note and structural relationships.
 
     Clears old edges before re-creating them so stale tags/links don't persist.
+    Runs as a single transactional query regardless of how many tags and links
+    the note has. Raises ``RuntimeError`` if the transaction fails.
     """
-    _db = _get_db()
-    _db.query(
-        "UPSERT note SET path = $path, title = $title, content = $content, "
-        "modified_at = time::now() WHERE path = $path",
+    _get_db().execute(
+        _NOTE_SYNC_SQL,
         {
             "path": note_data["path"],
             "title": note_data["title"],
             "content": note_data["content"],
+            "tags": list(dict.fromkeys(note_data["tags"])),
+            "links": list(dict.fromkeys(note_data["links"])),
         },
     )
-    _db.query(
-        "UPDATE note SET created_at = time::now() WHERE path = $path AND created_at = NONE",
-        {"path": note_data["path"]},
-    )
-    # Clear old structural edges before re-creating
-    nid_q = "(SELECT VALUE id FROM note WHERE path = $path)[0]"
-    _db.query(f"DELETE tagged_with WHERE in = {nid_q}", {"path": note_data["path"]})
-    _db.query(f"DELETE links_to WHERE in = {nid_q}", {"path": note_data["path"]})
-    for tag in note_data["tags"]:
-        _db.query(
-            "UPSERT tag SET name = $tag WHERE name = $tag",
-            {"tag": tag},
-        )
-        _db.query(
-            "RELATE (SELECT VALUE id FROM note WHERE path = $path)"
-            "->tagged_with->"
-            "(SELECT VALUE id FROM tag WHERE name = $tag)",
-            {"path": note_data["path"], "tag": tag},
-        )
-    for link_title in note_data["links"]:
-        target = _db.query(
-            "SELECT VALUE id FROM note WHERE title = $title",
-            {"title": link_title},
-        )
-        if target:
-            _db.query(
-                "RELATE (SELECT VALUE id FROM note WHERE path = $source_path)"
-                "->links_to->"
-                "(SELECT VALUE id FROM note WHERE title = $target_title)",
-                {"source_path": note_data["path"], "target_title": link_title},
-            )
+    clear_search_cache()
+    if _title_index is not None:
+        # Don't repoint an existing title at a same-named note in another folder
+        _title_index.setdefault(note_data["title"], note_data["path"])
+
+
+# Recent results of the read-only search tools, keyed on (tool, argument).
+# Agents often repeat a search within a turn or on retry. This module's writes,
+# graph syncs and the server's note deletes clear the cache.
+_SEARCH_CACHE_SIZE = 256
+_SEARCH_CACHE_TTL = 60.0
+_search_cache: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+_search_cache_owner: tuple[GraphDB | None, KGPipeline | None] = (None, None)
+_search_cache_lock = threading.Lock()
+
+
+def clear_search_cache() -> None:
+    """Forget cached search results (after writes to the graph)."""
+    with _search_cache_lock:
+        _search_cache.clear()
+
+
+def _cached_search(name: str, arg: str, run: Callable[[str], str]) -> str:
+    """Return run(arg), reusing a result from the last _SEARCH_CACHE_TTL seconds."""
+    global _search_cache_owner
+    key = (name, arg)
+    now = time.monotonic()
+    with _search_cache_lock:
+        # Results belong to one db/pipeline pair; drop them when either is replaced
+        owner_db, owner_pipeline = _search_cache_owner
+        if owner_db is not db or owner_pipeline is not pipeline:
+            _search_cache.clear()
+            _search_cache_owner = (db, pipeline)
+        hit = _search_cache.get(key)
+        if hit is not None and hit[0] > now:
+            _search_cache.move_to_end(key)
+            return hit[1]
+    result = run(arg)
+    with _search_cache_lock:
+        _search_cache[key] = (now + _SEARCH_CACHE_TTL, result)
+        _search_cache.move_to_end(key)
+        if len(_search_cache) > _SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
+    return result
 
 
 @tool
 def search_notes(query: str) -> str:
     """Search notes in the knowledge graph by keyword.
     Returns matching note titles and snippets."""
+    return _cached_search("search_notes", query, _search_notes)
+
+
+def _search_notes(query: str) -> str:
     results = _get_db().query(
         "SELECT title, path, string::slice(content, 0, 200) AS snippet, "
         "search::score(1) AS score "
@@ -99,7 +192,7 @@ def search_notes(query: str) -> str:
     if not results:
         return "No notes found matching your query."
     return "\n\n".join(
-        f"**{r['title']}** (score: {r.get('score', 0):.2f})\n{r['snippet']}..." for r in results
+        [f"**{r['title']}** (score: {r.get('score', 0):.2f})\n{r['snippet']}..." for r in results]
     )
 
 
@@ -109,6 +202,10 @@ def semantic_search(query: str) -> str:
     Use this when keyword search misses relevant results, or when you need
     to find notes that are conceptually related to a topic even if they
     don't contain the exact words."""
+    return _cached_search("semantic_search", query, _semantic_search)
+
+
+def _semantic_search(query: str) -> str:
     embedding = _get_pipeline().embed_query(query)
     results = _get_db().query(
         "SELECT "
@@ -117,15 +214,18 @@ def semantic_search(query: str) -> str:
         "string::slice(text, 0, 300) AS chunk, "
         "vector::similarity::cosine(embedding, $embedding) AS score "
         "FROM chunk "
-        "WHERE embedding <|10,40|> $embedding "
+        f"WHERE embedding {knn_operator(10)} $embedding "
         "ORDER BY score DESC",
         {"embedding": embedding},
     )
     if not results:
         return "No semantically similar content found."
     return "\n\n".join(
-        f"**{r.get('title', 'untitled')}** (score: {r.get('score', 0):.2f})\n{r.get('chunk', '')}"
-        for r in results
+        [
+            f"**{r.get('title', 'untitled')}** (score: {r.get('score', 0):.2f})\n"
+            f"{r.get('chunk', '')}"
+            for r in results
+        ]
     )
 
 
@@ -156,7 +256,10 @@ def create_note(title: str, content: str, tags: str = "", folder: str = "") -> s
 
     # Structural sync (adds note, tags, wikilinks)
     note_data = parse_note(file_path, notes_path)
-    _sync_note_structural(note_data)
+    try:
+        _sync_note_structural(note_data)
+    except RuntimeError as e:
+        return f"Created note '{title}' at {rel_path}, but syncing it to the graph failed: {e}"
 
     return f"Created note '{title}' at {rel_path}"
 
@@ -169,12 +272,8 @@ def edit_note(title: str, new_content: str) -> str:
     knowledge graph."""
     notes_path = _notes_path()
 
-    # Look up the note's actual path from the graph
-    results = _get_db().query(
-        "SELECT path FROM note WHERE title = $title LIMIT 1",
-        {"title": title},
-    )
-    relative_path = results[0]["path"] if results else ""
+    # Look up the note's actual path (cached index, graph on miss)
+    relative_path = _note_path_for_title(notes_path, title)
 
     try:
         file_path = rewrite_note(notes_path, title, new_content, relative_path=relative_path)
@@ -183,12 +282,36 @@ def edit_note(title: str, new_content: str) -> str:
 
     # Re-sync structural relationships (edge cleanup handled inside)
     note_data = parse_note(file_path, notes_path)
-    _sync_note_structural(note_data)
-
     rel_path = file_path.relative_to(notes_path)
+    try:
+        _sync_note_structural(note_data)
+    except RuntimeError as e:
+        return f"Updated note '{title}' at {rel_path}, but syncing it to the graph failed: {e}"
+
     return f"Updated note '{title}' at {rel_path}"
 
 
+# Caps on what query_graph echoes back, so one wide row (a note's content,
+# a chunk's embedding) can't flood the agent's context
+_QUERY_MAX_ROWS = 20
+_QUERY_MAX_CHARS = 200
+_QUERY_MAX_ITEMS = 10
+
+
+def _clip_value(value):
+    """Truncate long strings and lists, recursing into dicts and lists."""
+    if isinstance(value, str):
+        return value if len(value) <= _QUERY_MAX_CHARS else value[:_QUERY_MAX_CHARS] + "…"
+    if isinstance(value, dict):
+        return {k: _clip_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        clipped = [_clip_value(v) for v in value[:_QUERY_MAX_ITEMS]]
+        if len(value) > _QUERY_MAX_ITEMS:
+            clipped.append(f"… {len(value) - _QUERY_MAX_ITEMS} more")
+        return clipped
+    return value
+
+
 @tool
 def query_graph(surql: str) -> str:
     """Run a SurrealQL query against the knowledge graph. Use this to explore
@@ -210,11 +333,16 @@ def query_graph(surql: str) -> str:
     """
     try:
         results = _get_db().query(surql)
+        # The query may have written to the graph
+        clear_search_cache()
         if not results:
             return "Query returned no results."
-        lines = [str(row) for row in results[:20]]
-        if len(results) > 20:
-            lines.append(f"... and {len(results) - 20} more rows")
+        lines = [
+            orjson.dumps(_clip_value(row), default=str).decode()
+            for row in results[:_QUERY_MAX_ROWS]
+        ]
+        if len(results) > _QUERY_MAX_ROWS:
+            lines.append(f"... and {len(results) - _QUERY_MAX_ROWS} more rows")
         return "\n".join(lines)
     except Exception as e:
         return f"SurrealQL query error: {e}"
@@ -224,28 +352,27 @@ def query_graph(surql: str) -> str:
 def find_related(title: str) -> str:
     """Find notes and knowledge related to a given note title.
     Shows wikilink connections, shared tags, and any agent-created relationships."""
-    _db = _get_db()
+    return _cached_search("find_related", title, _find_related)
 
-    results = _db.query(
-        "SELECT "
+
+def _find_related(title: str) -> str:
+    # One query for both the exact and the fuzzy match: every exact match also
+    # contains the title, and is flagged so it can be preferred below.
+    results = _get_db().query(
+        "SELECT title, title = $title AS exact, "
         "->tagged_with->tag.name AS tags, "
         "->links_to->note.{title, path} AS outgoing_links, "
         "<-links_to<-note.{title, path} AS incoming_links "
-        "FROM note WHERE title = $title",
+        "FROM note WHERE string::lowercase(title) CONTAINS string::lowercase($title) "
+        "ORDER BY exact DESC",
         {"title": title},
     )
 
+    # Fall back to the fuzzy matches only when the exact note has no connections
     keys = ("tags", "outgoing_links", "incoming_links")
-    if not results or not any(results[0].get(k) for k in keys):
-        # Try fuzzy match
-        results = _db.query(
-            "SELECT title, "
-            "->tagged_with->tag.name AS tags, "
-            "->links_to->note.{title, path} AS outgoing_links, "
-            "<-links_to<-note.{title, path} AS incoming_links "
-            "FROM note WHERE string::lowercase(title) CONTAINS string::lowercase($title)",
-            {"title": title},
-        )
+    exact = [r for r in results if r.get("exact")]
+    if exact and any(exact[0].get(k) for k in keys):
+        results = exact
 
     if not results:
         return f"No connections found for '{title}'."
@@ -265,7 +392,7 @@ def find_related(title: str) -> str:
             incoming = incoming[0]
 
         if tags:
-            lines.append(f"Tags: {', '.join(str(t) for t in tags)}")
+            lines.append(f"Tags: {', '.join([str(t) for t in tags])}")
         if outgoing:
             lines.append("Links to:")
             for link in outgoing:
@@ -330,6 +457,34 @@ _ENTITY_LOOKUP: dict[str, dict] = {
 }
 
 
+@functools.lru_cache(maxsize=128)
+def _lookup_sql(table: str, field: str) -> str:
+    return f"SELECT VALUE id FROM {table} WHERE {field} = $val"  # noqa: S608
+
+
+@functools.lru_cache(maxsize=128)
+def _upsert_entity_sql(table: str) -> str:
+    return f"UPSERT {table} SET name = $name WHERE name = $name"  # noqa: S608
+
+
+@functools.lru_cache(maxsize=128)
+def _connection_sql(
+    src_table: str, src_field: str, rel_type: str, tgt_table: str, tgt_field: str
+) -> tuple[str, str, str]:
+    """(define, exists, relate) statements for one kind of connection.
+
+    Built once per table/field/relationship combination rather than
+    re-formatted on every create_connection call.
+    """
+    src = f"(SELECT VALUE id FROM {src_table} WHERE {src_field} = $src)"  # noqa: S608
+    tgt = f"(SELECT VALUE id FROM {tgt_table} WHERE {tgt_field} = $tgt)"  # noqa: S608
+    return (
+        f"DEFINE TABLE OVERWRITE {rel_type} TYPE RELATION",
+        f"SELECT VALUE id FROM {rel_type} WHERE in = {src}[0] AND out = {tgt}[0] LIMIT 1",  # noqa: S608
+        f"RELATE {src}->{rel_type}->{tgt}",
+    )
+
+
 def _resolve_entity(db: GraphDB, table: str, identifier: str) -> bool:
     """Ensure an entity exists. Returns True if found/created.
 
@@ -338,17 +493,10 @@ def _resolve_entity(db: GraphDB, table: str, identifier: str) -> bool:
     """
     lookup = _ENTITY_LOOKUP.get(table)
     if lookup:
-        field = lookup["field"]
-        results = db.query(
-            f"SELECT VALUE id FROM {table} WHERE {field} = $val",  # noqa: S608
-            {"val": identifier},
-        )
+        results = db.query(_lookup_sql(table, lookup["field"]), {"val": identifier})
         return bool(results)
     # Generic entity: UPSERT by name
-    db.query(
-        f"UPSERT {table} SET name = $name WHERE name = $name",  # noqa: S608
-        {"name": identifier},
-    )
+    db.query(_upsert_entity_sql(table), {"name": identifier})
     return True
 
 
@@ -398,26 +546,18 @@ def create_connection(
     src_field = _ENTITY_LOOKUP.get(src_table, {}).get("field", "name")
     tgt_field = _ENTITY_LOOKUP.get(tgt_table, {}).get("field", "name")
 
+    define_sql, exists_sql, relate_sql = _connection_sql(
+        src_table, src_field, rel_type, tgt_table, tgt_field
+    )
+    params = {"src": source_name, "tgt": target_name}
+
     # Ensure the edge table is defined as TYPE RELATION so graph discovery works.
     # OVERWRITE is needed because RELATE auto-creates tables as TYPE ANY.
-    _db.query(
-        f"DEFINE TABLE OVERWRITE {rel_type} TYPE RELATION",  # noqa: S608
-    )
+    _db.query(define_sql)
 
     # Check if this exact relationship already exists to avoid duplicates
-    existing = _db.query(
-        f"SELECT VALUE id FROM {rel_type} "  # noqa: S608
-        f"WHERE in = (SELECT VALUE id FROM {src_table} WHERE {src_field} = $src)[0] "
-        f"AND out = (SELECT VALUE id FROM {tgt_table} WHERE {tgt_field} = $tgt)[0] LIMIT 1",
-        {"src": source_name, "tgt": target_name},
-    )
-    if not existing:
-        _db.query(
-            f"RELATE (SELECT VALUE id FROM {src_table} WHERE {src_field} = $src)"  # noqa: S608
-            f"->{rel_type}->"
-            f"(SELECT VALUE id FROM {tgt_table} WHERE {tgt_field} = $tgt)",
-            {"src": source_name, "tgt": target_name},
-        )
+    if not _db.query(exists_sql, params):
+        _db.query(relate_sql, params)
 
     return f"Connected {src_table}:{source_name} -[{rel_type}]-> {tgt_table}:{target_name}"
 
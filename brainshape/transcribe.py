@@ -4,8 +4,14 @@ Supports local (mlx-whisper on Apple Silicon), OpenAI Whisper API,
 and Mistral Voxtral API. Provider selection is settings-driven.
 """
 
+import atexit
 import logging
+import multiprocessing
 import os
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -13,6 +19,12 @@ logger = logging.getLogger(__name__)
 # Lazy-loaded local model reference
 _local_model_path: str | None = None
 
+# mlx_whisper module, imported on first local transcription. The import pulls
+# in the MLX runtime, so it is done once and reused for the rest of the session.
+# mlx_whisper keeps the loaded weights for the last model path itself, so
+# holding on to the module is what keeps them resident between calls.
+_mlx_whisper = None
+
 
 def _get_model(settings: dict) -> str:
     """Resolve the transcription model, falling back to provider default."""
@@ -25,19 +37,38 @@ def _get_model(settings: dict) -> str:
     return TRANSCRIPTION_MODEL_DEFAULTS.get(provider, "mlx-community/whisper-small")
 
 
-def _transcribe_local(audio_path: str | Path, settings: dict) -> dict:
+def _iter_segments(raw_segments: Iterable[dict]) -> Iterator[dict]:
+    """Yield provider segments as {start, end, text} dicts."""
+    for seg in raw_segments:
+        yield {
+            "start": seg.get("start", 0),
+            "end": seg.get("end", 0),
+            "text": seg.get("text", "").strip(),
+        }
+
+
+def _get_mlx_whisper():
+    """Import mlx_whisper on first use and cache the module."""
+    global _mlx_whisper
+
+    if _mlx_whisper is None:
+        try:
+            import mlx_whisper  # type: ignore[unresolved-import]
+        except ImportError:
+            raise RuntimeError(
+                "Local transcription requires mlx-whisper (Apple Silicon only). "
+                "Install it with `uv add mlx-whisper`, or switch to a cloud "
+                "provider (OpenAI or Mistral) in Settings > Voice Transcription."
+            ) from None
+        _mlx_whisper = mlx_whisper
+    return _mlx_whisper
+
+
+def _transcribe_local(audio_path: str | Path, settings: dict, segments: bool = True) -> dict:
     """Transcribe using local mlx-whisper (Apple Silicon only)."""
     global _local_model_path
 
-    try:
-        import mlx_whisper  # type: ignore[unresolved-import]
-    except ImportError:
-        raise RuntimeError(
-            "Local transcription requires mlx-whisper (Apple Silicon only). "
-            "Install it with `uv add mlx-whisper`, or switch to a cloud "
-            "provider (OpenAI or Mistral) in Settings > Voice Transcription."
-        ) from None
-
+    mlx_whisper = _get_mlx_whisper()
     model_path = _get_model(settings)
     _local_model_path = model_path
     logger.info("Transcribing %s with local model %s", audio_path, model_path)
@@ -51,18 +82,52 @@ def _transcribe_local(audio_path: str | Path, settings: dict) -> dict:
 
     return {
         "text": result["text"].strip(),
-        "segments": [
-            {
-                "start": seg["start"],
-                "end": seg["end"],
-                "text": seg["text"].strip(),
-            }
-            for seg in result.get("segments", [])
-        ],
+        "segments": list(_iter_segments(result.get("segments", []))) if segments else [],
     }
 
 
-def _transcribe_openai(audio_path: str | Path, settings: dict) -> dict:
+# Local transcriptions run in a single long-lived worker process. MLX inference
+# holds its thread for seconds to minutes; keeping it out of the server process
+# leaves the interpreter free for agent streams and other requests. "spawn"
+# matches the notes parse pool: the server is multi-threaded and must not fork.
+# The worker keeps mlx_whisper and the loaded weights between requests.
+_local_pool: ProcessPoolExecutor | None = None
+_local_pool_lock = threading.Lock()
+
+
+def _get_local_pool() -> ProcessPoolExecutor:
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_local_pool.shutdown, cancel_futures=True)
+        return _local_pool
+
+
+def _discard_local_pool() -> None:
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is not None:
+            _local_pool.shutdown(wait=False, cancel_futures=True)
+            _local_pool = None
+
+
+def _transcribe_local_in_worker(
+    audio_path: str | Path, settings: dict, segments: bool = True
+) -> dict:
+    """Run _transcribe_local in the local transcription worker process."""
+    future = _get_local_pool().submit(_transcribe_local, str(audio_path), settings, segments)
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_local_pool()
+        raise RuntimeError("Local transcription worker exited unexpectedly") from None
+
+
+def _transcribe_openai(audio_path: str | Path, settings: dict, segments: bool = True) -> dict:
     """Transcribe using OpenAI Whisper API."""
     import httpx
 
@@ -93,18 +158,11 @@ def _transcribe_openai(audio_path: str | Path, settings: dict) -> dict:
     data = response.json()
     return {
         "text": data.get("text", "").strip(),
-        "segments": [
-            {
-                "start": seg.get("start", 0),
-                "end": seg.get("end", 0),
-                "text": seg.get("text", "").strip(),
-            }
-            for seg in data.get("segments", [])
-        ],
+        "segments": list(_iter_segments(data.get("segments", []))) if segments else [],
     }
 
 
-def _transcribe_mistral(audio_path: str | Path, settings: dict) -> dict:
+def _transcribe_mistral(audio_path: str | Path, settings: dict, segments: bool = True) -> dict:
     """Transcribe using Mistral Voxtral API."""
     import httpx
 
@@ -137,32 +195,26 @@ def _transcribe_mistral(audio_path: str | Path, settings: dict) -> dict:
         ) from None
 
     data = response.json()
-    segments = data.get("segments", [])
     return {
         "text": data.get("text", "").strip(),
-        "segments": [
-            {
-                "start": seg.get("start", 0),
-                "end": seg.get("end", 0),
-                "text": seg.get("text", "").strip(),
-            }
-            for seg in segments
-        ],
+        "segments": list(_iter_segments(data.get("segments", []))) if segments else [],
     }
 
 
 _PROVIDERS = {
-    "local": _transcribe_local,
+    "local": _transcribe_local_in_worker,
     "openai": _transcribe_openai,
     "mistral": _transcribe_mistral,
 }
 
 
-def transcribe_audio(audio_path: str | Path) -> dict:
+def transcribe_audio(audio_path: str | Path, segments: bool = True) -> dict:
     """Transcribe an audio file using the configured provider.
 
     Args:
         audio_path: Path to the audio file (wav, mp3, m4a, webm, etc.)
+        segments: Build the timestamped segment list. Callers that only
+            need the text pass False and get an empty list.
 
     Returns:
         Dict with 'text' (full transcription) and 'segments'
@@ -178,10 +230,16 @@ def transcribe_audio(audio_path: str | Path) -> dict:
         raise ValueError(
             f"Unknown transcription provider: {provider!r}. Valid: {', '.join(sorted(_PROVIDERS))}"
         )
-    return fn(audio_path, settings)
+    return fn(audio_path, settings, segments)
 
 
 def reset_model():
-    """Reset the cached local model path (e.g. after settings change)."""
-    global _local_model_path
+    """Reset the cached local model (e.g. after settings change).
+
+    Also stops the local transcription worker, releasing the weights it holds;
+    the next local transcription starts a fresh one.
+    """
+    global _local_model_path, _mlx_whisper
     _local_model_path = None
+    _mlx_whisper = None
+    _discard_local_pool()
@@ -5,35 +5,66 @@ sync when markdown files are created, modified, or deleted.
 """
 
 import logging
+import os
 from collections.abc import Callable
 from pathlib import Path
 
-from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.events import FileSystemEvent, PatternMatchingEventHandler
 from watchdog.observers import Observer
 
+from brainshape.notes import compute_file_hash
+
 logger = logging.getLogger(__name__)
 
 
-class NoteChangeHandler(FileSystemEventHandler):
-    """Debounced handler that triggers sync on .md file changes."""
+class NoteChangeHandler(PatternMatchingEventHandler):
+    """Debounced handler that triggers sync on .md file changes.
+
+    Non-markdown files, directories and trashed notes are filtered out in
+    ``dispatch()`` before any handler runs, so editor swap files and
+    ``.DS_Store`` churn cost no more than a pattern match.
+
+    Paths changed during the quiet period are coalesced and passed to
+    ``on_change`` together, so a sync can be limited to them. Saves that
+    leave a file's content unchanged (mtime touches, atomic-rename saves
+    of the same text) are recognized by content hash and don't schedule a
+    sync at all.
+    """
 
-    def __init__(self, on_change: Callable[[], None]):
-        super().__init__()
+    def __init__(self, on_change: Callable[[set[Path]], None]):
+        super().__init__(
+            patterns=["*.md"],
+            # Notes trashed from the vault root. Nested trash paths still get
+            # through; sync drops them via select_notes()
+            ignore_patterns=["*/.trash/*"],
+            ignore_directories=True,
+            case_sensitive=True,
+        )
         self._on_change = on_change
         self._timer = None
         self._debounce_seconds = 2.0
         self._lock = __import__("threading").Lock()
+        self._dirty: set[Path] = set()
+        self._hashes: dict[Path, str] = {}
 
-    def _is_markdown(self, path: str | bytes) -> bool:
-        if isinstance(path, bytes):
-            return path.endswith(b".md")
-        return path.endswith(".md")
+    def _content_changed(self, path: Path) -> bool:
+        """Record the file's content hash; False if it matches the last one seen."""
+        try:
+            digest = compute_file_hash(path)
+        except OSError:
+            return True  # gone or unreadable: let the sync decide
+        with self._lock:
+            if self._hashes.get(path) == digest:
+                return False
+            self._hashes[path] = digest
+        return True
 
-    def _schedule_sync(self) -> None:
+    def _schedule_sync(self, path: Path) -> None:
         """Debounce: reset timer on each event, fire after quiet period."""
         import threading
 
         with self._lock:
+            self._dirty.add(path)
             if self._timer is not None:
                 self._timer.cancel()
             self._timer = threading.Timer(self._debounce_seconds, self._fire)
@@ -43,30 +74,36 @@ class NoteChangeHandler(FileSystemEventHandler):
     def _fire(self) -> None:
         with self._lock:
             self._timer = None
+            dirty, self._dirty = self._dirty, set()
         try:
-            self._on_change()
+            self._on_change(dirty)
         except Exception:
             logger.exception("Error during auto-sync")
 
     def on_created(self, event: FileSystemEvent) -> None:
-        if not event.is_directory and self._is_markdown(event.src_path):
-            logger.info("Note created: %s", event.src_path)
-            self._schedule_sync()
+        path = Path(os.fsdecode(event.src_path))
+        if self._content_changed(path):
+            logger.info("Note created: %s", path)
+            self._schedule_sync(path)
 
     def on_modified(self, event: FileSystemEvent) -> None:
-        if not event.is_directory and self._is_markdown(event.src_path):
-            logger.info("Note modified: %s", event.src_path)
-            self._schedule_sync()
+        path = Path(os.fsdecode(event.src_path))
+        if self._content_changed(path):
+            logger.info("Note modified: %s", path)
+            self._schedule_sync(path)
 
     def on_deleted(self, event: FileSystemEvent) -> None:
-        if not event.is_directory and self._is_markdown(event.src_path):
-            logger.info("Note deleted: %s", event.src_path)
-            self._schedule_sync()
+        path = Path(os.fsdecode(event.src_path))
+        with self._lock:
+            self._hashes.pop(path, None)
+        logger.info("Note deleted: %s", path)
+        self._schedule_sync(path)
 
 
-def start_watcher(notes_path: Path, on_change: Callable[[], None]) -> Observer:  # type: ignore[invalid-type-form]
+def start_watcher(notes_path: Path, on_change: Callable[[set[Path]], None]) -> Observer:  # type: ignore[invalid-type-form]
     """Start watching the notes directory for .md changes.
 
+    ``on_change`` receives the set of paths changed since the last call.
     Returns the Observer instance (call .stop() to shut down).
     """
     handler = NoteChangeHandler(on_change)
@@ -185,10 +185,21 @@ export function deleteFolder(
   return request(`/notes/folder/${encodePath(path)}`, { method: "DELETE" });
 }
 
-export function syncStructural(): Promise<{ status: string; stats: Record<string, number> }> {
+export interface SyncJobStatus {
+  status: "running" | "done" | "error";
+  kind: "structural" | "semantic" | "full";
+  stats?: Record<string, unknown>;
+  error?: string;
+}
+
+export function syncStructural(): Promise<{ status: string; job_id: string }> {
   return request("/sync/structural", { method: "POST" });
 }
 
+export function getSyncStatus(jobId: string): Promise<SyncJobStatus> {
+  return request(`/sync/status/${encodeURIComponent(jobId)}`);
+}
+
 // --- Import ---
 
 export interface ImportVaultResult {
@@ -270,6 +281,15 @@ export function updateSettings(
   });
 }
 
+export interface SettingsReloadStatus {
+  status: "ready" | "in_progress" | "error";
+  error?: string;
+}
+
+export function getSettingsReloadStatus(): Promise<SettingsReloadStatus> {
+  return request("/settings/reload/status");
+}
+
 // --- Transcription ---
 
 export interface TranscriptionResult {
@@ -283,7 +303,8 @@ export async function transcribeAudio(
   const formData = new FormData();
   formData.append("audio", audioBlob, "recording.wav");
   const base = await baseUrlPromise;
-  const res = await fetch(`${base}/transcribe`, {
+  // Only the text is used by the recorder; skip the segment list.
+  const res = await fetch(`${base}/transcribe?segments=false`, {
     method: "POST",
     body: formData,
   });
@@ -18,9 +18,25 @@ def mock_pipeline():
     pipeline = MagicMock()
     pipeline.embed_query.return_value = [0.1] * 768
     pipeline.run_async = AsyncMock(return_value=None)
+    pipeline.split_content = MagicMock(side_effect=lambda content: [content])
+    pipeline.embed_batch_async = AsyncMock(side_effect=lambda texts: [[0.1]] * len(texts))
+    pipeline.write_async = AsyncMock(return_value=None)
+    pipeline.write_many_async = AsyncMock(return_value=None)
     return pipeline
 
 
+@pytest.fixture
+def graph_db(tmp_path, monkeypatch):
+    """A real embedded SurrealDB, for SurrealQL that mocks can't check."""
+    from brainshape.graph_db import GraphDB
+
+    monkeypatch.setattr("brainshape.config.settings.surrealdb_path", str(tmp_path / "surrealdb"))
+    db = GraphDB()
+    db.bootstrap_schema()
+    yield db
+    db.close()
+
+
 @pytest.fixture
 def tmp_notes(tmp_path):
     """Create a temporary notes directory populated with seed notes."""
@@ -37,9 +53,21 @@ def tools_setup(mock_db, mock_pipeline):
     """Inject mocks into the tools module and reset after each test."""
     tools.db = mock_db
     tools.pipeline = mock_pipeline
+    tools._title_index = None
+    tools.clear_search_cache()
     yield
     tools.db = None
     tools.pipeline = None
+    tools._title_index = None
+    tools.clear_search_cache()
+
+
+@pytest.fixture(autouse=True)
+def claude_sessions_db(tmp_path_factory, monkeypatch):
+    """Keep the Claude Code session store out of the real config directory."""
+    path = tmp_path_factory.mktemp("claude") / "claude_sessions.db"
+    monkeypatch.setattr("brainshape.claude_code.SESSIONS_DB", path)
+    return path
 
 
 @pytest.fixture
@@ -76,6 +76,42 @@ class TestBatchMain:
         mock_sync.assert_called_once()
         mock_db_instance.close.assert_called_once()
 
+    @patch("brainshape.batch.GraphDB")
+    @patch("brainshape.batch.create_kg_pipeline")
+    @patch("brainshape.batch.sync_semantic")
+    def test_concurrency_flag(self, mock_sync, mock_pipeline, mock_db, tmp_path):
+        """--concurrency is passed through to the semantic sync."""
+        mock_sync.return_value = {"processed": 0, "skipped": 0}
+
+        with (
+            patch("brainshape.settings.get_notes_path", return_value=str(tmp_path)),
+            patch("sys.argv", ["batch", "--concurrency", "4"]),
+        ):
+            from brainshape.batch import main
+
+            main()
+
+        assert mock_sync.call_args.kwargs["concurrency"] == 4
+
+    def test_progress_printer_throttles(self, capsys):
+        from brainshape.batch import _ProgressPrinter
+
+        printer = _ProgressPrinter(every_n=3, every_s=3600)
+        for done in range(1, 8):
+            printer(done, 7)
+        assert capsys.readouterr().out.splitlines() == [
+            "Semantic: 3/7 notes",
+            "Semantic: 6/7 notes",
+        ]
+
+    def test_concurrency_must_be_positive(self):
+        with patch("sys.argv", ["batch", "--concurrency", "0"]):
+            from brainshape.batch import main
+
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+            assert exc_info.value.code == 2
+
     @patch("brainshape.batch.GraphDB")
     def test_missing_notes_path_exits(self, mock_db):
         """Exits with code 1 if notes path doesn't exist."""
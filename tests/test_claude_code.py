@@ -8,20 +8,11 @@ import pytest
 
 from brainshape import claude_code
 
-# Common mock patches for subprocess-based tests
-_MOCK_TMP = "/tmp/test-mcp.json"  # noqa: S108
-
 
 def _subprocess_patches(process=None, capture_exec=None):
     """Return a tuple of context managers for mocking subprocess execution."""
     patches = [
         patch.object(claude_code, "_get_claude_binary", return_value="/usr/bin/claude"),
-        patch("tempfile.mkstemp", return_value=(99, _MOCK_TMP)),
-        patch(
-            "os.fdopen",
-            return_value=MagicMock(__enter__=MagicMock(), __exit__=MagicMock()),
-        ),
-        patch.object(Path, "unlink"),
     ]
     if capture_exec is not None:
         patches.insert(
@@ -34,6 +25,12 @@ def _subprocess_patches(process=None, capture_exec=None):
 
 
 class TestGetClaudeBinary:
+    @pytest.fixture(autouse=True)
+    def _clear_cache(self):
+        claude_code._get_claude_binary.cache_clear()
+        yield
+        claude_code._get_claude_binary.cache_clear()
+
     def test_found_on_path(self):
         with patch("shutil.which", return_value="/usr/local/bin/claude"):
             assert claude_code._get_claude_binary() == "/usr/local/bin/claude"
@@ -56,6 +53,12 @@ class TestGetClaudeBinary:
         ):
             claude_code._get_claude_binary()
 
+    def test_lookup_cached(self):
+        with patch("shutil.which", return_value="/usr/local/bin/claude") as which:
+            claude_code._get_claude_binary()
+            claude_code._get_claude_binary()
+        which.assert_called_once()
+
 
 class TestBuildMcpConfig:
     def test_structure(self):
@@ -72,28 +75,55 @@ class TestBuildMcpConfig:
         cwd = Path(config["mcpServers"]["brainshape"]["cwd"])
         assert (cwd / "pyproject.toml").exists()
 
+    def test_json_serialized_once(self):
+        assert json.loads(claude_code._mcp_config_json()) == claude_code._build_mcp_config()
+        assert claude_code._mcp_config_json() is claude_code._mcp_config_json()
+
+
+class TestToolCallData:
+    def test_matches_json_encoding(self):
+        data = claude_code._tool_call_data('say "hi"')
+        assert json.loads(data) == {"name": 'say "hi"', "args": {}}
+
+    def test_reuses_payload_per_tool(self):
+        assert claude_code._tool_call_data("read_note") is claude_code._tool_call_data("read_note")
+
 
 class TestSessionTracking:
     def test_clear_sessions(self):
-        claude_code._active_sessions.add("test-session-1")
-        claude_code._active_sessions.add("test-session-2")
+        claude_code._claim_session("test-session-1")
+        claude_code._claim_session("test-session-2")
         claude_code.clear_sessions()
-        assert len(claude_code._active_sessions) == 0
+        assert not claude_code.has_session("test-session-1")
+        assert not claude_code.has_session("test-session-2")
+
+    def test_claim_reports_known_sessions(self):
+        assert claude_code._claim_session("s") is False
+        assert claude_code._claim_session("s") is True
+
+    def test_sessions_survive_reopen(self, claude_sessions_db):
+        claude_code._claim_session("kept")
+        # A new process opens the store fresh
+        claude_code._sessions_conn[1].close()
+        claude_code._sessions_conn = None
+        assert claude_code.has_session("kept")
+        assert claude_code._claim_session("kept") is True
+        assert claude_sessions_db.exists()
 
-    def test_session_added_on_stream(self):
-        claude_code._active_sessions.clear()
-        assert "new-session" not in claude_code._active_sessions
+    def test_expired_sessions_are_not_resumed(self, monkeypatch):
+        claude_code._claim_session("old")
+        later = claude_code.time.time() + claude_code._SESSION_TTL + 1
+        monkeypatch.setattr(claude_code.time, "time", lambda: later)
+        assert not claude_code.has_session("old")
+        assert claude_code._claim_session("old") is False
+
+    def test_unknown_session(self):
+        assert not claude_code.has_session("new-session")
 
 
 class TestStreamClaudeCodeResponse:
     """Test stream parsing with mocked subprocess."""
 
-    @pytest.fixture(autouse=True)
-    def _clean_sessions(self):
-        claude_code._active_sessions.clear()
-        yield
-        claude_code._active_sessions.clear()
-
     def _make_process(self, stdout_lines, returncode=0):
         """Create a mock async subprocess with given stdout lines."""
         process = AsyncMock()
@@ -113,7 +143,7 @@ class TestStreamClaudeCodeResponse:
         """Run stream and collect all events."""
         process = self._make_process(stdout_lines, returncode)
         patches = _subprocess_patches(process=process)
-        with patches[0], patches[1], patches[2], patches[3], patches[4]:
+        with patches[0], patches[1]:
             events = []
             async for event in claude_code.stream_claude_code_response(
                 message="hello",
@@ -269,10 +299,10 @@ class TestStreamClaudeCodeResponse:
     async def test_process_failure_stderr(self):
         """Test stderr capture on non-zero exit."""
         process = self._make_process([], returncode=1)
-        process.stderr.read = AsyncMock(return_value=b"Permission denied")
+        process.stderr.read = AsyncMock(side_effect=[b"Permission denied", b""])
 
         patches = _subprocess_patches(process=process)
-        with patches[0], patches[1], patches[2], patches[3], patches[4]:
+        with patches[0], patches[1]:
             events = []
             async for event in claude_code.stream_claude_code_response(
                 message="hello",
@@ -285,6 +315,50 @@ class TestStreamClaudeCodeResponse:
         error_events = [e for e in events if e["event"] == "error"]
         assert any("Permission denied" in e["data"] for e in error_events)
 
+    @pytest.mark.asyncio
+    async def test_stderr_drained_while_stdout_streams(self):
+        """Regression: stderr is read as it arrives, not after the process exits."""
+        import asyncio as _asyncio
+
+        stderr = _asyncio.StreamReader()
+        process = self._make_process([], returncode=1)
+        process.stderr = stderr
+
+        async def stdout_after_stderr_read():
+            # Would never finish if stderr were only read after stdout closed
+            stderr.feed_data(b"".join(b"log line %d\n" % i for i in range(300)))
+            while stderr._buffer:
+                await _asyncio.sleep(0)
+            stderr.feed_eof()
+            yield b""
+
+        process.stdout = stdout_after_stderr_read()
+
+        patches = _subprocess_patches(process=process)
+        with patches[0], patches[1]:
+            events = [
+                e
+                async for e in claude_code.stream_claude_code_response(
+                    message="hello", system_prompt="test", session_id="drain", model="sonnet"
+                )
+            ]
+
+        (error,) = [e["data"] for e in events if e["event"] == "error"]
+        lines = error.splitlines()
+        assert len(lines) == claude_code._STDERR_TAIL_LINES
+        assert lines[-1] == "log line 299"
+
+    @pytest.mark.asyncio
+    async def test_stderr_tail_is_whole_lines_across_reads(self):
+        """Lines split across reads are rejoined; the tail counts lines, not reads."""
+        from collections import deque
+
+        stream = AsyncMock()
+        stream.read = AsyncMock(side_effect=[b"first\nsec", b"ond\nthi", b"rd", b""])
+        tail: deque[bytes] = deque(maxlen=2)
+        await claude_code._drain_stderr(stream, tail)
+        assert claude_code._stderr_tail(tail) == "second\nthird"
+
     @pytest.mark.asyncio
     async def test_session_tracking(self):
         """First call should not --resume; session is tracked after."""
@@ -305,7 +379,7 @@ class TestStreamClaudeCodeResponse:
             )
 
         patches = _subprocess_patches(capture_exec=capture_exec)
-        with patches[0], patches[1], patches[2], patches[3], patches[4]:
+        with patches[0], patches[1]:
             async for _ in claude_code.stream_claude_code_response(
                 message="hi",
                 system_prompt="test",
@@ -316,7 +390,28 @@ class TestStreamClaudeCodeResponse:
 
         assert "--resume" not in cmd_args
         assert "--session-id" in cmd_args
-        assert "track-session" in claude_code._active_sessions
+        assert claude_code.has_session("track-session")
+        # The MCP config is passed inline rather than through a temp file
+        config = cmd_args[cmd_args.index("--mcp-config") + 1]
+        assert json.loads(config) == claude_code._build_mcp_config()
+
+    @pytest.mark.asyncio
+    async def test_failed_spawn_releases_new_session(self):
+        async def fail_exec(*args, **kwargs):
+            raise OSError("spawn failed")
+
+        patches = _subprocess_patches(capture_exec=fail_exec)
+        with (
+            patches[0],
+            patches[1],
+            pytest.raises(OSError, match="spawn failed"),
+        ):
+            async for _ in claude_code.stream_claude_code_response(
+                message="hi", system_prompt="test", session_id="fail", model="sonnet"
+            ):
+                pass
+
+        assert not claude_code.has_session("fail")
 
     @pytest.mark.asyncio
     async def test_invalid_json_lines_skipped(self):
@@ -372,9 +467,6 @@ class TestStreamClaudeCodeResponse:
         with (
             patches[0],
             patches[1],
-            patches[2],
-            patches[3],
-            patches[4],
             patch.dict("os.environ", {"CLAUDECODE": "1", "PATH": "/usr/bin"}),
         ):
             async for _ in claude_code.stream_claude_code_response(
@@ -388,6 +480,24 @@ class TestStreamClaudeCodeResponse:
         assert "CLAUDECODE" not in captured_env
         assert "PATH" in captured_env
 
+    @pytest.mark.asyncio
+    async def test_stdout_reader_allows_long_lines(self):
+        captured = {}
+
+        async def capture_exec(*args, **kwargs):
+            captured.update(kwargs)
+            return self._make_process([])
+
+        patches = _subprocess_patches(capture_exec=capture_exec)
+        with patches[0], patches[1]:
+            async for _ in claude_code.stream_claude_code_response(
+                message="hi", system_prompt="test", session_id="limit", model="sonnet"
+            ):
+                pass
+
+        assert captured["limit"] == claude_code._STDOUT_LINE_LIMIT
+        assert captured["limit"] > 64 * 1024
+
     @pytest.mark.asyncio
     async def test_subprocess_terminated_on_generator_exit(self):
         """Regression: subprocess should be terminated if still running when generator closes."""
@@ -420,7 +530,7 @@ class TestStreamClaudeCodeResponse:
         process.stderr.read = AsyncMock(return_value=b"")
 
         patches = _subprocess_patches(process=process)
-        with patches[0], patches[1], patches[2], patches[3], patches[4]:
+        with patches[0], patches[1]:
             gen = claude_code.stream_claude_code_response(
                 message="hi",
                 system_prompt="test",
@@ -1,5 +1,7 @@
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from brainshape.graph_db import GraphDB, _convert_record_ids
 
 
@@ -56,6 +58,43 @@ class TestGraphDB:
             "SELECT * FROM note WHERE name = $name", {"name": "Bob"}
         )
 
+    @patch("brainshape.graph_db.Surreal")
+    def test_execute_returns_every_statement_result(self, mock_surreal_cls):
+        mock_conn = MagicMock()
+        mock_surreal_cls.return_value = mock_conn
+        mock_conn.query_raw.return_value = {
+            "result": [
+                {"result": None, "status": "OK"},
+                {"result": [{"n": 1}], "status": "OK"},
+            ]
+        }
+        db = GraphDB()
+        assert db.execute("LET $x = 1; SELECT * FROM note") == [None, [{"n": 1}]]
+
+    @patch("brainshape.graph_db.Surreal")
+    def test_execute_raises_on_failed_statement(self, mock_surreal_cls):
+        mock_conn = MagicMock()
+        mock_surreal_cls.return_value = mock_conn
+        mock_conn.query_raw.return_value = {
+            "result": [
+                {"result": [], "status": "OK"},
+                {"result": "Incorrect vector dimension (2)", "status": "ERR"},
+            ]
+        }
+        db = GraphDB()
+        with pytest.raises(RuntimeError, match="Incorrect vector dimension"):
+            db.execute("DELETE note; CREATE chunk SET embedding = [0.1, 0.2]")
+
+    def test_execute_raises_on_failed_transaction(self, graph_db):
+        """A cancelled transaction is an error string on a real DB, not an exception."""
+        graph_db.query("DEFINE TABLE typed SCHEMAFULL; DEFINE FIELD v ON typed TYPE int;")
+        with pytest.raises(RuntimeError, match="expected a int"):
+            graph_db.execute(
+                "BEGIN TRANSACTION; CREATE typed SET v = 1; CREATE typed SET v = 'no';"
+                "COMMIT TRANSACTION;"
+            )
+        assert graph_db.query("SELECT * FROM typed") == []
+
     @patch("brainshape.graph_db.Surreal")
     def test_bootstrap_schema_runs_all_statements(self, mock_surreal_cls):
         mock_conn = MagicMock()
@@ -68,8 +107,23 @@ class TestGraphDB:
         db.bootstrap_schema()
 
         # 4 tables + 3 edge tables + 3 unique indexes + 2 property indexes
-        # + 1 analyzer + 2 fulltext indexes = 15 statements
-        assert mock_conn.query.call_count == 15
+        # + 6 edge endpoint indexes + 1 analyzer + 2 fulltext indexes = 21 statements
+        assert mock_conn.query.call_count == 21
+
+    @patch("brainshape.graph_db.Surreal")
+    def test_bootstrap_schema_indexes_hash_lookup(self, mock_surreal_cls):
+        """Semantic sync filters notes on path and content_hash; both must be indexed."""
+        mock_conn = MagicMock()
+        mock_surreal_cls.return_value = mock_conn
+        mock_conn.query.return_value = []
+
+        db = GraphDB()
+        mock_conn.query.reset_mock()
+        db.bootstrap_schema()
+
+        stmts = [c.args[0] for c in mock_conn.query.call_args_list]
+        assert any("note_path ON TABLE note FIELDS path" in s for s in stmts)
+        assert any("note_hash ON TABLE note FIELDS content_hash" in s for s in stmts)
 
     @patch("brainshape.graph_db.Surreal")
     def test_close(self, mock_surreal_cls):
@@ -1,8 +1,16 @@
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+import pytest
 
-from brainshape.kg_pipeline import KGPipeline, _split_text, create_kg_pipeline
+from brainshape.kg_pipeline import (
+    EMBED_BATCH_SIZE,
+    HNSW_EF_SEARCH,
+    KGPipeline,
+    _split_text,
+    create_kg_pipeline,
+    knn_operator,
+)
 
 
 class TestSplitText:
@@ -26,9 +34,10 @@ class TestKGPipelineWriteChunks:
     def test_writes_note_and_chunks(self):
         """Verify _write_chunks UPSERTs a note and creates chunk records."""
         mock_db = MagicMock()
-        mock_db.query.return_value = []
+        mock_db.execute.return_value = []
 
         pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 3
         pipeline.db = mock_db
 
         texts = ["Hello world", "Second chunk"]
@@ -36,29 +45,74 @@ class TestKGPipelineWriteChunks:
 
         pipeline._write_chunks("test.md", texts, embeddings)
 
-        # Should have: UPSERT note + DELETE old chunks + 2x (CREATE chunk with RELATE)
-        assert mock_db.query.call_count == 4
-
-        # First call: UPSERT note
-        upsert_call = mock_db.query.call_args_list[0]
-        assert "UPSERT" in upsert_call[0][0]
-
-        # Second call: DELETE old chunks
-        delete_call = mock_db.query.call_args_list[1]
-        assert "DELETE" in delete_call[0][0]
+        # One transactional script: UPSERT note, DELETE old chunks, CREATE + RELATE each chunk
+        assert mock_db.execute.call_count == 1
+        sql, params = mock_db.execute.call_args.args
+        assert sql.startswith("BEGIN TRANSACTION;")
+        assert sql.index("UPSERT note") < sql.index("DELETE chunk") < sql.index("CREATE chunk")
+        assert "COMMIT TRANSACTION" in sql
+        (note,) = params["notes"]
+        assert note["path"] == "test.md"
+        assert note["chunks"] == [
+            {"text": "Hello world", "embedding": [0.1, 0.2, 0.3], "idx": 0},
+            {"text": "Second chunk", "embedding": [0.4, 0.5, 0.6], "idx": 1},
+        ]
 
     def test_write_chunks_empty_list(self):
-        """_write_chunks with no chunks only UPSERTs note and DELETEs old chunks."""
+        """_write_chunks with no chunks still UPSERTs the note and clears old chunks."""
         mock_db = MagicMock()
-        mock_db.query.return_value = []
+        mock_db.execute.return_value = []
 
         pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 3
         pipeline.db = mock_db
 
         pipeline._write_chunks("test.md", [], [])
 
-        # Only 2 calls: UPSERT note + DELETE old chunks
-        assert mock_db.query.call_count == 2
+        assert mock_db.execute.call_count == 1
+        sql, params = mock_db.execute.call_args.args
+        assert "UPSERT note" in sql
+        assert "DELETE chunk" in sql
+        assert params["notes"][0]["chunks"] == []
+
+    def test_write_chunks_stores_hash_in_transaction(self):
+        """A given content hash is written by the same script as the chunks."""
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 1
+        pipeline.db = MagicMock()
+
+        pipeline._write_chunks("test.md", ["Hello"], [[0.1]], content_hash="abc")
+
+        assert pipeline.db.execute.call_count == 1
+        sql, params = pipeline.db.execute.call_args.args
+        assert sql.index("content_hash = $n.hash") < sql.index("COMMIT TRANSACTION")
+        assert params["notes"][0]["hash"] == "abc"
+
+    def test_write_notes_uses_one_transaction(self):
+        """Several notes are written by a single script."""
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 1
+        pipeline.db = MagicMock()
+
+        pipeline._write_notes([("a.md", ["A"], [[0.1]], "ha"), ("b.md", ["B"], [[0.2]], None)])
+
+        assert pipeline.db.execute.call_count == 1
+        sql, params = pipeline.db.execute.call_args.args
+        assert sql.startswith("BEGIN TRANSACTION;")
+        assert [(n["path"], n["hash"]) for n in params["notes"]] == [("a.md", "ha"), ("b.md", None)]
+        assert params["notes"][1]["chunks"] == [{"text": "B", "embedding": [0.2], "idx": 0}]
+
+    def test_wrong_dimensions_rejected_before_writing(self):
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 3
+        pipeline.db = MagicMock()
+
+        with pytest.raises(ValueError, match="'b.md' has 2 dimensions, expected 3"):
+            pipeline._write_notes(
+                [("a.md", ["A"], [[0.1, 0.2, 0.3]], None), ("b.md", ["B"], [[0.1, 0.2]], None)]
+            )
+
+        pipeline.db.execute.assert_not_called()
 
     def test_no_llm_dependencies(self):
         """Verify the pipeline doesn't use any LLM for extraction."""
@@ -77,9 +131,10 @@ class TestKGPipelineRunAsync:
         note.write_text("# Test\nSome content for embedding.")
 
         pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 3
         pipeline.notes_path = tmp_path
         pipeline.db = MagicMock()
-        pipeline.db.query.return_value = []
+        pipeline.db.execute.return_value = []
 
         mock_model = MagicMock()
         mock_model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
@@ -89,8 +144,116 @@ class TestKGPipelineRunAsync:
 
         # Model should have been called to encode chunks
         mock_model.encode.assert_called_once()
-        # DB should have been called (UPSERT + DELETE + CREATE chunks)
-        assert pipeline.db.query.call_count >= 2
+        # DB should have been called once with the whole write script
+        assert pipeline.db.execute.call_count == 1
+
+    async def test_run_async_uses_given_content(self, tmp_path):
+        """Passing content skips reading the file."""
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 3
+        pipeline.notes_path = tmp_path
+        pipeline.db = MagicMock()
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        pipeline._model = mock_model
+
+        # The file doesn't exist, so any read would raise
+        await pipeline.run_async(str(tmp_path / "absent.md"), content="Given text")
+
+        assert mock_model.encode.call_args.args == (["Given text"],)
+        # Given text may not match the file, so no hash is recorded for it
+        assert pipeline.db.execute.call_args.args[1]["notes"][0]["hash"] is None
+
+    async def test_run_async_stores_file_hash(self, tmp_path):
+        """A note read from disk is stored with its hash, so sync skips it later."""
+        from brainshape.notes import compute_file_hash
+
+        note = tmp_path / "test.md"
+        note.write_text("Hashed content")
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 1
+        pipeline.notes_path = tmp_path
+        pipeline.db = MagicMock()
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1]])
+        pipeline._model = mock_model
+
+        await pipeline.run_async(str(note))
+
+        (written,) = pipeline.db.execute.call_args.args[1]["notes"]
+        assert written["path"] == "test.md"
+        assert written["hash"] == compute_file_hash(note)
+
+
+class TestKGPipelineRunBatch:
+    def test_one_model_call_for_all_files(self, tmp_path):
+        (tmp_path / "a.md").write_text("Alpha")
+        (tmp_path / "b.md").write_text("Beta")
+        (tmp_path / "empty.md").write_text("")
+
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._dimensions = 1
+        pipeline.notes_path = tmp_path
+        pipeline.db = MagicMock()
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1], [0.2]])
+        pipeline._model = mock_model
+
+        pipeline.run_batch([str(tmp_path / n) for n in ("a.md", "empty.md", "b.md")])
+
+        mock_model.encode.assert_called_once()
+        assert mock_model.encode.call_args.args == (["Alpha", "Beta"],)
+        # Both notes are written in one transaction
+        pipeline.db.execute.assert_called_once()
+        written = pipeline.db.execute.call_args.args[1]["notes"]
+        assert [n["path"] for n in written] == ["a.md", "b.md"]
+        assert written[1]["chunks"] == [{"text": "Beta", "embedding": [0.2], "idx": 0}]
+
+
+class TestKGPipelineEmbedBatch:
+    def test_embed_batch_single_model_call(self):
+        pipeline = KGPipeline.__new__(KGPipeline)
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1], [0.2], [0.3]])
+        pipeline._model = mock_model
+
+        result = pipeline.embed_batch(["a", "b", "c"])
+
+        assert result == [[0.1], [0.2], [0.3]]
+        mock_model.encode.assert_called_once_with(
+            ["a", "b", "c"],
+            batch_size=EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+
+    def test_embed_batch_empty(self):
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._model = MagicMock()
+
+        assert pipeline.embed_batch([]) == []
+        pipeline._model.encode.assert_not_called()
+
+
+class TestKGPipelineEmbedContent:
+    def test_embed_content_splits_and_encodes(self):
+        pipeline = KGPipeline.__new__(KGPipeline)
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2]])
+        pipeline._model = mock_model
+
+        chunks, embeddings = pipeline.embed_content("Some text")
+
+        assert chunks == ["Some text"]
+        assert embeddings == [[0.1, 0.2]]
+        assert mock_model.encode.call_args.args == (["Some text"],)
+
+    def test_embed_content_empty(self):
+        pipeline = KGPipeline.__new__(KGPipeline)
+        pipeline._model = MagicMock()
+
+        assert pipeline.embed_content("") == ([], [])
+        pipeline._model.encode.assert_not_called()
 
 
 class TestKGPipelineEmbedQuery:
@@ -98,13 +261,14 @@ class TestKGPipelineEmbedQuery:
         """embed_query delegates to the underlying model."""
         pipeline = KGPipeline.__new__(KGPipeline)
         mock_model = MagicMock()
-        mock_model.encode.return_value = MagicMock(tolist=lambda: [0.1, 0.2, 0.3])
+        mock_model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
         pipeline._model = mock_model
 
         result = pipeline.embed_query("test query")
 
+        # A query is a batch of one
         assert result == [0.1, 0.2, 0.3]
-        mock_model.encode.assert_called_once_with("test query")
+        assert mock_model.encode.call_args.args == (["test query"],)
 
 
 class TestKGPipelineIndexMigration:
@@ -130,6 +294,53 @@ class TestKGPipelineIndexMigration:
 
         assert any("Vector index incompatible" in r.message for r in caplog.records)
 
+    def test_index_defines_hnsw_parameters(self):
+        mock_db = MagicMock()
+        KGPipeline(mock_db, MagicMock(), embedding_dimensions=384)
+        sql = mock_db.query.call_args_list[0][0][0]
+        assert "HNSW DIMENSION 384" in sql
+        assert "EFC " in sql
+        assert " M " in sql
+
+
+class TestKnnOperator:
+    def test_uses_search_width(self):
+        assert knn_operator(10) == f"<|10,{HNSW_EF_SEARCH}|>"
+
+    def test_width_never_below_k(self):
+        k = HNSW_EF_SEARCH + 20
+        assert knn_operator(k) == f"<|{k},{k}|>"
+
+
+class TestSharedModel:
+    @pytest.fixture(autouse=True)
+    def _reset_shared_model(self, monkeypatch):
+        monkeypatch.setattr("brainshape.kg_pipeline._shared_model", None)
+
+    def test_pipelines_share_loaded_model(self):
+        with patch("sentence_transformers.SentenceTransformer") as st:
+            first = KGPipeline(MagicMock(), MagicMock(), embedding_model="m")
+            second = KGPipeline(MagicMock(), MagicMock(), embedding_model="m")
+            assert first._get_model() is second._get_model()
+        st.assert_called_once_with("m")
+
+    def test_half_precision_on_cuda_only(self):
+        with patch("sentence_transformers.SentenceTransformer") as st:
+            st.return_value.device.type = "cuda"
+            KGPipeline(MagicMock(), MagicMock(), embedding_model="gpu")._get_model()
+            st.return_value.half.assert_called_once()
+
+            st.reset_mock()
+            st.return_value.device.type = "cpu"
+            KGPipeline(MagicMock(), MagicMock(), embedding_model="cpu")._get_model()
+            st.return_value.half.assert_not_called()
+
+    def test_other_model_replaces_shared_one(self):
+        with patch("sentence_transformers.SentenceTransformer") as st:
+            KGPipeline(MagicMock(), MagicMock(), embedding_model="a")._get_model()
+            KGPipeline(MagicMock(), MagicMock(), embedding_model="b")._get_model()
+        assert [c.args for c in st.call_args_list] == [("a",), ("b",)]
+
 
 class TestCreateKgPipeline:
     @patch("brainshape.kg_pipeline.KGPipeline")
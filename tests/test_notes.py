@@ -7,14 +7,19 @@ from brainshape.notes import (
     create_folder,
     delete_folder,
     delete_note,
+    has_notes,
     import_vault,
     init_notes,
     list_folders,
+    list_note_entries,
     list_notes,
     move_note,
+    note_dir_mtimes,
     parse_note,
+    read_all_notes,
     rename_folder,
     rewrite_note,
+    select_notes,
     write_note,
 )
 
@@ -52,6 +57,20 @@ class TestComputeFileHash:
         f2.write_text("bbb")
         assert compute_file_hash(f1) != compute_file_hash(f2)
 
+    def test_matches_sha256_of_bytes(self, tmp_path):
+        import hashlib
+
+        f = tmp_path / "a.md"
+        f.write_bytes("héllo\n".encode())
+        assert compute_file_hash(f) == hashlib.sha256(f.read_bytes()).hexdigest()
+
+    def test_empty_file(self, tmp_path):
+        import hashlib
+
+        f = tmp_path / "empty.md"
+        f.write_bytes(b"")
+        assert compute_file_hash(f) == hashlib.sha256(b"").hexdigest()
+
 
 class TestParseNote:
     def test_welcome_note(self, tmp_notes):
@@ -82,6 +101,12 @@ class TestParseNote:
         assert result["tags"].count("markdown") == 1
         assert result["tags"].count("syntax") == 1
 
+    def test_tags_keep_first_seen_order(self, tmp_path):
+        note = tmp_path / "order.md"
+        note.write_text("---\ntags: [Zeta, alpha]\n---\n#mid then #zeta and #Alpha")
+        result = parse_note(note, tmp_path)
+        assert result["tags"] == ["mid", "zeta", "alpha"]
+
     def test_relative_path_subfolder(self, tmp_notes):
         result = parse_note(tmp_notes / "Tutorials" / "Getting Started.md", tmp_notes)
         assert result["path"] == "Tutorials/Getting Started.md"
@@ -104,6 +129,21 @@ class TestParseNote:
         # Should still have content even though frontmatter parsing failed
         assert "Some content" in result["content"]
 
+    def test_crlf_frontmatter(self, tmp_path):
+        note = tmp_path / "win.md"
+        note.write_bytes(b"---\r\ntags: [a]\r\n---\r\nBody #b\r\n")
+        result = parse_note(note, tmp_path)
+        assert result["metadata"] == {"tags": ["a"]}
+        assert result["content"] == "Body #b"
+        assert sorted(result["tags"]) == ["a", "b"]
+
+    def test_non_mapping_frontmatter_ignored(self, tmp_path):
+        note = tmp_path / "list.md"
+        note.write_text("---\n- one\n- two\n---\nBody")
+        result = parse_note(note, tmp_path)
+        assert result["metadata"] == {}
+        assert result["content"] == "Body"
+
 
 class TestListNotes:
     def test_finds_md_files(self, tmp_notes):
@@ -128,6 +168,107 @@ class TestListNotes:
         assert len(notes) == 5
 
 
+class TestSelectNotes:
+    def test_filters_like_list_notes(self, tmp_notes):
+        (tmp_notes / ".trash").mkdir()
+        (tmp_notes / ".trash" / "Old.md").write_text("gone")
+        paths = [
+            tmp_notes / "Welcome.md",
+            tmp_notes / "Welcome.md",
+            tmp_notes / "image.png",
+            tmp_notes / "Deleted.md",
+            tmp_notes / ".trash" / "Old.md",
+            tmp_notes.parent / "Outside.md",
+        ]
+        assert select_notes(tmp_notes, paths) == [tmp_notes / "Welcome.md"]
+
+    def test_matches_resolved_paths(self, tmp_notes, tmp_path_factory):
+        link = tmp_path_factory.mktemp("links") / "vault"
+        link.symlink_to(tmp_notes)
+        # A watcher may report the canonical path of a symlinked vault
+        assert select_notes(link, [tmp_notes / "Welcome.md"]) == [link / "Welcome.md"]
+
+
+class TestListNoteEntries:
+    def test_matches_list_notes(self, tmp_notes):
+        (tmp_notes / "a b.md").write_text("x")
+        (tmp_notes / "a").mkdir()
+        (tmp_notes / "a" / "b.md").write_text("x")
+        expected = [(str(p.relative_to(tmp_notes)), p.stem) for p in list_notes(tmp_notes)]
+        assert list_note_entries(tmp_notes) == expected
+
+    def test_excludes_trash(self, tmp_notes):
+        (tmp_notes / ".trash").mkdir()
+        (tmp_notes / ".trash" / "Old.md").write_text("gone")
+        titles = [title for _, title in list_note_entries(tmp_notes)]
+        assert "Old" not in titles
+        assert "Welcome" in titles
+
+
+class TestHasNotes:
+    def test_true_for_seeded_vault(self, tmp_notes):
+        assert has_notes(tmp_notes)
+
+    def test_ignores_trash_and_other_files(self, tmp_path):
+        (tmp_path / ".trash").mkdir()
+        (tmp_path / ".trash" / "Old.md").write_text("gone")
+        (tmp_path / "image.png").write_bytes(b"x")
+        assert not has_notes(tmp_path)
+
+
+class TestNoteDirMtimes:
+    def test_covers_subdirs_excluding_trash(self, tmp_notes):
+        (tmp_notes / ".trash").mkdir()
+        mtimes = note_dir_mtimes(tmp_notes)
+        assert str(tmp_notes) in mtimes
+        assert str(tmp_notes / "Tutorials") in mtimes
+        assert str(tmp_notes / ".trash") not in mtimes
+
+
+class TestReadAllNotes:
+    def test_parses_every_note(self, tmp_notes):
+        notes = read_all_notes(tmp_notes)
+        assert [n["path"] for n in notes] == [
+            str(p.relative_to(tmp_notes)) for p in list_notes(tmp_notes)
+        ]
+
+    def test_process_pool_matches_serial(self, tmp_notes, monkeypatch):
+        serial = read_all_notes(tmp_notes)
+        monkeypatch.setattr("brainshape.notes._PARALLEL_PARSE_THRESHOLD", 1)
+        assert read_all_notes(tmp_notes) == serial
+
+    def test_process_pool_is_reused_and_never_forks(self, tmp_notes, monkeypatch):
+        from brainshape import notes
+
+        monkeypatch.setattr("brainshape.notes._PARALLEL_PARSE_THRESHOLD", 1)
+        read_all_notes(tmp_notes)
+        pool = notes._parse_pool
+        read_all_notes(tmp_notes)
+        assert notes._parse_pool is pool
+        assert pool._mp_context.get_start_method() == "spawn"
+
+    def test_threads_without_gil(self, tmp_notes, monkeypatch):
+        def no_processes():
+            raise AssertionError("process pool used")
+
+        serial = read_all_notes(tmp_notes)
+        monkeypatch.setattr("brainshape.notes._PARALLEL_PARSE_THRESHOLD", 1)
+        monkeypatch.setattr("brainshape.notes._gil_enabled", lambda: False)
+        monkeypatch.setattr("brainshape.notes._get_parse_pool", no_processes)
+        assert read_all_notes(tmp_notes) == serial
+
+    def test_skips_unparseable_notes(self, tmp_notes, monkeypatch):
+        def boom(file_path, notes_path):
+            if file_path.name == "Welcome.md":
+                raise ValueError("bad")
+            return {"path": file_path.name}
+
+        monkeypatch.setattr("brainshape.notes.parse_note", boom)
+        paths = [n["path"] for n in read_all_notes(tmp_notes)]
+        assert "Welcome.md" not in paths
+        assert len(paths) == len(list_notes(tmp_notes)) - 1
+
+
 class TestWriteNote:
     def test_creates_file(self, tmp_path):
         path = write_note(tmp_path, "New Note", "Hello world")
@@ -410,6 +551,21 @@ class TestImportVault:
         assert stats["folders_created"] >= 1
         assert (dest / "Projects" / "task.md").exists()
 
+    def test_counts_each_new_folder_once(self, tmp_path):
+        source = tmp_path / "source"
+        dest = tmp_path / "dest"
+        (source / "Projects").mkdir(parents=True)
+        (dest / "Existing").mkdir(parents=True)
+        (source / "Existing").mkdir()
+        (source / "root.md").write_text("# Root")
+        (source / "Projects" / "a.md").write_text("# A")
+        (source / "Projects" / "b.md").write_text("# B")
+        (source / "Existing" / "c.md").write_text("# C")
+
+        stats = import_vault(source, dest)
+        assert stats["files_copied"] == 4
+        assert stats["folders_created"] == 1
+
     def test_skips_obsidian_dir(self, tmp_path):
         source = tmp_path / "source"
         dest = tmp_path / "dest"
@@ -419,7 +575,8 @@ class TestImportVault:
 
         stats = import_vault(source, dest)
         assert stats["files_copied"] == 1
-        assert stats["files_skipped"] == 1
+        # Excluded directories aren't walked, so their files aren't counted
+        assert stats["files_skipped"] == 0
         assert not (dest / ".obsidian").exists()
 
     def test_skips_git_dir(self, tmp_path):
@@ -442,7 +599,19 @@ class TestImportVault:
 
         stats = import_vault(source, dest)
         assert stats["files_copied"] == 1
-        assert stats["files_skipped"] == 1
+        assert stats["files_skipped"] == 0
+        assert not (dest / ".trash").exists()
+
+    def test_skips_nested_excluded_dirs(self, tmp_path):
+        source = tmp_path / "source"
+        dest = tmp_path / "dest"
+        (source / "Project" / "node_modules" / "pkg").mkdir(parents=True)
+        (source / "Project" / "node_modules" / "pkg" / "README.md").write_text("readme")
+        (source / "Project" / "plan.md").write_text("# Plan")
+
+        stats = import_vault(source, dest)
+        assert stats["files_copied"] == 1
+        assert not (dest / "Project" / "node_modules").exists()
 
     def test_rejects_nonexistent_source(self, tmp_path):
         with pytest.raises(ValueError, match="does not exist"):
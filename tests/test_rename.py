@@ -87,6 +87,22 @@ class TestRewriteWikilinks:
         content = (tmp_notes / "Page C.md").read_text()
         assert "[[Other Note]]" in content
 
+    def test_longer_title_with_same_prefix_untouched(self, tmp_notes):
+        write_note(tmp_notes, "Page E", "See [[Old Name Extended]]")
+        before = (tmp_notes / "Page E.md").read_bytes()
+
+        count = rewrite_wikilinks(tmp_notes, "Old Name", "New Name")
+
+        assert count == 0
+        assert (tmp_notes / "Page E.md").read_bytes() == before
+
+    def test_preserves_line_endings(self, tmp_notes):
+        (tmp_notes / "Windows.md").write_bytes(b"First line\r\nSee [[Old Name]]\r\n")
+
+        rewrite_wikilinks(tmp_notes, "Old Name", "New Name")
+
+        assert (tmp_notes / "Windows.md").read_bytes() == b"First line\r\nSee [[New Name]]\r\n"
+
     def test_multiple_links_in_one_file(self, tmp_notes):
         write_note(tmp_notes, "Page D", "See [[Target]] and also [[Target|alias]]")
         write_note(tmp_notes, "Target", "content")
@@ -1,3 +1,6 @@
+import asyncio
+import contextlib
+import os
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -6,6 +9,26 @@ from fastapi.testclient import TestClient
 from brainshape import server
 
 
+async def _cancel_background_tasks():
+    """Mirror the real lifespan shutdown so pending work can't leak between tests."""
+    task = server._reload_task
+    if task is not None and not task.done():
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    for sync_task in list(server._sync_tasks):
+        sync_task.cancel()
+    if server._sync_tasks:
+        await asyncio.gather(*server._sync_tasks, return_exceptions=True)
+
+
+def _reset_background_state():
+    server._reload_state = {"status": "ready"}
+    server._reload_task = None
+    server._sync_jobs.clear()
+    server._sync_tasks.clear()
+
+
 @pytest.fixture
 def mock_agent():
     return MagicMock()
@@ -29,6 +52,7 @@ def client(tmp_notes, tmp_path, monkeypatch, mock_agent, server_db):
     @asynccontextmanager
     async def noop_lifespan(app):
         yield
+        await _cancel_background_tasks()
 
     original_lifespan = server.app.router.lifespan_context
     server.app.router.lifespan_context = noop_lifespan
@@ -36,11 +60,17 @@ def client(tmp_notes, tmp_path, monkeypatch, mock_agent, server_db):
     # Set module-level state directly
     mock_pipeline = MagicMock()
     mock_pipeline.run_async = AsyncMock(return_value=None)
+    mock_pipeline.split_content = MagicMock(side_effect=lambda content: [content])
+    mock_pipeline.embed_batch_async = AsyncMock(side_effect=lambda texts: [[0.1]] * len(texts))
+    mock_pipeline.write_async = AsyncMock(return_value=None)
+    mock_pipeline.write_many_async = AsyncMock(return_value=None)
 
     server._agent = mock_agent
     server._db = server_db
     server._pipeline = mock_pipeline
-    server._sessions = {}
+    server._sessions.clear()
+    server._notes_cache = None
+    _reset_background_state()
 
     with TestClient(app=server.app, raise_server_exceptions=False) as c:
         yield c
@@ -48,7 +78,8 @@ def client(tmp_notes, tmp_path, monkeypatch, mock_agent, server_db):
     server._agent = None
     server._db = None
     server._pipeline = None
-    server._sessions = {}
+    server._sessions.clear()
+    _reset_background_state()
     server.app.router.lifespan_context = original_lifespan
 
 
@@ -90,6 +121,31 @@ class TestNoteFiles:
         assert "About Me" in titles
         assert "Getting Started" in titles
 
+    def test_list_files_cached_until_vault_changes(self, client, tmp_notes, monkeypatch):
+        calls = []
+        real = server.list_note_entries
+
+        def counting(notes_path):
+            calls.append(notes_path)
+            return real(notes_path)
+
+        monkeypatch.setattr("brainshape.server.list_note_entries", counting)
+        client.get("/notes/files")
+        client.get("/notes/files")
+        assert len(calls) == 1
+
+        (tmp_notes / "Tutorials" / "Extra.md").write_text("# Extra")
+        os.utime(tmp_notes / "Tutorials", ns=(1, 1))
+        titles = [f["title"] for f in client.get("/notes/files").json()["files"]]
+        assert "Extra" in titles
+        assert len(calls) == 2
+
+    def test_create_invalidates_listing(self, client):
+        client.get("/notes/files")
+        client.post("/notes/file", json={"title": "Fresh", "content": "x"})
+        titles = [f["title"] for f in client.get("/notes/files").json()["files"]]
+        assert "Fresh" in titles
+
     def test_read_file(self, client):
         resp = client.get("/notes/file/Welcome.md")
         assert resp.status_code == 200
@@ -190,7 +246,7 @@ class TestMCPServerValidation:
                 ]
             },
         )
-        assert resp.status_code == 200
+        assert resp.status_code == 202
 
     def test_allow_http_mcp_server(self, client):
         resp = client.put(
@@ -201,7 +257,7 @@ class TestMCPServerValidation:
                 ]
             },
         )
-        assert resp.status_code == 200
+        assert resp.status_code == 202
 
 
 class TestMCPHttpEndpoint:
@@ -236,6 +292,24 @@ class TestAgentInit:
         assert "session_id" in data
         assert len(data["session_id"]) > 0
 
+    def test_evicts_least_recently_used(self, client, monkeypatch):
+        monkeypatch.setattr(server, "_SESSION_MAX", 2)
+        first = client.post("/agent/init").json()["session_id"]
+        second = client.post("/agent/init").json()["session_id"]
+        # Touch the first session so the second becomes least recently used
+        server._sessions.move_to_end(first)
+        client.post("/agent/init")
+        client.post("/agent/init")
+        assert first in server._sessions
+        assert second not in server._sessions
+        assert len(server._sessions) <= 3
+
+    def test_evicts_expired_sessions(self, client, monkeypatch):
+        old = client.post("/agent/init").json()["session_id"]
+        server._sessions[old]["last_used"] -= server._SESSION_TTL + 1
+        client.post("/agent/init")
+        assert old not in server._sessions
+
 
 class TestAgentMessage:
     def test_message_missing_session(self, client):
@@ -255,24 +329,17 @@ class TestGraphStats:
         ]
         server_db.get_custom_node_tables.return_value = []
 
-        def route_query(sql, params=None):
-            if "FROM note GROUP" in sql:
-                return [{"count": 10}]
-            if "FROM tag GROUP" in sql:
-                return [{"count": 5}]
-            if "FROM memory GROUP" in sql:
-                return [{"count": 2}]
-            if "FROM chunk GROUP" in sql:
-                return [{"count": 20}]
-            if "FROM tagged_with GROUP" in sql:
-                return [{"count": 15}]
-            if "FROM links_to GROUP" in sql:
-                return [{"count": 3}]
-            if "FROM from_document GROUP" in sql:
-                return [{"count": 20}]
-            return []
+        # n* = core tables, e* = edge tables, in the order they were discovered
+        server_db.query.return_value = {
+            "n0": 10,
+            "n1": 5,
+            "n2": 2,
+            "n3": 20,
+            "e0": 20,
+            "e1": 3,
+            "e2": 15,
+        }
 
-        server_db.query.side_effect = route_query
         resp = client.get("/graph/stats")
         assert resp.status_code == 200
         data = resp.json()
@@ -289,32 +356,25 @@ class TestGraphStats:
         ]
         server_db.get_custom_node_tables.return_value = ["person"]
 
-        def route_query(sql, params=None):
-            if "FROM note GROUP" in sql:
-                return [{"count": 5}]
-            if "FROM tag GROUP" in sql:
-                return [{"count": 3}]
-            if "FROM memory GROUP" in sql:
-                return [{"count": 1}]
-            if "FROM chunk GROUP" in sql:
-                return [{"count": 10}]
-            if "FROM person GROUP" in sql:
-                return [{"count": 2}]
-            if "FROM tagged_with GROUP" in sql:
-                return [{"count": 8}]
-            if "FROM links_to GROUP" in sql:
-                return [{"count": 4}]
-            if "FROM works_with GROUP" in sql:
-                return [{"count": 1}]
-            return []
+        server_db.query.return_value = [
+            {"n0": 5, "n1": 3, "n2": 1, "n3": 10, "c0": 2, "e0": 4, "e1": 8, "e2": 1}
+        ]
 
-        server_db.query.side_effect = route_query
         resp = client.get("/graph/stats")
         assert resp.status_code == 200
         data = resp.json()
         assert data["relationships"]["WORKS_WITH"] == 1
         assert data["nodes"]["Person"] == 2
 
+    def test_single_round_trip(self, client, server_db):
+        server_db.get_relation_tables.return_value = ["links_to"]
+        server_db.get_custom_node_tables.return_value = ["person"]
+        server_db.query.return_value = {}
+        resp = client.get("/graph/stats")
+        assert resp.status_code == 200
+        assert server_db.query.call_count == 1
+        assert resp.json()["nodes"] == {"Note": 0, "Tag": 0, "Memory": 0, "Chunk": 0}
+
 
 class TestGraphOverview:
     def test_returns_nodes_and_edges(self, client, server_db):
@@ -322,16 +382,14 @@ class TestGraphOverview:
         server_db.get_custom_node_tables.return_value = []
 
         def route_query(sql, params=None):
-            if "FROM note LIMIT" in sql:
-                return [{"nid": "abc", "name": "My Note", "path": "My Note.md", "type": None}]
-            if "FROM tag LIMIT" in sql:
-                return [{"nid": "def", "name": "python", "path": None, "type": None}]
-            if "FROM memory LIMIT" in sql:
-                return []
-            if "FROM tagged_with LIMIT" in sql:
-                return [{"src": "note:abc", "tgt": "tag:def"}]
-            if "FROM links_to LIMIT" in sql:
-                return []
+            if sql.startswith("RETURN {"):
+                return {
+                    "n0": [{"nid": "abc", "name": "My Note", "path": "My Note.md", "type": None}],
+                    "n1": [{"nid": "def", "name": "python", "path": None, "type": None}],
+                    "n2": [],
+                    "e0": [],
+                    "e1": [{"src": "note:abc", "tgt": "tag:def"}],
+                }
             return []
 
         server_db.query.side_effect = route_query
@@ -343,6 +401,19 @@ class TestGraphOverview:
         assert len(data["edges"]) == 1
         assert data["edges"][0]["type"] == "TAGGED_WITH"
 
+    def test_single_round_trip(self, client, server_db):
+        """All node and edge tables are fetched in one query."""
+        server_db.get_relation_tables.return_value = ["links_to", "tagged_with"]
+        server_db.get_custom_node_tables.return_value = ["person"]
+        server_db.query.return_value = {}
+
+        resp = client.get("/graph/overview")
+        assert resp.status_code == 200
+        assert server_db.query.call_count == 1
+        sql = server_db.query.call_args[0][0]
+        for table in ("note", "tag", "memory", "person", "links_to", "tagged_with"):
+            assert f"FROM {table} LIMIT" in sql
+
     def test_overview_includes_custom_edges(self, client, server_db):
         """Custom edge tables appear in overview response."""
         server_db.get_relation_tables.return_value = [
@@ -353,20 +424,14 @@ class TestGraphOverview:
         server_db.get_custom_node_tables.return_value = ["person"]
 
         def route_query(sql, params=None):
-            if "FROM note LIMIT" in sql:
-                return [{"nid": "n1", "name": "Note", "path": "Note.md", "type": None}]
-            if "FROM tag LIMIT" in sql:
-                return []
-            if "FROM memory LIMIT" in sql:
-                return []
-            if "FROM person LIMIT" in sql:
-                return [{"nid": "p1", "name": "Alice", "path": None, "type": None}]
-            if "FROM works_with LIMIT" in sql:
-                return [{"src": "person:p1", "tgt": "person:p2"}]
-            if "FROM tagged_with LIMIT" in sql:
-                return []
-            if "FROM links_to LIMIT" in sql:
-                return []
+            if sql.startswith("RETURN {"):
+                return [
+                    {
+                        "n0": [{"nid": "n1", "name": "Note", "path": "Note.md", "type": None}],
+                        "c0": [{"nid": "p1", "name": "Alice", "path": None, "type": None}],
+                        "e2": [{"src": "person:p1", "tgt": "person:p2"}],
+                    }
+                ]
             return []
 
         server_db.query.side_effect = route_query
@@ -375,6 +440,18 @@ class TestGraphOverview:
         data = resp.json()
         edge_types = {e["type"] for e in data["edges"]}
         assert "WORKS_WITH" in edge_types
+        assert any(n["id"] == "person:p1" and n["label"] == "Person" for n in data["nodes"])
+
+    def test_long_names_truncated(self, client, server_db):
+        server_db.get_relation_tables.return_value = []
+        server_db.get_custom_node_tables.return_value = []
+
+        server_db.query.return_value = {
+            "n2": [{"nid": "m1", "name": "x" * 100, "path": None, "type": "fact"}]
+        }
+        resp = client.get("/graph/overview")
+        assert resp.status_code == 200
+        assert resp.json()["nodes"][0]["name"] == "x" * 60 + "..."
 
     def test_rejects_invalid_label(self, client, server_db):
         resp = client.get("/graph/overview?label=INVALID")
@@ -407,24 +484,20 @@ class TestGraphNeighborhood:
             # First call: find center node
             if "FROM note WHERE path" in sql:
                 return [{"nid": "abc", "title": "Hub Note", "path": "Hub.md"}]
-            # BFS outgoing edges
-            if "FROM tagged_with WHERE in" in sql:
-                return [{"target": "tag:def", "eid": "tw1"}]
-            if "FROM links_to WHERE in" in sql:
-                return []
-            # Fetch tag detail
-            if "type::thing" in sql:
-                return [{"nid": "def", "name": "python", "path": None, "type": None}]
-            # BFS incoming edges
-            if "WHERE out" in sql:
-                return []
+            # Batched edge query for the frontier
+            if "meta::tb(id) AS etype" in sql:
+                return [{"source": "note:abc", "target": "tag:def", "etype": "tagged_with"}]
+            # Batched detail fetch for newly reached nodes
+            if "array::map" in sql:
+                return [{"id": "tag:def", "name": "python", "path": None, "type": None}]
             return []
 
         server_db.query.side_effect = route_query
         resp = client.get("/graph/neighborhood/Hub.md")
         assert resp.status_code == 200
         data = resp.json()
-        assert len(data["nodes"]) >= 1
+        assert {n["id"] for n in data["nodes"]} == {"note:abc", "tag:def"}
+        assert data["edges"] == [{"source": "note:abc", "target": "tag:def", "type": "TAGGED_WITH"}]
 
     def test_neighborhood_traverses_custom_edges(self, client, server_db):
         """BFS in neighborhood follows custom relation tables."""
@@ -437,16 +510,11 @@ class TestGraphNeighborhood:
         def route_query(sql, params=None):
             if "FROM note WHERE path" in sql:
                 return [{"nid": "n1", "title": "Hub", "path": "Hub.md"}]
-            if "FROM works_with WHERE in" in sql:
-                return [{"target": "person:p1", "eid": "ww1"}]
-            if "FROM tagged_with WHERE in" in sql:
-                return []
-            if "FROM links_to WHERE in" in sql:
-                return []
-            if "type::thing" in sql:
-                return [{"nid": "p1", "name": "Alice", "path": None, "type": None}]
-            if "WHERE out" in sql:
-                return []
+            if "meta::tb(id) AS etype" in sql:
+                assert "works_with" in sql
+                return [{"source": "note:n1", "target": "person:p1", "etype": "works_with"}]
+            if "array::map" in sql:
+                return [{"id": "person:p1", "name": "Alice", "path": None, "type": None}]
             return []
 
         server_db.query.side_effect = route_query
@@ -456,6 +524,66 @@ class TestGraphNeighborhood:
         edge_types = {e["type"] for e in data["edges"]}
         assert "WORKS_WITH" in edge_types
 
+    def test_neighborhood_batches_each_level(self, client, server_db):
+        """Each BFS level issues one edge query and one detail query, and
+        edges already returned for an earlier level are excluded."""
+        server_db.get_relation_tables.return_value = ["links_to", "tagged_with"]
+        calls = []
+
+        def route_query(sql, params=None):
+            calls.append(sql)
+            if "FROM note WHERE path" in sql:
+                return [{"nid": "a", "title": "A", "path": "A.md"}]
+            if "meta::tb(id) AS etype" in sql:
+                if params["nids"] == ["note:a"]:
+                    return [
+                        {"source": "note:a", "target": "note:b", "etype": "links_to"},
+                        {"source": "note:a", "target": "tag:t", "etype": "tagged_with"},
+                    ]
+                # Level 2: edges back to the center are excluded by the query
+                assert params["seen"] == ["note:a"]
+                return [{"source": "note:b", "target": "tag:t", "etype": "tagged_with"}]
+            if "array::map" in sql and sql.startswith("SELECT id"):
+                return [
+                    {"id": nid, "name": nid, "path": None, "type": None} for nid in params["nids"]
+                ]
+            return []
+
+        server_db.query.side_effect = route_query
+        resp = client.get("/graph/neighborhood/A.md?depth=2")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert len(data["nodes"]) == 3
+        assert len(data["edges"]) == 3
+        # 1 center lookup + 2 levels x (edge query + at most one detail query)
+        assert len(calls) <= 5
+
+    def test_neighborhood_against_embedded_db(self, client, graph_db, monkeypatch):
+        """The batched edge query parses and dedupes on a real SurrealDB."""
+        graph_db.query(
+            "CREATE note:a SET title = 'A', path = 'A.md';"
+            "CREATE note:b SET title = 'B', path = 'B.md';"
+            "CREATE note:c SET title = 'C', path = 'C.md';"
+            "CREATE tag:t SET name = 't';"
+            "RELATE note:a->links_to->note:b;"
+            "RELATE note:a->links_to->note:b;"
+            "RELATE note:b->links_to->note:c;"
+            "RELATE note:a->tagged_with->tag:t;"
+            "RELATE note:b->tagged_with->tag:t;"
+        )
+        monkeypatch.setattr(server, "_db", graph_db)
+        resp = client.get("/graph/neighborhood/A.md?depth=2")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert {n["id"] for n in data["nodes"]} == {"note:a", "note:b", "note:c", "tag:t"}
+        edges = [(e["source"], e["target"], e["type"]) for e in data["edges"]]
+        assert sorted(edges) == [
+            ("note:a", "note:b", "LINKS_TO"),
+            ("note:a", "tag:t", "TAGGED_WITH"),
+            ("note:b", "note:c", "LINKS_TO"),
+            ("note:b", "tag:t", "TAGGED_WITH"),
+        ]
+
     def test_empty_neighborhood(self, client, server_db):
         server_db.query.return_value = []
         resp = client.get("/graph/neighborhood/test.md?depth=10")
@@ -464,23 +592,30 @@ class TestGraphNeighborhood:
 
 
 class TestGraphMemories:
-    def test_list_memories(self, client, server_db):
-        server_db.get_relation_tables.return_value = ["relates_to"]
+    @staticmethod
+    def _route(edges):
+        """Route memory listing and the batched edge query."""
 
         def route_query(sql, params=None):
             if sql.startswith("SELECT mid"):
                 return [
                     {
                         "mid": "m1",
-                        "type": "preference",
+                        "type": "fact",
                         "content": "User likes dark mode",
                         "created_at": 1700000000,
+                        "id": "memory:abc",
                     },
                 ]
-            # No connections for this memory
+            if "in INSIDE" in sql and params == {"mids": ["memory:abc"]}:
+                return edges
             return []
 
-        server_db.query.side_effect = route_query
+        return route_query
+
+    def test_list_memories(self, client, server_db):
+        server_db.get_relation_tables.return_value = ["relates_to"]
+        server_db.query.side_effect = self._route([])
         resp = client.get("/graph/memories")
         assert resp.status_code == 200
         data = resp.json()
@@ -490,26 +625,17 @@ class TestGraphMemories:
 
     def test_list_memories_with_connections(self, client, server_db):
         server_db.get_relation_tables.return_value = ["relates_to"]
-
-        def route_query(sql, params=None):
-            if sql.startswith("SELECT mid"):
-                return [
-                    {
-                        "mid": "m1",
-                        "type": "preference",
-                        "content": "User likes dark mode",
-                        "created_at": 1700000000,
-                    },
-                ]
-            if sql.startswith("SELECT out AS target"):
-                return [{"target": "note:abc"}]
-            if sql.startswith("SELECT in AS source"):
-                return []
-            if "type::thing" in sql:
-                return [{"name": "Settings"}]
-            return []
-
-        server_db.query.side_effect = route_query
+        server_db.query.side_effect = self._route(
+            [
+                {
+                    "etype": "relates_to",
+                    "source": "memory:abc",
+                    "target": "note:abc",
+                    "source_name": "User likes dark mode",
+                    "target_name": "Settings",
+                }
+            ]
+        )
         resp = client.get("/graph/memories")
         assert resp.status_code == 200
         data = resp.json()
@@ -522,31 +648,22 @@ class TestGraphMemories:
     def test_memory_connections_bidirectional(self, client, server_db):
         """Both incoming and outgoing edges are found for a memory."""
         server_db.get_relation_tables.return_value = ["relates_to"]
-
-        def route_query(sql, params=None):
-            if sql.startswith("SELECT mid"):
-                return [
-                    {
-                        "mid": "m1",
-                        "type": "fact",
-                        "content": "User is a developer",
-                        "created_at": 1700000000,
-                    },
-                ]
-            if sql.startswith("SELECT out AS target"):
-                return [{"target": "note:abc"}]
-            if sql.startswith("SELECT in AS source"):
-                return [{"source": "person:xyz"}]
-            if "type::thing" in sql:
-                tid = params.get("tid", "")
-                if "note" in tid:
-                    return [{"name": "Dev Notes"}]
-                if "person" in tid:
-                    return [{"name": "Alice"}]
-                return [{"name": "Unknown"}]
-            return []
-
-        server_db.query.side_effect = route_query
+        server_db.query.side_effect = self._route(
+            [
+                {
+                    "etype": "relates_to",
+                    "source": "memory:abc",
+                    "target": "note:abc",
+                    "target_name": "Dev Notes",
+                },
+                {
+                    "etype": "relates_to",
+                    "source": "person:xyz",
+                    "target": "memory:abc",
+                    "source_name": "Alice",
+                },
+            ]
+        )
         resp = client.get("/graph/memories")
         assert resp.status_code == 200
         conns = resp.json()["memories"][0]["connections"]
@@ -558,33 +675,22 @@ class TestGraphMemories:
     def test_memory_connections_multiple_relation_types(self, client, server_db):
         """Memory connected via multiple relation types shows all connections."""
         server_db.get_relation_tables.return_value = ["relates_to", "about"]
-
-        def route_query(sql, params=None):
-            if sql.startswith("SELECT mid"):
-                return [
-                    {
-                        "mid": "m1",
-                        "type": "fact",
-                        "content": "Test",
-                        "created_at": 1700000000,
-                    },
-                ]
-            if sql.startswith("SELECT out AS target") and "relates_to" in sql:
-                return [{"target": "note:abc"}]
-            if sql.startswith("SELECT out AS target") and "about" in sql:
-                return [{"target": "person:xyz"}]
-            if sql.startswith("SELECT in AS source"):
-                return []
-            if "type::thing" in sql:
-                tid = params.get("tid", "")
-                if "note" in tid:
-                    return [{"name": "My Note"}]
-                if "person" in tid:
-                    return [{"name": "Bob"}]
-                return [{"name": "Unknown"}]
-            return []
-
-        server_db.query.side_effect = route_query
+        server_db.query.side_effect = self._route(
+            [
+                {
+                    "etype": "relates_to",
+                    "source": "memory:abc",
+                    "target": "note:abc",
+                    "target_name": "My Note",
+                },
+                {
+                    "etype": "about",
+                    "source": "memory:abc",
+                    "target": "person:xyz",
+                    "target_name": "Bob",
+                },
+            ]
+        )
         resp = client.get("/graph/memories")
         assert resp.status_code == 200
         conns = resp.json()["memories"][0]["connections"]
@@ -596,33 +702,22 @@ class TestGraphMemories:
     def test_memory_connections_graceful_on_missing_target(self, client, server_db):
         """Edge target doesn't resolve — connection skipped without error."""
         server_db.get_relation_tables.return_value = ["relates_to"]
-
-        def route_query(sql, params=None):
-            if sql.startswith("SELECT mid"):
-                return [
-                    {
-                        "mid": "m1",
-                        "type": "fact",
-                        "content": "Test",
-                        "created_at": 1700000000,
-                    },
-                ]
-            if sql.startswith("SELECT out AS target"):
-                return [{"target": "note:deleted"}]
-            if sql.startswith("SELECT in AS source"):
-                return []
-            if "type::thing" in sql:
-                # Target doesn't resolve (returns no name)
-                return [{}]
-            return []
-
-        server_db.query.side_effect = route_query
+        server_db.query.side_effect = self._route(
+            [{"etype": "relates_to", "source": "memory:abc", "target": "note:deleted"}]
+        )
         resp = client.get("/graph/memories")
         assert resp.status_code == 200
         conns = resp.json()["memories"][0]["connections"]
         # Missing target means no connection added
         assert len(conns) == 0
 
+    def test_connections_fetched_in_one_query(self, client, server_db):
+        server_db.get_relation_tables.return_value = ["relates_to", "about"]
+        server_db.query.side_effect = self._route([])
+        client.get("/graph/memories")
+        # Memory listing + one edge query, regardless of memory/edge table count
+        assert server_db.query.call_count == 2
+
     def test_delete_memory(self, client, server_db):
         server_db.query.return_value = [{"mid": "m1"}]
         resp = client.delete("/graph/memory/m1")
@@ -710,6 +805,14 @@ class TestSearch:
         assert len(data["results"]) == 1
         assert data["results"][0]["score"] == 0.85
 
+    def test_semantic_search_knn_follows_limit(self, client, server_db):
+        server_db.query.return_value = []
+        resp = client.post("/search/semantic", json={"query": "ml", "limit": 30})
+        assert resp.status_code == 200
+        sql, params = server_db.query.call_args[0]
+        assert "<|30," in sql
+        assert params["limit"] == 30
+
     def test_semantic_search_requires_pipeline(self, bare_client):
         resp = bare_client.post("/search/semantic", json={"query": "test"})
         assert resp.status_code == 503
@@ -736,6 +839,35 @@ class TestTranscription:
         assert resp.status_code == 200
         data = resp.json()
         assert data["text"] == "Hello world"
+        assert mock_transcribe.call_args[0][1] is True
+
+    def test_transcribe_text_only(self, client, monkeypatch):
+        mock_transcribe = MagicMock(return_value={"text": "Hello world", "segments": []})
+        monkeypatch.setattr("brainshape.transcribe.transcribe_audio", mock_transcribe)
+
+        resp = client.post(
+            "/transcribe?segments=false",
+            files={"audio": ("test.wav", b"fake audio data", "audio/wav")},
+        )
+
+        assert resp.status_code == 200
+        assert mock_transcribe.call_args[0][1] is False
+
+    def test_transcribe_runs_off_event_loop(self, client, monkeypatch):
+        import asyncio
+
+        def fake_transcribe(path, segments=True):
+            # asyncio.get_running_loop() raises outside the event loop thread
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return {"text": "ok", "segments": []}
+
+        monkeypatch.setattr("brainshape.transcribe.transcribe_audio", fake_transcribe)
+        resp = client.post(
+            "/transcribe",
+            files={"audio": ("test.wav", b"fake audio data", "audio/wav")},
+        )
+        assert resp.status_code == 200
 
 
 class TestTranscribeMeeting:
@@ -825,6 +957,18 @@ class TestTranscribeMeetingWithFolder:
         assert (tmp_notes / "Meetings" / "Review.md").exists()
 
 
+def _wait_for_reload(client, attempts: int = 50) -> dict:
+    """Poll the background agent reload until it leaves the in-progress state."""
+    import time
+
+    for _ in range(attempts):
+        state = client.get("/settings/reload/status").json()
+        if state["status"] != "in_progress":
+            return state
+        time.sleep(0.01)
+    return state
+
+
 class TestSettings:
     def test_get_settings(self, client):
         resp = client.get("/settings")
@@ -847,7 +991,7 @@ class TestSettings:
         monkeypatch.setattr("brainshape.agent.recreate_agent", mock_recreate)
 
         resp = client.put("/settings", json={"llm_provider": "ollama", "llm_model": "llama3.3"})
-        assert resp.status_code == 200
+        assert resp.status_code == 202
         data = resp.json()
         assert data["llm_provider"] == "ollama"
         assert data["llm_model"] == "llama3.3"
@@ -856,11 +1000,19 @@ class TestSettings:
         resp = client.put("/settings", json={"llm_provider": "invalid"})
         assert resp.status_code == 400
 
-    def test_partial_update(self, client):
+    def test_partial_update(self, client, monkeypatch):
+        monkeypatch.setattr("brainshape.mcp_client.reload_mcp_tools", AsyncMock(return_value=[]))
+        monkeypatch.setattr("brainshape.agent.recreate_agent", MagicMock())
         resp = client.put("/settings", json={"llm_model": "gpt-4o"})
-        assert resp.status_code == 200
+        assert resp.status_code == 202
         assert resp.json()["llm_model"] == "gpt-4o"
 
+    def test_update_semantic_sync_concurrency(self, client):
+        resp = client.put("/settings", json={"semantic_sync_concurrency": 2})
+        assert resp.status_code == 200
+        assert resp.json()["semantic_sync_concurrency"] == 2
+        assert client.put("/settings", json={"semantic_sync_concurrency": 0}).status_code == 400
+
     def test_update_embedding_model(self, client, monkeypatch):
         mock_reload = AsyncMock(return_value=[])
         mock_recreate = MagicMock(return_value=MagicMock())
@@ -878,7 +1030,7 @@ class TestSettings:
                 "embedding_dimensions": 384,
             },
         )
-        assert resp.status_code == 200
+        assert resp.status_code == 202
         assert resp.json()["embedding_model"] == "sentence-transformers/all-MiniLM-L6-v2"
         assert resp.json()["embedding_dimensions"] == 384
 
@@ -930,7 +1082,8 @@ class TestSettings:
                 "mcp_servers": [{"name": "test", "transport": "http", "url": "http://localhost"}]
             },
         )
-        assert resp.status_code == 200
+        assert resp.status_code == 202
+        assert _wait_for_reload(client)["status"] == "ready"
         mock_reload.assert_awaited_once()
         mock_recreate.assert_called_once()
 
@@ -951,10 +1104,29 @@ class TestSettings:
         monkeypatch.setattr("brainshape.agent.recreate_agent", mock_recreate)
 
         resp = client.put("/settings", json={"llm_provider": "ollama"})
-        assert resp.status_code == 200
+        assert resp.status_code == 202
+        assert _wait_for_reload(client)["status"] == "ready"
         mock_reload.assert_awaited_once()
         mock_recreate.assert_called_once()
 
+    def test_no_reload_returns_200(self, client):
+        """Settings that don't affect the agent are applied synchronously."""
+        resp = client.put("/settings", json={"font_family": "Inter"})
+        assert resp.status_code == 200
+        assert client.get("/settings/reload/status").json() == {"status": "ready"}
+
+    def test_reload_failure_reported(self, client, monkeypatch):
+        """A failing background reload surfaces via the status endpoint."""
+        monkeypatch.setattr(
+            "brainshape.mcp_client.reload_mcp_tools",
+            AsyncMock(side_effect=RuntimeError("boom")),
+        )
+        resp = client.put("/settings", json={"llm_provider": "ollama"})
+        assert resp.status_code == 202
+        state = _wait_for_reload(client)
+        assert state["status"] == "error"
+        assert "boom" in state["error"]
+
     def test_custom_themes_round_trip(self, client):
         """PUT /settings with custom_themes persists and GET returns them."""
         themes = [
@@ -1002,6 +1174,7 @@ def bare_client(tmp_notes, tmp_path, monkeypatch):
     @asynccontextmanager
     async def noop_lifespan(app):
         yield
+        await _cancel_background_tasks()
 
     original = server.app.router.lifespan_context
     server.app.router.lifespan_context = noop_lifespan
@@ -1009,11 +1182,13 @@ def bare_client(tmp_notes, tmp_path, monkeypatch):
     server._agent = None
     server._db = None
     server._pipeline = None
-    server._sessions = {}
+    server._sessions.clear()
+    _reset_background_state()
 
     with TestClient(app=server.app, raise_server_exceptions=False) as c:
         yield c
 
+    _reset_background_state()
     server.app.router.lifespan_context = original
 
 
@@ -1053,28 +1228,96 @@ class TestUninitializedServer:
         assert resp.status_code == 503
 
 
+def _wait_for_sync(client, job_id: str, attempts: int = 100) -> dict:
+    """Poll a background sync job until it leaves the running state."""
+    import time
+
+    for _ in range(attempts):
+        job = client.get(f"/sync/status/{job_id}").json()
+        if job["status"] != "running":
+            return job
+        time.sleep(0.01)
+    return job
+
+
 class TestSync:
     def test_structural_sync(self, client):
         resp = client.post("/sync/structural")
-        assert resp.status_code == 200
+        assert resp.status_code == 202
         data = resp.json()
-        assert data["status"] == "ok"
-        assert "stats" in data
+        assert data["status"] == "started"
+        job = _wait_for_sync(client, data["job_id"])
+        assert job["status"] == "done"
+        assert job["kind"] == "structural"
+        assert "stats" in job
 
     def test_semantic_sync(self, client):
         resp = client.post("/sync/semantic")
-        assert resp.status_code == 200
-        data = resp.json()
-        assert data["status"] == "ok"
+        assert resp.status_code == 202
+        assert _wait_for_sync(client, resp.json()["job_id"])["status"] == "done"
 
     def test_full_sync(self, client):
         resp = client.post("/sync/full")
+        assert resp.status_code == 202
+        job = _wait_for_sync(client, resp.json()["job_id"])
+        assert job["status"] == "done"
+        assert set(job["stats"]) == {"structural", "semantic"}
+
+    def test_sync_failure_reported(self, client, monkeypatch):
+        def boom(db, notes_path):
+            raise RuntimeError("db gone")
+
+        monkeypatch.setattr("brainshape.server.sync_structural", boom)
+        resp = client.post("/sync/structural")
+        job = _wait_for_sync(client, resp.json()["job_id"])
+        assert job == {"status": "error", "kind": "structural", "error": "db gone"}
+
+    def test_unknown_job_404(self, client):
+        assert client.get("/sync/status/nope").status_code == 404
+
+    def test_sync_and_editor_save_clear_search_cache(self, client, server_db):
+        from brainshape import tools
+
+        server_db.query.return_value = []
+        tools._search_cache[("search_notes", "q")] = (float("inf"), "stale")
+        resp = client.post("/sync/structural")
+        assert _wait_for_sync(client, resp.json()["job_id"])["status"] == "done"
+        assert not tools._search_cache
+
+        tools._search_cache[("search_notes", "q")] = (float("inf"), "stale")
+        resp = client.put("/notes/file/Welcome.md", json={"content": "Edited in the editor"})
         assert resp.status_code == 200
-        data = resp.json()
-        assert data["status"] == "ok"
+        assert not tools._search_cache
 
 
 class TestHelperFunctions:
+    def test_orjson_response_falls_back_to_str(self):
+        from pathlib import Path
+
+        resp = server._ORJSONResponse({"path": Path("a/b.md"), 1: "x"})
+        assert resp.body == b'{"path":"a/b.md","1":"x"}'
+        assert resp.media_type == "application/json"
+
+    def test_content_text_string(self):
+        from brainshape.server import _content_text
+
+        assert _content_text("hello") == "hello"
+
+    def test_content_text_blocks(self):
+        from brainshape.server import _content_text
+
+        blocks = [
+            {"type": "text", "text": "Hello"},
+            {"type": "tool_use", "name": "search_notes"},
+            " world",
+        ]
+        assert _content_text(blocks) == "Hello world"
+
+    def test_content_text_unknown_type(self):
+        from brainshape.server import _content_text
+
+        assert _content_text(None) == ""
+
     def test_primary_label_capitalizes(self):
         from brainshape.server import _primary_label
 
@@ -1408,11 +1651,37 @@ class TestClaudeCodeProvider:
                 events.append(line)
         # Should have at least a text event and done event
         assert any("Hello from Claude Code!" in line for line in lines)
+        assert resp.headers["x-accel-buffering"] == "no"
+        assert resp.headers["cache-control"] == "no-cache"
+
+    def test_agent_message_resumes_known_claude_session(self, client, tmp_path, monkeypatch):
+        """A claude session the server has forgotten (restart, eviction) is picked back up."""
+        import json
+
+        from brainshape import claude_code
+
+        settings_file = tmp_path / "settings.json"
+        settings_file.write_text(json.dumps({"llm_provider": "claude-code", "llm_model": "sonnet"}))
+        monkeypatch.setattr("brainshape.settings.SETTINGS_FILE", settings_file)
+        claude_code._claim_session("from-before-restart")
+        assert "from-before-restart" not in server._sessions
+
+        async def mock_stream(**kwargs):
+            yield {"event": "done", "data": ""}
+
+        monkeypatch.setattr("brainshape.server.stream_claude_code_response", mock_stream)
+
+        resp = client.post(
+            "/agent/message", json={"session_id": "from-before-restart", "message": "hi"}
+        )
+        assert resp.status_code == 200
+        assert "from-before-restart" in server._sessions
+        server._sessions.pop("from-before-restart", None)
 
     def test_claude_code_provider_accepted_in_settings(self, client):
         """Verify claude-code is a valid provider in settings."""
         resp = client.put("/settings", json={"llm_provider": "claude-code"})
-        assert resp.status_code == 200
+        assert resp.status_code == 202
         assert resp.json()["llm_provider"] == "claude-code"
 
     def test_agent_not_required_for_claude_code(self, client, tmp_path, monkeypatch):
@@ -1527,15 +1796,47 @@ class TestDeleteNoteCustomEdges:
             "from_document",
             "about",  # custom agent-created edge
         ]
-        server_db.query.return_value = []
+        server_db.execute.return_value = []
 
         resp = client.delete("/notes/file/Welcome.md")
         assert resp.status_code == 200
 
         # Verify DELETE was called for the custom 'about' table too
-        delete_calls = [str(c) for c in server_db.query.call_args_list if "DELETE about" in str(c)]
+        delete_calls = [
+            str(c) for c in server_db.execute.call_args_list if "DELETE about" in str(c)
+        ]
         assert len(delete_calls) >= 1
 
+    def test_delete_is_single_round_trip(self, client, tmp_notes, server_db):
+        server_db.get_relation_tables.return_value = ["tagged_with", "links_to", "about"]
+        server_db.execute.return_value = []
+
+        resp = client.delete("/notes/file/Welcome.md")
+        assert resp.status_code == 200
+        assert server_db.execute.call_count == 1
+        sql, params = server_db.execute.call_args[0]
+        assert params == {"path": "Welcome.md"}
+        for table in ("chunk", "tagged_with", "links_to", "about", "note", "tag"):
+            assert f"DELETE {table} WHERE" in sql
+
+    def test_delete_clears_search_cache(self, client, tmp_notes, server_db):
+        from brainshape import tools
+
+        server_db.get_relation_tables.return_value = ["tagged_with", "links_to"]
+        tools._search_cache[("search_notes", "welcome")] = (float("inf"), "stale")
+        resp = client.delete("/notes/file/Welcome.md")
+        assert resp.status_code == 200
+        assert not tools._search_cache
+
+    def test_delete_reports_failed_graph_cleanup(self, client, tmp_notes, server_db):
+        server_db.get_relation_tables.return_value = ["tagged_with", "links_to"]
+        server_db.execute.side_effect = RuntimeError("SurrealDB query failed: boom")
+
+        resp = client.delete("/notes/file/Welcome.md")
+        assert resp.status_code == 500
+        assert "graph cleanup failed" in resp.json()["detail"]
+        assert not (tmp_notes / "Welcome.md").exists()
+
 
 class TestDeleteNoteOrphanTags:
     """Regression: deleting a note must clean up orphaned tags."""
@@ -1543,14 +1844,14 @@ class TestDeleteNoteOrphanTags:
     def test_delete_cleans_orphan_tags(self, client, tmp_notes, server_db):
         """_delete_note_from_graph should remove tags with no remaining edges."""
         server_db.get_relation_tables.return_value = ["tagged_with", "links_to", "from_document"]
-        server_db.query.return_value = []
+        server_db.execute.return_value = []
 
         resp = client.delete("/notes/file/Welcome.md")
         assert resp.status_code == 200
 
         orphan_tag_calls = [
             c
-            for c in server_db.query.call_args_list
+            for c in server_db.execute.call_args_list
             if "DELETE tag WHERE" in str(c) and "tagged_with" in str(c)
         ]
         assert len(orphan_tag_calls) >= 1
@@ -1,12 +1,15 @@
 import json
+import os
 
 import pytest
 
+from brainshape import settings as settings_mod
 from brainshape.settings import (
     DEFAULTS,
     VALID_PROVIDERS,
     VALID_TRANSCRIPTION_PROVIDERS,
     _migrate_settings,
+    get_agent_config,
     get_llm_model_string,
     get_notes_path,
     load_settings,
@@ -51,6 +54,30 @@ class TestLoadSettings:
         assert settings == DEFAULTS
         assert any("Failed to read settings file" in r.message for r in caplog.records)
 
+    def test_unchanged_file_not_reparsed(self, tmp_settings_file, monkeypatch):
+        tmp_settings_file.write_text(json.dumps({"llm_provider": "ollama"}))
+        load_settings()
+        calls = []
+        real_loads = settings_mod.orjson.loads
+        monkeypatch.setattr(
+            settings_mod.orjson, "loads", lambda b: calls.append(b) or real_loads(b)
+        )
+        assert load_settings()["llm_provider"] == "ollama"
+        assert calls == []
+
+    def test_external_change_detected(self, tmp_settings_file):
+        tmp_settings_file.write_text(json.dumps({"llm_provider": "ollama"}))
+        assert load_settings()["llm_provider"] == "ollama"
+        tmp_settings_file.write_text(json.dumps({"llm_provider": "openai"}))
+        os.utime(tmp_settings_file, ns=(1, 1))
+        assert load_settings()["llm_provider"] == "openai"
+
+    def test_returned_dict_is_independent(self, tmp_settings_file):
+        tmp_settings_file.write_text(json.dumps({"llm_provider": "ollama"}))
+        first = load_settings()
+        first["llm_provider"] = "mutated"
+        assert load_settings()["llm_provider"] == "ollama"
+
 
 class TestSaveSettings:
     def test_saves_known_keys(self, tmp_settings_file):
@@ -65,6 +92,33 @@ class TestSaveSettings:
         save_settings(DEFAULTS)
         assert deep_file.exists()
 
+    def test_skips_write_when_unchanged(self, tmp_settings_file):
+        save_settings({"llm_provider": "openai"})
+        before = tmp_settings_file.stat().st_mtime_ns
+        os.utime(tmp_settings_file, ns=(before - 10**9, before - 10**9))
+        # Re-prime the cache from disk after touching the timestamp
+        load_settings()
+        stamped = tmp_settings_file.stat().st_mtime_ns
+        save_settings({"llm_provider": "openai"})
+        assert tmp_settings_file.stat().st_mtime_ns == stamped
+
+    def test_in_place_edit_of_loaded_settings_is_saved(self, tmp_settings_file):
+        update_settings({"theme": {"name": "Nord Dark"}})
+        current = load_settings()
+        current["mcp_servers"].append({"name": "fs", "transport": "stdio"})
+        current["theme"]["name"] = "Monochrome Dark"
+        save_settings(current)
+        saved = json.loads(tmp_settings_file.read_text())
+        assert saved["mcp_servers"] == [{"name": "fs", "transport": "stdio"}]
+        assert saved["theme"] == {"name": "Monochrome Dark"}
+        assert DEFAULTS["mcp_servers"] == []
+
+    def test_write_leaves_no_temp_files(self, tmp_settings_file):
+        save_settings({"llm_provider": "openai"})
+        save_settings({"llm_provider": "ollama"})
+        assert [p.name for p in tmp_settings_file.parent.iterdir()] == ["settings.json"]
+        assert load_settings()["llm_provider"] == "ollama"
+
 
 class TestUpdateSettings:
     def test_merges_and_persists(self, tmp_settings_file):
@@ -129,6 +183,11 @@ class TestGetLlmModelString:
         result = get_llm_model_string(DEFAULTS)
         assert result == "anthropic:claude-haiku-4-5-20251001"
 
+    def test_non_langchain_provider_falls_back_to_anthropic(self):
+        for provider in ("claude-code", "bogus"):
+            s = {"llm_provider": provider, "llm_model": "sonnet"}
+            assert get_llm_model_string(s) == "anthropic:sonnet"
+
 
 class TestEmbeddingSettings:
     def test_defaults_include_embedding_model(self):
@@ -162,6 +221,26 @@ class TestGetNotesPath:
         assert DEFAULTS["notes_path"] == ""
 
 
+class TestGetAgentConfig:
+    def test_resolves_all_values_from_one_load(self, monkeypatch):
+        update_settings(
+            {
+                "llm_provider": "ollama",
+                "llm_model": "llama3.3",
+                "ollama_base_url": "http://box:11434",
+                "notes_path": "~/vault",
+            }
+        )
+        calls = []
+        real_load = settings_mod.load_settings
+        monkeypatch.setattr(settings_mod, "load_settings", lambda: calls.append(1) or real_load())
+        model, kwargs, notes_path = get_agent_config()
+        assert model == "ollama:llama3.3"
+        assert kwargs == {"base_url": "http://box:11434"}
+        assert notes_path == "~/vault"
+        assert len(calls) == 1
+
+
 def test_valid_providers():
     assert {"anthropic", "openai", "ollama", "claude-code"} == VALID_PROVIDERS
 
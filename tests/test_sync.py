@@ -1,8 +1,24 @@
 from unittest.mock import AsyncMock, MagicMock
 
+from brainshape import tools
 from brainshape.sync import _get_stored_hashes, sync_all, sync_semantic, sync_structural
 
 
+def _semantic_pipeline():
+    """A mock pipeline that splits each note into one chunk."""
+    pipeline = MagicMock()
+    pipeline.split_content = MagicMock(side_effect=lambda content: [content])
+    pipeline.embed_batch_async = AsyncMock(side_effect=lambda texts: [[0.1]] * len(texts))
+    pipeline.write_async = AsyncMock(return_value=None)
+    pipeline.write_many_async = AsyncMock(return_value=None)
+    return pipeline
+
+
+def _written(pipeline):
+    """All notes handed to write_many_async, in order."""
+    return [note for c in pipeline.write_many_async.call_args_list for note in c.args[0]]
+
+
 class TestGetStoredHashes:
     def test_returns_path_hash_dict(self):
         db = MagicMock()
@@ -10,16 +26,24 @@ class TestGetStoredHashes:
             {"path": "a.md", "content_hash": "abc123"},
             {"path": "b.md", "content_hash": "def456"},
         ]
-        result = _get_stored_hashes(db)
+        result = _get_stored_hashes(db, ["a.md", "b.md"])
         assert result == {"a.md": "abc123", "b.md": "def456"}
 
+    def test_filters_by_given_paths(self):
+        db = MagicMock()
+        db.query.return_value = []
+        _get_stored_hashes(db, ["a.md"])
+        sql, params = db.query.call_args.args
+        assert "path INSIDE $paths" in sql
+        assert params == {"paths": ["a.md"]}
+
     def test_skips_null_hashes(self):
         db = MagicMock()
         db.query.return_value = [
             {"path": "a.md", "content_hash": "abc123"},
             {"path": "b.md", "content_hash": None},
         ]
-        result = _get_stored_hashes(db)
+        result = _get_stored_hashes(db, ["a.md", "b.md"])
         assert "b.md" not in result
 
 
@@ -38,9 +62,69 @@ class TestSyncStructural:
         db.query.return_value = []
         sync_structural(db, tmp_notes)
         # Should have DELETE calls for TAGGED_WITH and LINKS_TO
-        delete_calls = [c for c in db.query.call_args_list if "DELETE" in str(c)]
+        delete_calls = [c for c in db.execute.call_args_list if "DELETE" in str(c)]
         assert len(delete_calls) > 0
 
+    def test_dedupes_tag_and_link_rows(self, monkeypatch):
+        notes = [
+            {"path": "a.md", "title": "a", "content": "", "tags": ["x", "x"], "links": ["b", "b"]},
+            {"path": "b.md", "title": "b", "content": "", "tags": ["x"], "links": []},
+        ]
+        monkeypatch.setattr("brainshape.sync.read_all_notes", lambda _path: notes)
+        db = MagicMock()
+        db.query.return_value = []
+        stats = sync_structural(db, MagicMock())
+        _, params = db.execute.call_args_list[-1].args
+        assert params["tags"] == ["x"]
+        assert params["tag_rows"] == [{"path": "a.md", "tag": "x"}, {"path": "b.md", "tag": "x"}]
+        assert params["link_rows"] == [{"path": "a.md", "title": "b"}]
+        assert stats["tags"] == 2
+        assert stats["links"] == 1
+
+    def test_skips_content_write_when_unchanged(self, monkeypatch):
+        import hashlib
+
+        notes = [
+            {"path": "a.md", "title": "a", "content": "same", "tags": [], "links": []},
+            {"path": "b.md", "title": "b", "content": "edited", "tags": [], "links": []},
+        ]
+        monkeypatch.setattr("brainshape.sync.read_all_notes", lambda _path: notes)
+        db = MagicMock()
+        db.query.side_effect = lambda q, *a, **kw: (
+            [
+                {"path": "a.md", "structural_hash": hashlib.sha256(b"same").hexdigest()},
+                {"path": "b.md", "structural_hash": hashlib.sha256(b"old").hexdigest()},
+            ]
+            if q.startswith("SELECT path, structural_hash")
+            else []
+        )
+        sync_structural(db, MagicMock())
+        _, params = db.execute.call_args_list[0].args
+        assert params["unchanged"] == [{"path": "a.md", "title": "a"}]
+        assert params["changed"] == [
+            {
+                "path": "b.md",
+                "title": "b",
+                "content": "edited",
+                "hash": hashlib.sha256(b"edited").hexdigest(),
+            }
+        ]
+
+    def test_against_embedded_db(self, tmp_notes, graph_db):
+        """The batched write scripts run cleanly on a real SurrealDB."""
+        stats = sync_structural(graph_db, tmp_notes)
+        assert graph_db.query("SELECT count() FROM note GROUP ALL") == [{"count": stats["notes"]}]
+        assert graph_db.query("SELECT count() FROM tagged_with GROUP ALL") == [
+            {"count": stats["tags"]}
+        ]
+        assert graph_db.query("SELECT count() FROM links_to GROUP ALL") == [
+            {"count": stats["links"]}
+        ]
+
+        (tmp_notes / "Welcome.md").unlink()
+        assert sync_structural(graph_db, tmp_notes)["pruned"] == 1
+        assert graph_db.query("SELECT VALUE path FROM note WHERE path = 'Welcome.md'") == []
+
     def test_link_stats_only_count_matched(self, tmp_path):
         """Links to nonexistent notes should not be counted in stats."""
         # Create a note with a wikilink to a nonexistent note
@@ -52,12 +136,63 @@ class TestSyncStructural:
         assert stats["notes"] == 1
         assert stats["links"] == 0  # Should not count failed matches
 
+    def test_batches_writes_per_pass(self, tmp_path):
+        """Query count should not grow with the number of notes, tags or links."""
+        (tmp_path / "a.md").write_text("---\ntags: [x, y]\n---\nSee [[b]] and [[Missing]]")
+        (tmp_path / "b.md").write_text("---\ntags: [x]\n---\nSee [[a]]")
+        db = MagicMock()
+        db.query.return_value = []
+        stats = sync_structural(db, tmp_path)
+        assert stats == {"notes": 2, "tags": 3, "links": 2, "pruned": 0}
+        # SELECT stored paths, then the note upsert batch + relationship batch
+        assert db.query.call_count == 1
+        assert db.execute.call_count == 2
+        rel_sql, rel_params = db.execute.call_args_list[-1].args
+        # Both edge tables are cleared by a single DELETE statement
+        assert rel_sql.count("DELETE") == 1
+        assert "DELETE tagged_with, links_to WHERE in INSIDE $ids" in rel_sql
+        assert sorted(rel_params["tags"]) == ["x", "y"]
+        assert {r["title"] for r in rel_params["link_rows"]} == {"a", "b"}
+
+
+class TestSearchCacheInvalidation:
+    def test_structural_sync_clears_search_cache(self, tmp_notes):
+        tools._search_cache[("search_notes", "q")] = (float("inf"), "stale")
+        db = MagicMock()
+        db.query.return_value = []
+        sync_structural(db, tmp_notes)
+        assert not tools._search_cache
+
+    def test_semantic_sync_clears_search_cache(self, tmp_notes):
+        tools._search_cache[("semantic_search", "q")] = (float("inf"), "stale")
+        db = MagicMock()
+        db.query.return_value = []
+        sync_semantic(db, _semantic_pipeline(), tmp_notes)
+        assert not tools._search_cache
+
+
+class TestHashFiles:
+    def test_serial_and_parallel_agree(self, tmp_path, monkeypatch):
+        from brainshape.notes import compute_file_hash
+        from brainshape.sync import _hash_files
+
+        paths = []
+        for i in range(10):
+            path = tmp_path / f"{i}.md"
+            path.write_text(f"note {i}")
+            paths.append(path)
+        paths.append(tmp_path / "missing.md")
+
+        expected = [compute_file_hash(p) for p in paths[:-1]] + [None]
+        assert _hash_files(paths) == expected
+        monkeypatch.setattr("brainshape.sync._PARALLEL_HASH_THRESHOLD", 1)
+        assert _hash_files(paths) == expected
+
 
 class TestSyncSemantic:
     def test_skips_unchanged_files(self, tmp_notes):
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         # Precompute hashes so everything appears unchanged
         from brainshape.notes import compute_file_hash, list_notes
 
@@ -69,36 +204,243 @@ class TestSyncSemantic:
         stats = sync_semantic(db, pipeline, tmp_notes)
         assert stats["processed"] == 0
         assert stats["skipped"] == 5
-        pipeline.run_async.assert_not_called()
+        pipeline.embed_batch_async.assert_not_called()
+
+    def test_unchanged_files_are_not_read(self, tmp_notes, monkeypatch):
+        from pathlib import Path
+
+        from brainshape.notes import compute_file_hash, list_notes
+
+        db = MagicMock()
+        db.query.return_value = [
+            {"path": str(f.relative_to(tmp_notes)), "content_hash": compute_file_hash(f)}
+            for f in list_notes(tmp_notes)
+        ]
+        pipeline = _semantic_pipeline()
+        read = MagicMock(side_effect=AssertionError("file content read"))
+        monkeypatch.setattr(Path, "read_text", read)
+        monkeypatch.setattr(Path, "read_bytes", read)
+        stats = sync_semantic(db, pipeline, tmp_notes)
+        assert stats["skipped"] == 5
 
     def test_processes_changed_files(self, tmp_notes):
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         db.query.return_value = []  # No stored hashes → all files are new
         stats = sync_semantic(db, pipeline, tmp_notes)
         assert stats["processed"] == 5
-        assert pipeline.run_async.call_count == 5
+        assert len(_written(pipeline)) == 5
+        pipeline.write_async.assert_not_called()
+
+    def test_writes_each_batch_in_one_call(self, tmp_notes, monkeypatch):
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 2)
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        sync_semantic(db, pipeline, tmp_notes)
+        assert [len(c.args[0]) for c in pipeline.write_many_async.call_args_list] == [2, 2, 1]
+
+    def test_reports_progress_per_written_batch(self, tmp_notes, monkeypatch):
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 2)
+        db = MagicMock()
+        db.query.return_value = []
+        progress = []
+        sync_semantic(
+            db, _semantic_pipeline(), tmp_notes, on_progress=lambda d, t: progress.append((d, t))
+        )
+        assert progress == [(2, 5), (4, 5), (5, 5)]
+
+    def test_batches_chunks_across_notes(self, tmp_notes):
+        db = MagicMock()
+        pipeline = _semantic_pipeline()
+        db.query.return_value = []
+        sync_semantic(db, pipeline, tmp_notes)
+        # All five notes fit in one batch, so the model is called once
+        pipeline.embed_batch_async.assert_awaited_once()
+        (texts,) = pipeline.embed_batch_async.call_args.args
+        assert len(texts) == 5
+
+    def test_scatters_embeddings_back_to_notes(self, tmp_path):
+        (tmp_path / "a.md").write_text("AAA")
+        (tmp_path / "b.md").write_text("BBB")
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        pipeline.split_content = MagicMock(side_effect=lambda content: [content[0], content[1:]])
+        pipeline.embed_batch_async = AsyncMock(
+            side_effect=lambda texts: [[float(i)] for i in range(len(texts))]
+        )
+        sync_semantic(db, pipeline, tmp_path)
+        written = {path: (chunks, embs) for path, chunks, embs, _ in _written(pipeline)}
+        assert written == {
+            "a.md": (["A", "AA"], [[0.0], [1.0]]),
+            "b.md": (["B", "BB"], [[2.0], [3.0]]),
+        }
+
+    def test_large_syncs_split_into_batches(self, tmp_notes, monkeypatch):
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 2)
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        stats = sync_semantic(db, pipeline, tmp_notes)
+        assert stats["processed"] == 5
+        assert [len(c.args[0]) for c in pipeline.embed_batch_async.call_args_list] == [2, 2, 1]
+
+    def test_embeds_batches_concurrently(self, tmp_notes, monkeypatch):
+        import asyncio
+
+        from brainshape.sync import sync_semantic_async
+
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 1)
+        in_flight = 0
+        peak = 0
+
+        async def embed(texts):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return [[0.1]] * len(texts)
+
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        pipeline.embed_batch_async = AsyncMock(side_effect=embed)
+        stats = asyncio.run(sync_semantic_async(db, pipeline, tmp_notes, concurrency=2))
+        assert stats["processed"] == 5
+        assert peak == 2
+
+    def test_passes_read_content_to_pipeline(self, tmp_path):
+        import hashlib
+
+        (tmp_path / "note.md").write_text("Body text")
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        sync_semantic(db, pipeline, tmp_path)
+        pipeline.split_content.assert_called_once_with("Body text")
+        pipeline.write_many_async.assert_awaited_once_with(
+            [("note.md", ["Body text"], [[0.1]], hashlib.sha256(b"Body text").hexdigest())]
+        )
+
+    def test_concurrency_defaults_to_setting(self, tmp_notes, tmp_path, monkeypatch):
+        import asyncio
+
+        from brainshape.settings import update_settings
+        from brainshape.sync import sync_semantic_async
+
+        monkeypatch.setattr("brainshape.settings.SETTINGS_FILE", tmp_path / "settings.json")
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 1)
+        in_flight = 0
+        peaks = []
+
+        async def embed(texts):
+            nonlocal in_flight
+            in_flight += 1
+            peaks.append(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return [[0.1]] * len(texts)
+
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        pipeline.embed_batch_async = AsyncMock(side_effect=embed)
+        asyncio.run(sync_semantic_async(db, pipeline, tmp_notes))
+        assert max(peaks) == 1  # default setting is serial
+
+        peaks.clear()
+        update_settings({"semantic_sync_concurrency": 3})
+        asyncio.run(sync_semantic_async(db, pipeline, tmp_notes))
+        assert max(peaks) == 3
 
     def test_skips_empty_files(self, tmp_path):
         (tmp_path / "empty.md").write_text("")
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         db.query.return_value = []
         stats = sync_semantic(db, pipeline, tmp_path)
         assert stats["skipped"] == 1
         assert stats["processed"] == 0
 
+    def test_skips_whitespace_only_files(self, tmp_path):
+        (tmp_path / "blank.md").write_text("  \n\t\n")
+        (tmp_path / "unicode-blank.md").write_text("\u00a0\u3000\n", encoding="utf-8")
+        db = MagicMock()
+        pipeline = _semantic_pipeline()
+        db.query.return_value = []
+        stats = sync_semantic(db, pipeline, tmp_path)
+        assert stats == {"processed": 0, "skipped": 2}
+        pipeline.embed_batch_async.assert_not_called()
+
     def test_handles_pipeline_error(self, tmp_path):
         (tmp_path / "bad.md").write_text("Some content")
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(side_effect=RuntimeError("LLM error"))
+        pipeline = _semantic_pipeline()
+        pipeline.embed_batch_async = AsyncMock(side_effect=RuntimeError("LLM error"))
         db.query.return_value = []
         stats = sync_semantic(db, pipeline, tmp_path)
         assert stats["skipped"] == 1
         assert stats["processed"] == 0
+        pipeline.write_many_async.assert_not_called()
+
+    def test_handles_write_error(self, tmp_path):
+        (tmp_path / "a.md").write_text("First")
+        (tmp_path / "b.md").write_text("Second")
+        db = MagicMock()
+        pipeline = _semantic_pipeline()
+        pipeline.write_many_async = AsyncMock(side_effect=RuntimeError("db error"))
+        pipeline.write_async = AsyncMock(side_effect=[RuntimeError("db error"), None])
+        db.query.return_value = []
+        stats = sync_semantic(db, pipeline, tmp_path)
+        # The failed batch is retried note by note, so only the bad note is lost
+        assert stats == {"processed": 1, "skipped": 1}
+        assert pipeline.write_async.call_count == 2
+
+    def test_failed_batch_falls_back_against_embedded_db(self, tmp_path, graph_db):
+        """A batch the database rejects is retried per note; only the bad note is lost."""
+        from brainshape.kg_pipeline import KGPipeline
+
+        (tmp_path / "good.md").write_text("Good")
+        (tmp_path / "bad.md").write_text("Bad")
+        pipeline = KGPipeline(graph_db, tmp_path, embedding_dimensions=3)
+        pipeline.embed_batch_async = AsyncMock(
+            side_effect=lambda texts: [[0.1, 0.2] if t == "Bad" else [0.1, 0.2, 0.3] for t in texts]
+        )
+        stats = sync_semantic(graph_db, pipeline, tmp_path)
+        assert stats == {"processed": 1, "skipped": 1}
+        assert graph_db.query("SELECT VALUE text FROM chunk") == ["Good"]
+        assert graph_db.query("SELECT VALUE path FROM note WHERE content_hash != NONE") == [
+            "good.md"
+        ]
+
+    def test_embedding_overlaps_writes(self, tmp_notes, monkeypatch):
+        """The writer consumes finished batches while later ones are still embedding."""
+        import asyncio
+
+        from brainshape.sync import sync_semantic_async
+
+        monkeypatch.setattr("brainshape.sync.SEMANTIC_BATCH_TEXTS", 1)
+        events = []
+
+        async def embed(texts):
+            events.append("embed")
+            await asyncio.sleep(0.01)
+            return [[0.1]] * len(texts)
+
+        async def write(*_args, **_kwargs):
+            events.append("write")
+
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        pipeline.embed_batch_async = AsyncMock(side_effect=embed)
+        pipeline.write_many_async = AsyncMock(side_effect=write)
+        stats = asyncio.run(sync_semantic_async(db, pipeline, tmp_notes, concurrency=1))
+        assert stats["processed"] == 5
+        # The first write lands before the last embed starts
+        assert events.index("write") < len(events) - 1 - events[::-1].index("embed")
 
     def test_no_chunk_pre_delete(self, tmp_path):
         """Regression: sync_semantic should NOT delete chunks before processing.
@@ -108,29 +450,69 @@ class TestSyncSemantic:
         """
         (tmp_path / "note.md").write_text("Content for embedding")
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         db.query.return_value = []
         sync_semantic(db, pipeline, tmp_path)
-        # The only DELETE should NOT happen before run_async — verify that
+        # The only DELETE should NOT happen before write_many_async — verify that
         # no standalone "DELETE chunk" call is made outside the pipeline
         delete_calls = [c for c in db.query.call_args_list if "DELETE chunk" in str(c)]
         assert len(delete_calls) == 0
 
 
+class TestSyncChanged:
+    def test_structural_syncs_only_changed_notes(self, tmp_notes, monkeypatch):
+        monkeypatch.setattr(
+            "brainshape.sync.read_all_notes", MagicMock(side_effect=AssertionError("full scan"))
+        )
+        db = MagicMock()
+        db.query.side_effect = lambda q, *a, **kw: (
+            [{"path": "Welcome.md", "structural_hash": None}]
+            if q.startswith("SELECT path, structural_hash")
+            else []
+        )
+        stats = sync_structural(db, tmp_notes, changed={tmp_notes / "Welcome.md"})
+        assert stats["notes"] == 1
+        assert stats["pruned"] == 0
+        _, params = db.execute.call_args.args
+        assert params["paths"] == ["Welcome.md"]
+
+    def test_structural_new_note_falls_back_to_full_sync(self, tmp_notes):
+        db = MagicMock()
+        db.query.return_value = []  # Not in the graph yet
+        stats = sync_structural(db, tmp_notes, changed={tmp_notes / "Welcome.md"})
+        assert stats["notes"] == 5
+
+    def test_structural_deleted_note_falls_back_to_full_sync(self, tmp_notes):
+        db = MagicMock()
+        db.query.side_effect = lambda q, *a, **kw: (
+            [{"path": "Gone.md"}] if q.strip() == "SELECT path, structural_hash FROM note" else []
+        )
+        stats = sync_structural(db, tmp_notes, changed={tmp_notes / "Gone.md"})
+        assert stats["pruned"] == 1
+        assert stats["notes"] == 5
+
+    def test_semantic_syncs_only_changed_notes(self, tmp_notes):
+        db = MagicMock()
+        db.query.return_value = []
+        pipeline = _semantic_pipeline()
+        stats = sync_semantic(db, pipeline, tmp_notes, changed={tmp_notes / "Welcome.md"})
+        assert stats == {"processed": 1, "skipped": 0}
+        assert [note[0] for note in _written(pipeline)] == ["Welcome.md"]
+
+
 class TestSyncPruneOrphanTags:
     def test_prune_cleans_orphan_tags(self, tmp_notes):
         """When pruning removes a note, orphaned tags should be cleaned up."""
         db = MagicMock()
         # Simulate a stored note that no longer exists on disk
         db.query.side_effect = lambda q, *a, **kw: (
-            [{"path": "gone.md"}] if q.strip() == "SELECT path FROM note" else []
+            [{"path": "gone.md"}] if q.strip() == "SELECT path, structural_hash FROM note" else []
         )
         stats = sync_structural(db, tmp_notes)
         assert stats["pruned"] == 1
         orphan_calls = [
             c
-            for c in db.query.call_args_list
+            for c in db.execute.call_args_list
             if "DELETE tag WHERE" in str(c) and "tagged_with" in str(c)
         ]
         assert len(orphan_calls) >= 1
@@ -149,8 +531,7 @@ class TestSyncEmptyDir:
     def test_semantic_empty_dir(self, tmp_path):
         """Semantic sync on an empty directory should process nothing."""
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         db.query.return_value = []
         stats = sync_semantic(db, pipeline, tmp_path)
         assert stats["processed"] == 0
@@ -160,8 +541,7 @@ class TestSyncEmptyDir:
 class TestSyncAll:
     def test_combines_stats(self, tmp_notes):
         db = MagicMock()
-        pipeline = MagicMock()
-        pipeline.run_async = AsyncMock(return_value=None)
+        pipeline = _semantic_pipeline()
         db.query.return_value = []
         stats = sync_all(db, pipeline, tmp_notes)
         assert "structural" in stats
@@ -1,5 +1,6 @@
 import pytest
 
+from brainshape import tools
 from brainshape.tools import (
     create_connection,
     create_note,
@@ -69,25 +70,46 @@ class TestCreateNote:
         assert "Created note 'Brand New'" in result
         assert (notes_settings / "Brand New.md").exists()
         # Structural sync should run (UPSERT note + tag queries)
-        assert mock_db.query.call_count > 0
+        assert mock_db.execute.call_count == 1
 
     def test_clears_old_edges(self, mock_db, notes_settings):
         """_sync_note_structural deletes old edges before creating new ones."""
         create_note.invoke({"title": "Edge Test", "content": "Hello", "tags": "tag1", "folder": ""})
-        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        sql = mock_db.execute.call_args.args[0]
         # Edge cleanup must happen before edge creation
-        delete_idx = next(i for i, s in enumerate(call_sqls) if "DELETE tagged_with" in s)
-        relate_idx = next(
-            i for i, s in enumerate(call_sqls) if "tagged_with" in s and "RELATE" in s
+        assert sql.index("DELETE tagged_with") < sql.index("RELATE $nid->tagged_with")
+
+    def test_clears_structural_hash(self, mock_db, notes_settings):
+        """Content written here must not be mistaken for synced disk content."""
+        create_note.invoke({"title": "Hashless", "content": "Hello", "tags": "", "folder": ""})
+        sql = mock_db.execute.call_args_list[0].args[0]
+        assert "structural_hash = NONE" in sql
+
+    def test_sync_is_one_query(self, mock_db, notes_settings):
+        """Upsert, edge cleanup and batched tags/links all go in a single query."""
+        create_note.invoke(
+            {
+                "title": "Batched",
+                "content": "See [[A]] and [[B]] #one",
+                "tags": "two,three",
+                "folder": "",
+            }
         )
-        assert delete_idx < relate_idx
+        assert mock_db.execute.call_count == 1
+        sql, params = mock_db.execute.call_args.args
+        assert sql.index("UPSERT note") < sql.index("DELETE links_to")
+        assert "FOR $tag IN $tags" in sql
+        assert sql.startswith("BEGIN TRANSACTION;")
+        assert sql.endswith("COMMIT TRANSACTION;")
+        assert sorted(params["tags"]) == ["one", "three", "two"]
+        assert params["links"] == ["A", "B"]
 
     def test_clears_links_to_edges_before_recreating(self, mock_db, notes_settings):
         """DELETE links_to must precede RELATE links_to."""
         create_note.invoke(
             {"title": "Link Test", "content": "See [[Other Note]]", "tags": "", "folder": ""}
         )
-        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        call_sqls = [c.args[0] for c in mock_db.execute.call_args_list if c.args]
         delete_idx = next(i for i, s in enumerate(call_sqls) if "DELETE links_to" in s)
         # links_to RELATE may not fire if target note doesn't exist in mock,
         # but DELETE must still run
@@ -98,19 +120,44 @@ class TestCreateNote:
         create_note.invoke(
             {"title": "Cleanup Test", "content": "Hello #tag1", "tags": "tag1", "folder": ""}
         )
-        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        call_sqls = [c.args[0] for c in mock_db.execute.call_args_list if c.args]
         assert any("DELETE tagged_with" in s for s in call_sqls)
         assert any("DELETE links_to" in s for s in call_sqls)
 
     def test_edge_cleanup_with_no_tags_or_links(self, mock_db, notes_settings):
         """DELETE runs even with no tags/links; no RELATE follows."""
         create_note.invoke({"title": "Empty", "content": "Plain text", "tags": "", "folder": ""})
-        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        call_sqls = [c.args[0] for c in mock_db.execute.call_args_list if c.args]
         # Cleanup must still run
         assert any("DELETE tagged_with" in s for s in call_sqls)
         assert any("DELETE links_to" in s for s in call_sqls)
-        # But no RELATE should follow
-        assert not any("RELATE" in s for s in call_sqls)
+        # But there is nothing to relate
+        _, params = mock_db.execute.call_args.args
+        assert params["tags"] == []
+        assert params["links"] == []
+
+    def test_reports_failed_graph_sync(self, mock_db, notes_settings):
+        mock_db.execute.side_effect = RuntimeError("SurrealDB query failed: boom")
+        result = create_note.invoke(
+            {"title": "Unsynced", "content": "Hi", "tags": "", "folder": ""}
+        )
+        assert "syncing it to the graph failed" in result
+        assert "boom" in result
+        assert (notes_settings / "Unsynced.md").exists()
+
+    def test_syncs_against_embedded_db(self, graph_db, notes_settings):
+        tools.db = graph_db
+        create_note.invoke({"title": "Target", "content": "Hi", "tags": "", "folder": ""})
+        result = create_note.invoke(
+            {"title": "Source", "content": "See [[Target]] #topic", "tags": "x", "folder": ""}
+        )
+        assert result == "Created note 'Source' at Source.md"
+        assert graph_db.query(
+            "SELECT VALUE out.title FROM links_to WHERE in.path = 'Source.md'"
+        ) == ["Target"]
+        assert sorted(
+            graph_db.query("SELECT VALUE out.name FROM tagged_with WHERE in.path = 'Source.md'")
+        ) == ["topic", "x"]
 
 
 class TestEditNote:
@@ -135,10 +182,63 @@ class TestEditNote:
         write_note(notes_settings, "Tagged", "Content #mytag")
         mock_db.query.return_value = [{"path": "Tagged.md"}]
         edit_note.invoke({"title": "Tagged", "new_content": "Updated #newtag"})
-        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        call_sqls = [c.args[0] for c in mock_db.execute.call_args_list if c.args]
         assert any("DELETE tagged_with" in s for s in call_sqls)
         assert any("DELETE links_to" in s for s in call_sqls)
 
+    def test_edge_rewrite_is_one_query(self, mock_db, notes_settings):
+        """The edge deletes and re-creation run in the same query as the upsert."""
+        from brainshape.notes import write_note
+
+        write_note(notes_settings, "Fused", "Content #old")
+        mock_db.query.return_value = [{"path": "Fused.md"}]
+        mock_db.query.reset_mock()
+        edit_note.invoke({"title": "Fused", "new_content": "Updated #new [[Other]]"})
+        writes = [c.args[0] for c in mock_db.execute.call_args_list if "DELETE" in c.args[0]]
+        assert len(writes) == 1
+        assert "DELETE tagged_with" in writes[0]
+        assert "FOR $title IN $links" in writes[0]
+
+    def test_repeat_edits_skip_path_lookup(self, mock_db, notes_settings):
+        from brainshape.notes import write_note
+
+        write_note(notes_settings, "Cached", "Old content")
+        mock_db.query.side_effect = lambda q, *a: (
+            [{"title": "Cached", "path": "Cached.md"}]
+            if q == "SELECT title, path FROM note"
+            else []
+        )
+        edit_note.invoke({"title": "Cached", "new_content": "First"})
+        edit_note.invoke({"title": "Cached", "new_content": "Second"})
+        call_sqls = [c.args[0] for c in mock_db.query.call_args_list if c.args]
+        assert call_sqls.count("SELECT title, path FROM note") == 1
+        assert not any("WHERE title = $title LIMIT 1" in s for s in call_sqls)
+        assert "Second" in (notes_settings / "Cached.md").read_text()
+
+    def test_duplicate_titles_keep_first_match(self, mock_db, notes_settings):
+        from brainshape.notes import write_note
+
+        write_note(notes_settings, "Dup", "One", folder="A")
+        write_note(notes_settings, "Dup", "Two", folder="B")
+        mock_db.query.side_effect = lambda q, *a: (
+            [{"title": "Dup", "path": "A/Dup.md"}, {"title": "Dup", "path": "B/Dup.md"}]
+            if q == "SELECT title, path FROM note"
+            else []
+        )
+        edit_note.invoke({"title": "Dup", "new_content": "Edited"})
+        assert "Edited" in (notes_settings / "A" / "Dup.md").read_text()
+        assert "Edited" not in (notes_settings / "B" / "Dup.md").read_text()
+
+    def test_stale_index_entry_falls_back_to_graph(self, mock_db, notes_settings):
+        from brainshape.notes import write_note
+
+        write_note(notes_settings, "Moved", "Body", folder="New")
+        tools._title_index = {"Moved": "Old/Moved.md"}
+        mock_db.query.return_value = [{"path": "New/Moved.md"}]
+        result = edit_note.invoke({"title": "Moved", "new_content": "Updated"})
+        assert "New/Moved.md" in result
+        assert tools._title_index["Moved"] == "New/Moved.md"
+
 
 class TestQueryGraph:
     def test_formats_results(self, mock_db):
@@ -151,6 +251,23 @@ class TestQueryGraph:
         result = query_graph.invoke({"surql": "SELECT * FROM note"})
         assert "5 more rows" in result
 
+    def test_clips_long_values(self, mock_db):
+        mock_db.query.return_value = [
+            {"content": "x" * 1000, "embedding": [0.5] * 768, "nested": {"text": "y" * 1000}}
+        ]
+        result = query_graph.invoke({"surql": "SELECT * FROM chunk"})
+        assert "x" * 200 + "…" in result
+        assert "x" * 201 not in result
+        assert "758 more" in result
+        assert "y" * 201 not in result
+
+    def test_formats_rows_as_json(self, mock_db):
+        import orjson
+
+        mock_db.query.return_value = [{"title": "A", "n": 1}]
+        result = query_graph.invoke({"surql": "SELECT * FROM note"})
+        assert orjson.loads(result) == {"title": "A", "n": 1}
+
     def test_no_results(self, mock_db):
         result = query_graph.invoke({"surql": "SELECT * FROM nothing"})
         assert "no results" in result
@@ -175,27 +292,33 @@ class TestFindRelated:
         assert "Target Note" in result
 
     def test_fuzzy_fallback(self, mock_db):
-        # First call (exact) returns nothing useful, second (fuzzy) returns result
-        mock_db.query.side_effect = [
-            [{"tags": [], "outgoing_links": [], "incoming_links": []}],
-            [
-                {
-                    "title": "Machine Learning Notes",
-                    "tags": [["ml"]],
-                    "outgoing_links": [[{"title": "AI Overview", "path": "AI.md"}]],
-                    "incoming_links": [[]],
-                }
-            ],
+        # The exact note has no connections, so the fuzzy matches are shown
+        mock_db.query.return_value = [
+            {"title": "Machine", "exact": True, "tags": [], "outgoing_links": []},
+            {
+                "title": "Machine Learning Notes",
+                "exact": False,
+                "tags": [["ml"]],
+                "outgoing_links": [[{"title": "AI Overview", "path": "AI.md"}]],
+                "incoming_links": [[]],
+            },
         ]
         result = find_related.invoke({"title": "Machine"})
         assert "AI Overview" in result
-        assert mock_db.query.call_count == 2
+        mock_db.query.assert_called_once()
 
-    def test_no_results(self, mock_db):
-        mock_db.query.side_effect = [
-            [{"tags": [], "outgoing_links": [], "incoming_links": []}],
-            [],
+    def test_exact_match_with_connections_skips_fuzzy(self, mock_db):
+        mock_db.query.return_value = [
+            {"title": "ML", "exact": True, "tags": [["exact-tag"]]},
+            {"title": "HTML Tips", "exact": False, "tags": [["fuzzy-tag"]]},
         ]
+        result = find_related.invoke({"title": "ML"})
+        assert "exact-tag" in result
+        assert "fuzzy-tag" not in result
+        mock_db.query.assert_called_once()
+
+    def test_no_results(self, mock_db):
+        mock_db.query.return_value = []
         result = find_related.invoke({"title": "Nothing"})
         assert "No connections found" in result
 
@@ -211,6 +334,20 @@ class TestStoreMemory:
         mock_db.query.assert_called_once()
 
 
+class TestConnectionStatements:
+    def test_built_once_per_combination(self):
+        tools._connection_sql.cache_clear()
+        first = tools._connection_sql("person", "name", "knows", "note", "title")
+        again = tools._connection_sql("person", "name", "knows", "note", "title")
+        assert first is again
+        define_sql, exists_sql, relate_sql = first
+        assert define_sql == "DEFINE TABLE OVERWRITE knows TYPE RELATION"
+        assert "FROM knows WHERE in = (SELECT VALUE id FROM person WHERE name = $src)[0]" in (
+            exists_sql
+        )
+        assert relate_sql.endswith("->knows->(SELECT VALUE id FROM note WHERE title = $tgt)")
+
+
 class TestCreateConnection:
     def test_creates_generic_connection(self, mock_db):
         mock_db.query.return_value = []
@@ -551,3 +688,60 @@ class TestCreateConnection:
             1 for c in mock_db.query.call_args_list if c.args and "RELATE" in c.args[0]
         )
         assert second_relate_count == 1
+
+
+class TestSearchCache:
+    def test_repeated_search_queries_once(self, mock_db):
+        mock_db.query.return_value = [{"title": "A", "snippet": "x", "score": 1.0}]
+        first = search_notes.invoke({"query": "cached"})
+        assert search_notes.invoke({"query": "cached"}) == first
+        mock_db.query.assert_called_once()
+
+    def test_tools_cached_separately(self, mock_db, mock_pipeline):
+        search_notes.invoke({"query": "same"})
+        semantic_search.invoke({"query": "same"})
+        assert mock_db.query.call_count == 2
+
+    def test_expired_entry_is_rerun(self, mock_db, monkeypatch):
+        monkeypatch.setattr(tools, "_SEARCH_CACHE_TTL", 0.0)
+        search_notes.invoke({"query": "stale"})
+        search_notes.invoke({"query": "stale"})
+        assert mock_db.query.call_count == 2
+
+    def test_note_writes_clear_cache(self, mock_db):
+        find_related.invoke({"title": "X"})
+        tools._sync_note_structural(
+            {"path": "X.md", "title": "X", "content": "", "tags": [], "links": []}
+        )
+        find_related.invoke({"title": "X"})
+        assert mock_db.query.call_count == 2
+
+    def test_new_db_clears_cache(self, mock_db):
+        from unittest.mock import MagicMock
+
+        search_notes.invoke({"query": "swap"})
+        tools.db = MagicMock()
+        tools.db.query.return_value = []
+        search_notes.invoke({"query": "swap"})
+        tools.db.query.assert_called_once()
+
+    def test_size_is_bounded(self, mock_db, monkeypatch):
+        monkeypatch.setattr(tools, "_SEARCH_CACHE_SIZE", 2)
+        for q in ("a", "b", "c"):
+            search_notes.invoke({"query": q})
+        assert len(tools._search_cache) == 2
+        assert ("search_notes", "a") not in tools._search_cache
+
+
+class TestNotesPath:
+    def test_expansion_is_cached_per_setting(self, monkeypatch):
+        from pathlib import Path
+
+        setting = "~/vault-a"
+        monkeypatch.setattr("brainshape.settings.get_notes_path", lambda: setting)
+        tools._expand_notes_path.cache_clear()
+
+        assert tools._notes_path() == Path("~/vault-a").expanduser()
+        assert tools._notes_path() is tools._notes_path()
+        setting = "~/vault-b"
+        assert tools._notes_path() == Path("~/vault-b").expanduser()
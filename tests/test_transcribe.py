@@ -1,8 +1,11 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from brainshape import transcribe
 from brainshape.transcribe import (
     _get_model,
     _transcribe_local,
@@ -59,6 +62,9 @@ def test_get_model_mistral_default():
 def test_transcribe_audio_dispatches_to_local(mock_mlx_whisper, tmp_path, monkeypatch):
     audio = tmp_path / "test.wav"
     audio.write_bytes(b"fake audio")
+    # The mocked mlx_whisper only exists in this process; run the worker inline
+    inline = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr("brainshape.transcribe._get_local_pool", lambda: inline)
 
     mock_mlx_whisper.transcribe.return_value = {
         "text": " Hello ",
@@ -71,6 +77,30 @@ def test_transcribe_audio_dispatches_to_local(mock_mlx_whisper, tmp_path, monkey
     assert len(result["segments"]) == 1
 
 
+def test_local_worker_is_reused_and_never_forks():
+    pool = transcribe._get_local_pool()
+    assert transcribe._get_local_pool() is pool
+    assert pool._mp_context.get_start_method() == "spawn"
+    assert pool._max_workers == 1
+
+
+def test_reset_model_stops_local_worker():
+    pool = transcribe._get_local_pool()
+    reset_model()
+    assert transcribe._local_pool is None
+    assert transcribe._get_local_pool() is not pool
+
+
+def test_local_worker_crash_is_reported(monkeypatch, tmp_path):
+    broken = MagicMock()
+    broken.submit.return_value.result.side_effect = BrokenProcessPool()
+    monkeypatch.setattr(transcribe, "_local_pool", broken)
+
+    with pytest.raises(RuntimeError, match="worker exited"):
+        transcribe._transcribe_local_in_worker(str(tmp_path / "a.wav"), {})
+    assert transcribe._local_pool is None
+
+
 def test_transcribe_audio_unknown_provider(monkeypatch, tmp_path):
     import json
 
@@ -107,6 +137,20 @@ def test_local_transcription(mock_mlx_whisper, tmp_path):
     )
 
 
+def test_local_transcription_text_only(mock_mlx_whisper, tmp_path):
+    audio = tmp_path / "test.wav"
+    audio.write_bytes(b"fake")
+    mock_mlx_whisper.transcribe.return_value = {
+        "text": " Test result. ",
+        "segments": [{"start": 0.0, "end": 2.5, "text": " Test result. "}],
+    }
+
+    settings = {"transcription_provider": "local", "transcription_model": ""}
+    result = _transcribe_local(str(audio), settings, segments=False)
+
+    assert result == {"text": "Test result.", "segments": []}
+
+
 def test_local_import_error(tmp_path):
     """Clear error when mlx_whisper not available."""
     sys.modules.pop("mlx_whisper", None)
@@ -126,6 +170,36 @@ def test_local_import_error(tmp_path):
     sys.modules.pop("mlx_whisper", None)
 
 
+def test_local_reuses_imported_module(mock_mlx_whisper, tmp_path):
+    audio = tmp_path / "test.wav"
+    audio.write_bytes(b"fake")
+    mock_mlx_whisper.transcribe.return_value = {"text": "Hi"}
+    settings = {"transcription_provider": "local", "transcription_model": ""}
+
+    _transcribe_local(str(audio), settings)
+    # A later import would pick this up; the cached module must be used instead
+    sys.modules["mlx_whisper"] = None  # type: ignore[assignment]
+    _transcribe_local(str(audio), settings)
+
+    assert mock_mlx_whisper.transcribe.call_count == 2
+
+
+def test_reset_model_drops_cached_module(mock_mlx_whisper, tmp_path):
+    audio = tmp_path / "test.wav"
+    audio.write_bytes(b"fake")
+    mock_mlx_whisper.transcribe.return_value = {"text": "Hi"}
+    settings = {"transcription_provider": "local", "transcription_model": ""}
+    _transcribe_local(str(audio), settings)
+
+    reset_model()
+    replacement = MagicMock()
+    replacement.transcribe.return_value = {"text": "Again"}
+    sys.modules["mlx_whisper"] = replacement
+
+    assert _transcribe_local(str(audio), settings)["text"] == "Again"
+    mock_mlx_whisper.transcribe.assert_called_once()
+
+
 def test_local_empty_segments(mock_mlx_whisper, tmp_path):
     audio = tmp_path / "test.wav"
     audio.write_bytes(b"fake")
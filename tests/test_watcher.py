@@ -1,6 +1,13 @@
 import time
 from unittest.mock import MagicMock
 
+from watchdog.events import (
+    DirCreatedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+)
+
 from brainshape.watcher import NoteChangeHandler, start_watcher
 
 
@@ -8,14 +15,12 @@ class TestNoteChangeHandler:
     def test_ignores_non_markdown(self):
         callback = MagicMock()
         handler = NoteChangeHandler(callback)
+        handler._debounce_seconds = 0.05
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/image.png"
-
-        handler.on_created(event)
-        handler.on_modified(event)
-        handler.on_deleted(event)
+        for path in ["/notes/image.png", "/notes/.note.md.swp", "/notes/note.md~"]:
+            handler.dispatch(FileCreatedEvent(path))
+            handler.dispatch(FileModifiedEvent(path))
+            handler.dispatch(FileDeletedEvent(path))
 
         # Callback should not be called (even after debounce)
         time.sleep(0.1)
@@ -25,11 +30,18 @@ class TestNoteChangeHandler:
         callback = MagicMock()
         handler = NoteChangeHandler(callback)
 
-        event = MagicMock()
-        event.is_directory = True
-        event.src_path = "/notes/subfolder"
+        handler._debounce_seconds = 0.05
 
-        handler.on_created(event)
+        handler.dispatch(DirCreatedEvent("/notes/subfolder.md"))
+        time.sleep(0.1)
+        callback.assert_not_called()
+
+    def test_ignores_trashed_notes(self):
+        callback = MagicMock()
+        handler = NoteChangeHandler(callback)
+        handler._debounce_seconds = 0.05
+
+        handler.dispatch(FileCreatedEvent("/notes/.trash/old.md"))
         time.sleep(0.1)
         callback.assert_not_called()
 
@@ -38,29 +50,73 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.1  # Speed up for test
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/test.md"
+        path = "/notes/test.md"
+
+        handler.dispatch(FileModifiedEvent(path))
+        time.sleep(0.3)
+        callback.assert_called_once()
+
+    def test_passes_coalesced_changed_paths(self):
+        from pathlib import Path
+
+        callback = MagicMock()
+        handler = NoteChangeHandler(callback)
+        handler._debounce_seconds = 0.1
+
+        for path in ["/notes/a.md", "/notes/b.md", "/notes/a.md"]:
+            handler.dispatch(FileModifiedEvent(path))
+        time.sleep(0.3)
 
-        handler.on_modified(event)
+        callback.assert_called_once_with({Path("/notes/a.md"), Path("/notes/b.md")})
+        # The next burst starts from an empty set
+        handler.dispatch(FileCreatedEvent("/notes/c.md"))
         time.sleep(0.3)
+        assert callback.call_args.args == ({Path("/notes/c.md")},)
+
+    def test_skips_saves_with_unchanged_content(self, tmp_path):
+        note = tmp_path / "note.md"
+        note.write_text("same")
+        callback = MagicMock()
+        handler = NoteChangeHandler(callback)
+        handler._debounce_seconds = 0.05
+
+        handler.dispatch(FileModifiedEvent(str(note)))
+        time.sleep(0.15)
+        # A touch or same-content save is not a change
+        handler.dispatch(FileModifiedEvent(str(note)))
+        time.sleep(0.15)
         callback.assert_called_once()
 
+        note.write_text("edited")
+        handler.dispatch(FileModifiedEvent(str(note)))
+        time.sleep(0.15)
+        assert callback.call_count == 2
+
+    def test_deleted_file_forgets_its_hash(self, tmp_path):
+        note = tmp_path / "note.md"
+        note.write_text("same")
+        handler = NoteChangeHandler(MagicMock())
+        handler._debounce_seconds = 0.05
+
+        handler.dispatch(FileCreatedEvent(str(note)))
+        assert not handler._content_changed(note)
+        handler.dispatch(FileDeletedEvent(str(note)))
+        # Re-creating the file with the same text is still a change
+        assert handler._content_changed(note)
+
     def test_debounces_rapid_changes(self):
         callback = MagicMock()
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.2
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/test.md"
+        path = "/notes/test.md"
 
         # Rapid fire events
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.05)
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.05)
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
 
         # Wait for debounce
         time.sleep(0.4)
@@ -72,11 +128,9 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.1
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/old.md"
+        path = "/notes/old.md"
 
-        handler.on_deleted(event)
+        handler.dispatch(FileDeletedEvent(path))
         time.sleep(0.3)
         callback.assert_called_once()
 
@@ -85,11 +139,9 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.1
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/new.md"
+        path = "/notes/new.md"
 
-        handler.on_created(event)
+        handler.dispatch(FileCreatedEvent(path))
         time.sleep(0.3)
         callback.assert_called_once()
 
@@ -98,11 +150,9 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.1
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/test.md"
+        path = "/notes/test.md"
 
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.3)
         # Callback was called (and raised), but handler didn't crash
         callback.assert_called_once()
@@ -114,11 +164,9 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(callback)
         handler._debounce_seconds = 0.05
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/test.md"
+        path = "/notes/test.md"
 
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.15)  # Wait for fire
 
         # Verify _timer is None (cleared inside lock)
@@ -126,7 +174,7 @@ class TestNoteChangeHandler:
             assert handler._timer is None
 
         # Now trigger another event — should work correctly
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.15)
         assert callback.call_count == 2
 
@@ -137,7 +185,7 @@ class TestNoteChangeHandler:
         call_count = 0
         call_lock = threading.Lock()
 
-        def slow_callback():
+        def slow_callback(_changed):
             nonlocal call_count
             time.sleep(0.05)
             with call_lock:
@@ -146,14 +194,12 @@ class TestNoteChangeHandler:
         handler = NoteChangeHandler(slow_callback)
         handler._debounce_seconds = 0.05
 
-        event = MagicMock()
-        event.is_directory = False
-        event.src_path = "/notes/test.md"
+        path = "/notes/test.md"
 
         # Trigger an event, let it fire, then immediately trigger another
-        handler.on_modified(event)
+        handler.dispatch(FileModifiedEvent(path))
         time.sleep(0.08)  # Timer fires, callback starts
-        handler.on_modified(event)  # Schedule new while old callback runs
+        handler.dispatch(FileModifiedEvent(path))  # Schedule new while old callback runs
         time.sleep(0.2)
 
         # Both callbacks should have completed without errors